@@ -8,6 +8,10 @@ from flask_session import Session
 from authlib.integrations.flask_client import OAuth
 from flask_wtf import CSRFProtect
 from config import Config
+from app.fragment_cache import fragment_cache
+from app.workout_buffer import workout_buffer
+from app.progress_events import progress_events
+from app.jobs import job_queue
 
 logger = logging.getLogger(__name__)
 
@@ -51,12 +55,20 @@ def create_app(config_class=Config):
     # Initialiseer CSRF-bescherming voor formulieren
     csrf.init_app(app)
 
+    # Set-logs en records vereisen een native upsert; een andere database direct bij het opstarten weigeren
+    from app.main.utils import check_upsert_support
+    check_upsert_support(app.config['SQLALCHEMY_DATABASE_URI'])
+
     # Initialiseer extensies met de app
     db.init_app(app)  # Database-ORM
     migrate.init_app(app, db)  # Database-migraties
     login.init_app(app)  # Gebruikersauthenticatie
     moment.init_app(app)  # Tijdformattering
     oauth.init_app(app)  # OAuth voor Auth0
+    fragment_cache.init_app(app)  # Cache voor gerenderde dashboard-fragmenten
+    workout_buffer.init_app(app)  # Write-behind buffer voor sets van lopende workouts
+    progress_events.init_app(app)  # Live voortgang van workouts (SSE/long-poll)
+    job_queue.init_app(app)  # Achtergrondtaken met de jobs-tabel als wachtrij
 
     # Stel login-view in voor Flask-Login
     login.login_view = 'main.login'
@@ -78,6 +90,12 @@ def create_app(config_class=Config):
     app.register_blueprint(main_bp)
     app.register_blueprint(errors_bp)
 
+    # CLI-commando's voor het herstellen van sessietotalen en persoonlijke records
+    from app.main.session_stats import repair_session_stats_command
+    from app.main.records import records_cli
+    app.cli.add_command(repair_session_stats_command)
+    app.cli.add_command(records_cli)
+
     # Importeer modellen om database-tabellen te registreren
     from app import models
 
@@ -0,0 +1,7 @@
+from app.catalog.document import CatalogDocument
+from app.catalog.facets import FacetIndex, FacetResult, facet_key
+from app.catalog.fuzzy import TrigramIndex
+from app.catalog.muscles import MUSCLE_ROLES, MuscleIndex
+from app.catalog.similar import SimilarityIndex
+from app.catalog.snapshot import CatalogSnapshot, ExerciseRecord, catalog_version, get_catalog, invalidate_catalog
+from app.catalog.suggest import MAX_SUGGESTIONS, SuggestTrie
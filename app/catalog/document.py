@@ -0,0 +1,28 @@
+import gzip
+import hashlib
+import json
+
+
+class CatalogDocument:
+    """
+    De volledige catalogus als één compact JSON-document voor client-side caching.
+    Notities:
+        - Gebouwd uit Exercise.to_dict (via de records), aangevuld met primaire en secundaire spieren.
+        - De ETag is een hash van de inhoud, niet van de versiestempel: een commit die de catalogus
+          niet inhoudelijk wijzigt, laat bestaande client-caches geldig.
+        - De gzip-variant wordt eenmalig per catalogusversie gecomprimeerd en heeft een eigen ETag
+          (achtervoegsel '-gz'), want het zijn andere bytes dan de identity-variant.
+    """
+
+    def __init__(self, records):
+        exercises = []
+        for record in records:
+            exercise = record.to_dict()
+            exercise['primary_muscles'] = [m.value for m in record.primary_muscles]
+            exercise['secondary_muscles'] = [m.value for m in record.secondary_muscles]
+            exercises.append(exercise)
+        self.body = json.dumps({'exercises': exercises}, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        # mtime=0 houdt de gecomprimeerde bytes deterministisch
+        self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.gzip_etag = f'{self.etag}-gz'
@@ -0,0 +1,119 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Facetnamen (gelijk aan de velden van SearchExerciseForm) en hun waardebron per record
+FACETS = {
+    'difficulty': lambda record: (record.level,),
+    'mechanic': lambda record: (record.mechanic,),
+    'equipment': lambda record: (record.equipment,),
+    'category': lambda record: (record.category,),
+    'primary_muscle': lambda record: record.primary_muscles,
+    'secondary_muscle': lambda record: record.secondary_muscles,
+    'muscle': lambda record: record.primary_muscles + record.secondary_muscles,
+}
+
+
+def facet_key(value):
+    #    Sleutel van een facetwaarde: de Enum-naam (bijv. 'BODY_ONLY'), of 'NONE' als de waarde ontbreekt.
+    if value is None:
+        return 'NONE'
+    return getattr(value, 'name', str(value))
+
+
+class FacetResult:
+    """
+    Resultaat van een facet-query.
+    Notities:
+        - records staan in catalogusvolgorde, of in rankingvolgorde als er gezocht is.
+        - counts bevat per facet het aantal treffers per waarde, met alle andere filters toegepast.
+    """
+
+    def __init__(self, records, counts):
+        self.records = records
+        self.counts = counts
+
+    @property
+    def total(self):
+        return len(self.records)
+
+    def to_dict(self):
+        return {'total': self.total, 'facets': self.counts}
+
+
+class FacetIndex:
+    """
+    Bitmap-index over de facetten van de catalogus.
+    Notities:
+        - Per facetwaarde één bitset (Python int); bit i staat voor het i-de record van de catalogus.
+        - Een filtercombinatie is een bitwise AND; tellingen zijn popcounts (int.bit_count).
+        - Tellingen per facet negeren het filter op dat facet zelf, zodat de gebruiker kan zien
+          hoeveel resultaten een andere keuze zou opleveren.
+    """
+
+    def __init__(self, records):
+        self.records = tuple(records)
+        self.position = {record.id: idx for idx, record in enumerate(self.records)}
+        self.all_bits = (1 << len(self.records)) - 1
+        self.bitsets = {facet: {} for facet in FACETS}
+        for idx, record in enumerate(self.records):
+            bit = 1 << idx
+            for facet, values in FACETS.items():
+                for value in values(record) or (None,):
+                    key = facet_key(value)
+                    self.bitsets[facet][key] = self.bitsets[facet].get(key, 0) | bit
+
+    def bits_for(self, facet, value):
+        #    Bitset voor één facetwaarde (0 voor onbekende waarden).
+        return self.bitsets.get(facet, {}).get(value, 0)
+
+    def bits_of(self, records):
+        #    Bitset van een willekeurige verzameling records.
+        bits = 0
+        for record in records:
+            bits |= 1 << self.position[record.id]
+        return bits
+
+    def select(self, filters, candidates=None):
+        #    Bitset van alle records die aan alle filters voldoen.
+        bits = self.all_bits if candidates is None else candidates
+        for facet, value in filters.items():
+            bits &= self.bits_for(facet, value)
+        return bits
+
+    def records_for(self, bits):
+        #    Records van een bitset, in catalogusvolgorde.
+        records = []
+        while bits:
+            low = bits & -bits
+            records.append(self.records[low.bit_length() - 1])
+            bits ^= low
+        return records
+
+    def counts(self, filters, candidates=None):
+        #    Tellingen per facetwaarde, telkens met alle filters behalve dat van het facet zelf.
+        base = self.all_bits if candidates is None else candidates
+        counts = {}
+        for facet, values in self.bitsets.items():
+            mask = self.select({f: v for f, v in filters.items() if f != facet}, base)
+            counts[facet] = {key: (mask & bits).bit_count() for key, bits in values.items()}
+        return counts
+
+    def query(self, filters, ranked=None):
+        """
+        Pas filters toe en bereken in dezelfde stap de facettellingen.
+
+        Args:
+            filters: Dict facet -> waarde-sleutel, bijv. {'equipment': 'DUMBBELL'}.
+            ranked: Optionele gerankte lijst records (zoekresultaten); de volgorde blijft behouden.
+        Returns:
+            FacetResult: Gefilterde records en tellingen per facet.
+        """
+        filters = {facet: value for facet, value in filters.items() if facet in FACETS and value}
+        candidates = None if ranked is None else self.bits_of(ranked)
+        bits = self.select(filters, candidates)
+        if ranked is None:
+            records = self.records_for(bits)
+        else:
+            records = [r for r in ranked if bits >> self.position[r.id] & 1]
+        return FacetResult(records, self.counts(filters, candidates))
@@ -0,0 +1,88 @@
+import re
+import numpy as np
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Minimaal aandeel van de trigrammen van de zoekterm dat in een naam moet voorkomen
+MIN_COVERAGE = 0.5
+
+
+def trigrams(text):
+    """
+    Trigrammen van een tekst, in de stijl van pg_trgm.
+    Notities:
+        - Elk woord wordt opgevuld met twee spaties ervoor en één erna ('  b', ' be', ..., 'ch ').
+        - Daarnaast de trigrammen van de tekst zonder spaties, zodat 'benchpres' ook 'Bench Press' raakt.
+    """
+    words = TOKEN_RE.findall(text.lower()) if text else []
+    grams = set()
+    for word in words:
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    compact = ''.join(words)
+    grams.update(compact[i:i + 3] for i in range(len(compact) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    Trigram-similariteitsindex over oefeningnamen voor typfout-tolerant zoeken.
+    Notities:
+        - Per trigram een NumPy-array met recordposities (postings).
+        - Een zoekopdracht telt overlap voor alle records tegelijk met np.bincount, zonder Python-lus per record.
+        - Score: aandeel van de zoekterm-trigrammen dat in de naam voorkomt (dekking), met de
+          pg_trgm-similariteit (overlap / unie) als tweede sleutel.
+    """
+
+    def __init__(self, records):
+        self.records = tuple(records)
+        vocabulary = {}
+        postings = []
+        sizes = []
+        for idx, record in enumerate(self.records):
+            grams = trigrams(record.name)
+            sizes.append(len(grams))
+            for gram in grams:
+                gram_id = vocabulary.setdefault(gram, len(vocabulary))
+                if gram_id == len(postings):
+                    postings.append([])
+                postings[gram_id].append(idx)
+        self._vocabulary = vocabulary
+        self._postings = [np.asarray(ids, dtype=np.int32) for ids in postings]
+        self._sizes = np.asarray(sizes, dtype=np.float32)
+
+    def scores(self, query):
+        """
+        Bereken dekking en similariteit van de zoekterm voor alle records.
+
+        Returns:
+            tuple: (coverage, similarity) als NumPy-arrays, of None als de zoekterm geen trigrammen heeft.
+        """
+        grams = trigrams(query)
+        if not grams or not self.records:
+            return None
+        hits = [self._postings[self._vocabulary[g]] for g in grams if g in self._vocabulary]
+        if not hits:
+            return None
+        overlap = np.bincount(np.concatenate(hits), minlength=len(self.records)).astype(np.float32)
+        coverage = overlap / len(grams)
+        similarity = overlap / (len(grams) + self._sizes - overlap)
+        return coverage, similarity
+
+    def search(self, query, limit=None, min_coverage=MIN_COVERAGE):
+        """
+        Zoek oefeningen waarvan de naam op de zoekterm lijkt.
+
+        Returns:
+            list: Tuples (ExerciseRecord, score), hoogste score eerst.
+        """
+        result = self.scores(query)
+        if result is None:
+            return []
+        coverage, similarity = result
+        candidates = np.flatnonzero(coverage >= min_coverage)
+        # Sorteer op dekking, dan similariteit (np.lexsort sorteert op de laatste sleutel eerst)
+        order = candidates[np.lexsort((-similarity[candidates], -coverage[candidates]))]
+        if limit is not None:
+            order = order[:limit]
+        return [(self.records[idx], float(coverage[idx] + similarity[idx])) for idx in order]
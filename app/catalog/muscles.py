@@ -0,0 +1,49 @@
+# Rol van een spiergroep in een oefening -> facet in de FacetIndex
+MUSCLE_ROLES = {
+    'any': 'muscle',
+    'primary': 'primary_muscle',
+    'secondary': 'secondary_muscle',
+}
+
+
+class MuscleIndex:
+    """
+    Voorberekende index van spiergroep naar oefening-IDs.
+    Notities:
+        - Vervangt de join Exercise -> exercise_muscle_association -> ExerciseMuscle per request.
+        - Wordt afgeleid van de bitsets in de FacetIndex en dus per catalogusversie opnieuw opgebouwd.
+        - Spiergroepen zijn Enum-namen uit Muscle (bijv. 'CHEST', 'LOWER_BACK').
+    """
+
+    def __init__(self, facet_index):
+        self.exercise_ids = {
+            role: {
+                muscle: tuple(record.id for record in facet_index.records_for(bits))
+                for muscle, bits in facet_index.bitsets[facet].items()
+                if muscle != 'NONE'
+            }
+            for role, facet in MUSCLE_ROLES.items()
+        }
+
+    def ids(self, muscle, role='any'):
+        """
+        Haal de oefening-IDs op die een spiergroep in de gegeven rol trainen.
+
+        Returns:
+            tuple: Oefening-IDs in catalogusvolgorde (leeg voor onbekende spiergroepen).
+        """
+        return self.exercise_ids.get(role, {}).get(muscle, ())
+
+    @staticmethod
+    def filters(muscle, role='any'):
+        #    Vertaal een spiergroep en rol naar een facetfilter voor FacetIndex.query.
+        if not muscle:
+            return {}
+        return {MUSCLE_ROLES.get(role, MUSCLE_ROLES['any']): muscle}
+
+    def summary(self):
+        #    Aantal oefeningen per spiergroep en rol.
+        return {
+            role: {muscle: len(ids) for muscle, ids in muscles.items()}
+            for role, muscles in self.exercise_ids.items()
+        }
@@ -0,0 +1,209 @@
+import bisect
+import logging
+import math
+import re
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Gewicht per veld: een treffer in de naam telt zwaarder dan in de instructies
+FIELD_WEIGHTS = {'name': 3.0, 'muscles': 1.5, 'instructions': 1.0}
+
+# BM25-parameters
+K1 = 1.2
+B = 0.75
+
+# Maximaal aantal termen waarnaar een prefix (laatste zoekwoord) wordt uitgebreid
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def stem(token):
+    #    Lichte Engelse stemmer: enkelvoud en -ing/-ed vormen ('curls' -> 'curl', 'pressing' -> 'press').
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    for suffix in ('ing', 'ed'):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            base = token[:-len(suffix)]
+            # 'running' -> 'runn' -> 'run', maar 'pressing' blijft 'press'
+            if base[-1] == base[-2] and base[-1] not in 'lsz':
+                base = base[:-1]
+            return base
+    if token.endswith('sses'):
+        return token[:-2]
+    if token.endswith(('ches', 'shes', 'xes', 'zes')):
+        return token[:-2]
+    if token.endswith(('ss', 'us', 'is')):
+        return token
+    if token.endswith('s'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    #    Splits tekst in kleine letters op woordgrenzen.
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def analyze(text):
+    #    Tokeniseer en stem tekst voor de index.
+    return [stem(token) for token in tokenize(text)]
+
+
+def record_fields(record):
+    #    Doorzoekbare velden van een ExerciseRecord.
+    muscles = record.primary_muscles + record.secondary_muscles
+    return {
+        'name': record.name,
+        'muscles': ' '.join(getattr(m, 'value', str(m)) for m in muscles),
+        'instructions': ' '.join(record.instructions),
+    }
+
+
+class InMemorySearchIndex:
+    """
+    Pure-Python inverted index met BM25F-ranking over naam, spieren en instructies.
+    Notities:
+        - De BM25-score per term en document wordt bij het bouwen al berekend (verzadigd per veld,
+          daarna gewogen opgeteld), zodat een zoekopdracht alleen nog postings optelt.
+        - Alle zoekwoorden moeten voorkomen (AND); het laatste woord matcht ook als prefix.
+    """
+    backend = 'memory'
+
+    def __init__(self, records):
+        self.records = tuple(records)
+        field_tokens = [{field: analyze(text) for field, text in record_fields(r).items()} for r in self.records]
+        n_docs = len(self.records)
+        avg_len = {
+            field: (sum(len(doc[field]) for doc in field_tokens) / (n_docs or 1)) or 1.0
+            for field in FIELD_WEIGHTS
+        }
+
+        postings = {}
+        for doc_idx, doc in enumerate(field_tokens):
+            weighted = {}
+            for field, tokens in doc.items():
+                norm = 1 - B + B * len(tokens) / avg_len[field]
+                counts = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, tf in counts.items():
+                    # BM25-verzadiging per veld, daarna gewogen opgeteld
+                    saturated = tf * (K1 + 1) / (tf + K1 * norm)
+                    weighted[token] = weighted.get(token, 0.0) + FIELD_WEIGHTS[field] * saturated
+            for token, tf in weighted.items():
+                postings.setdefault(token, {})[doc_idx] = tf
+
+        self._postings = {}
+        for token, docs in postings.items():
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            # Sla direct de BM25-bijdrage per document op
+            self._postings[token] = {doc: idf * tf for doc, tf in docs.items()}
+        self._vocabulary = sorted(self._postings)
+
+    def _expand(self, raw_token, is_last):
+        # Geef de indextermen terug die bij een zoekwoord horen
+        terms = {stem(raw_token)}
+        if is_last:
+            start = bisect.bisect_left(self._vocabulary, raw_token)
+            for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+                if not term.startswith(raw_token):
+                    break
+                terms.add(term)
+        return [t for t in terms if t in self._postings]
+
+    def search(self, query, limit=None):
+        """
+        Zoek oefeningen en rangschik ze op relevantie.
+
+        Returns:
+            list: Tuples (ExerciseRecord, score), hoogste score eerst.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        scores = None
+        for position, raw_token in enumerate(tokens):
+            term_scores = {}
+            for term in self._expand(raw_token, position == len(tokens) - 1):
+                for doc, score in self._postings[term].items():
+                    if score > term_scores.get(doc, 0.0):
+                        term_scores[doc] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {doc: scores[doc] + s for doc, s in term_scores.items() if doc in scores}
+            if not scores:
+                return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.records[item[0]].name))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(self.records[doc], score) for doc, score in ranked]
+
+
+class Fts5SearchIndex:
+    """
+    Zoekindex op basis van SQLite FTS5 met ingebouwde bm25()-ranking.
+    Notities:
+        - Draait in een eigen in-memory SQLite-database, los van de applicatiedatabase.
+        - Gebruikt de porter-tokenizer; kolomgewichten gelijk aan FIELD_WEIGHTS.
+        - De verbinding wordt gedeeld tussen threads en daarom met een lock beschermd.
+    """
+    backend = 'fts5'
+
+    def __init__(self, records):
+        self.records = tuple(records)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE exercise_fts USING fts5(name, muscles, instructions, tokenize='porter unicode61')"
+        )
+        self._conn.executemany(
+            "INSERT INTO exercise_fts(rowid, name, muscles, instructions) VALUES (?, ?, ?, ?)",
+            [(idx, f['name'], f['muscles'], f['instructions'])
+             for idx, f in enumerate(record_fields(r) for r in self.records)]
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def match_expression(query):
+        #    Bouw een veilige FTS5 MATCH-expressie; het laatste woord als prefix.
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        terms = [f'"{token}"' for token in tokens[:-1]] + [f'"{tokens[-1]}"*']
+        return ' '.join(terms)
+
+    def search(self, query, limit=None):
+        """
+        Zoek oefeningen via FTS5 en rangschik ze op bm25().
+
+        Returns:
+            list: Tuples (ExerciseRecord, score), hoogste score eerst.
+        """
+        expression = self.match_expression(query)
+        if expression is None:
+            return []
+        weights = ', '.join(str(FIELD_WEIGHTS[f]) for f in ('name', 'muscles', 'instructions'))
+        sql = (f"SELECT rowid, bm25(exercise_fts, {weights}) AS rank FROM exercise_fts "
+               f"WHERE exercise_fts MATCH ? ORDER BY rank LIMIT ?")
+        with self._lock:
+            rows = self._conn.execute(sql, (expression, -1 if limit is None else limit)).fetchall()
+        # bm25() is negatief: lager is beter
+        return [(self.records[rowid], -rank) for rowid, rank in rows]
+
+
+def build_search_index(records, backend='memory'):
+    #    Bouw een zoekindex voor de gevraagde backend; valt terug op 'memory' zonder FTS5-ondersteuning.
+    if backend == 'fts5':
+        try:
+            return Fts5SearchIndex(records)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 niet beschikbaar, terugval op in-memory zoekindex: {e}")
+    elif backend != 'memory':
+        logger.warning(f"Onbekende zoekbackend '{backend}', gebruik in-memory zoekindex")
+    return InMemorySearchIndex(records)
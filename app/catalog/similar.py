@@ -0,0 +1,128 @@
+import heapq
+import numpy as np
+from app.catalog.facets import facet_key
+from app.models import Category, Equipment, Force, Mechanic, Muscle
+
+# Aantal vooraf berekende buren per oefening (en per materiaalsoort)
+NEIGHBOURS = 10
+
+# Gewicht per kenmerkblok; spieren bepalen het sterkst of een oefening een vervanger is
+FEATURE_WEIGHTS = {
+    'muscles': 2.0,
+    'mechanic': 1.0,
+    'force': 1.0,
+    'category': 0.75,
+    'equipment': 0.5,
+}
+
+# Aandeel van een secundaire spier ten opzichte van een primaire
+SECONDARY_MUSCLE_WEIGHT = 0.5
+
+
+def feature_matrix(records):
+    """
+    Bouw de kenmerkmatrix (oefeningen x kenmerken) voor similariteitsberekening.
+    Notities:
+        - One-hot voor materiaal, mechaniek, kracht en categorie; spieren primair 1.0, secundair 0.5.
+        - Elk blok wordt geschaald met FEATURE_WEIGHTS en elke rij daarna L2-genormaliseerd,
+          zodat X @ X.T direct de cosinus-similariteit geeft.
+    """
+    blocks = [
+        ('equipment', list(Equipment), lambda r: {r.equipment: 1.0}),
+        ('mechanic', list(Mechanic), lambda r: {r.mechanic: 1.0}),
+        ('force', list(Force), lambda r: {r.force: 1.0}),
+        ('category', list(Category), lambda r: {r.category: 1.0}),
+        ('muscles', list(Muscle), lambda r: {
+            **{m: SECONDARY_MUSCLE_WEIGHT for m in r.secondary_muscles},
+            **{m: 1.0 for m in r.primary_muscles},
+        }),
+    ]
+    width = sum(len(values) for _, values, _ in blocks)
+    matrix = np.zeros((len(records), width), dtype=np.float32)
+    offset = 0
+    for block, values, weights_of in blocks:
+        column = {value: offset + i for i, value in enumerate(values)}
+        scale = np.float32(FEATURE_WEIGHTS[block])
+        for row, record in enumerate(records):
+            for value, weight in weights_of(record).items():
+                if value in column:
+                    matrix[row, column[value]] = weight * scale
+        offset += len(values)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def top_k(scores, k):
+    #    Indexen van de k hoogste scores per rij, aflopend gesorteerd (gevectoriseerd over alle rijen).
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((scores.shape[0], 0), dtype=np.intp)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1)
+
+
+class SimilarityIndex:
+    """
+    Vooraf berekende vervangers per oefening ("machine bezet? doe deze").
+    Notities:
+        - Eén matrixvermenigvuldiging geeft de similariteit van alle paren; top-k per rij via argpartition.
+        - Buren worden per materiaalsoort apart bewaard (als NumPy-arrays), zodat filteren op
+          beschikbaar materiaal alleen dictionary-lookups en een merge van korte lijsten kost.
+        - Wordt opnieuw (gevectoriseerd) opgebouwd bij elke nieuwe catalogusversie.
+    """
+
+    def __init__(self, records):
+        self.records = tuple(records)
+        self.position = {record.id: idx for idx, record in enumerate(self.records)}
+        # Materiaalsleutel (of None voor alle materiaal) -> (buur-indexen, scores), elk n x NEIGHBOURS
+        self.neighbours = {}
+        if not self.records:
+            return
+
+        matrix = feature_matrix(self.records)
+        scores = matrix @ matrix.T
+        np.fill_diagonal(scores, -np.inf)
+
+        self.neighbours[None] = self._top_neighbours(scores, np.arange(len(self.records)))
+        equipment_keys = np.array([facet_key(record.equipment) for record in self.records])
+        for key in np.unique(equipment_keys):
+            columns = np.flatnonzero(equipment_keys == key)
+            self.neighbours[str(key)] = self._top_neighbours(scores[:, columns], columns)
+
+    @staticmethod
+    def _top_neighbours(scores, columns):
+        # Top-k per rij, terugvertaald naar catalogusposities
+        top = top_k(scores, NEIGHBOURS)
+        return columns[top], np.take_along_axis(scores, top, axis=1)
+
+    def _candidates(self, row, key):
+        # Buren van één rij voor één materiaalsleutel; de oefening zelf (-inf) en niet-verwante (0) vallen weg
+        indexes, scores = self.neighbours.get(key, ((), ()))
+        if not len(indexes):
+            return []
+        return [
+            (self.records[idx], float(score))
+            for idx, score in zip(indexes[row], scores[row])
+            if np.isfinite(score) and score > 0
+        ]
+
+    def substitutes(self, exercise_id, k=5, equipment=None):
+        """
+        Geef de meest vergelijkbare oefeningen voor een oefening.
+
+        Args:
+            exercise_id: ID van de oefening die vervangen moet worden.
+            k: Aantal vervangers (maximaal NEIGHBOURS).
+            equipment: Optionele lijst materiaalsleutels (bijv. ['DUMBBELL', 'BODY_ONLY']) die beschikbaar zijn.
+        Returns:
+            list: Tuples (ExerciseRecord, score), meest vergelijkbaar eerst.
+        """
+        row = self.position.get(str(exercise_id))
+        if row is None:
+            return []
+        if not equipment:
+            return self._candidates(row, None)[:k]
+        lists = [self._candidates(row, key) for key in set(equipment)]
+        merged = heapq.merge(*lists, key=lambda item: -item[1])
+        return [item for _, item in zip(range(k), merged)]
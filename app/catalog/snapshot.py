@@ -0,0 +1,283 @@
+import functools
+import itertools
+import logging
+import threading
+import time
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from flask import current_app
+from app import db
+from app.models import CatalogVersion, Exercise, ExerciseMuscle, exercise_muscle_association
+from app.catalog.document import CatalogDocument
+from app.catalog.facets import FacetIndex
+from app.catalog.fuzzy import TrigramIndex
+from app.catalog.muscles import MuscleIndex
+from app.catalog.search import build_search_index
+from app.catalog.similar import SimilarityIndex
+from app.catalog.suggest import SuggestTrie
+
+logger = logging.getLogger(__name__)
+
+# Modellen waarvan een commit de catalogus ongeldig maakt
+CATALOG_MODELS = (Exercise, ExerciseMuscle)
+
+_lock = threading.Lock()
+_snapshot = None
+# Tijdstip (time.monotonic) van de laatste vergelijking met de gedeelde versiestempel
+_checked_at = float('-inf')
+
+
+class ExerciseRecord:
+    """
+    Compacte, read-only weergave van een oefening uit de catalogus.
+    Notities:
+        - Afbeeldingen, instructies en afbeeldingspaden worden eenmalig gedecodeerd bij het laden.
+        - Attribuutnamen volgen Exercise, zodat templates records en modellen door elkaar kunnen gebruiken.
+        - Enum-velden bevatten dezelfde Enum-waarden als het model (of None).
+    """
+    __slots__ = (
+        'id', 'name', 'force', 'level', 'mechanic', 'equipment', 'category',
+        'images_list', 'images', 'image_url', 'instructions',
+        'primary_muscles', 'secondary_muscles', '_dict'
+    )
+
+    def __init__(self, exercise, primary_muscles=(), secondary_muscles=()):
+        """
+        Bouw een record op basis van een geladen Exercise-object.
+        """
+        from app.main.utils import fix_image_path, clean_instruction_text  # Import hier om circulaire imports te vermijden
+        self.id = exercise.id
+        self.name = exercise.name
+        self.force = exercise.force
+        self.level = exercise.level
+        self.mechanic = exercise.mechanic
+        self.equipment = exercise.equipment
+        self.category = exercise.category
+        self._dict = exercise.to_dict()
+        # Ruwe afbeeldingslijst (edit_workout) en genormaliseerde paden (zoeken en detailpagina)
+        self.images_list = tuple(exercise.images_list)
+        self.images = tuple(fix_image_path(img) for img in self.images_list)
+        self.image_url = self.images[0] if self.images else 'default.jpg'
+        self.instructions = tuple(clean_instruction_text(step) for step in self._dict['instructions'])
+        self.primary_muscles = tuple(primary_muscles)
+        self.secondary_muscles = tuple(secondary_muscles)
+
+    def __repr__(self):
+        """String-representatie van het ExerciseRecord-object."""
+        return f'<ExerciseRecord {self.name}>'
+
+    def to_dict(self):
+        """
+        Geef de (vooraf berekende) dictionary-weergave terug, gelijk aan Exercise.to_dict.
+
+        Returns:
+            dict: Kopie van de oefeninggegevens voor JSON-responsen.
+        """
+        return dict(self._dict)
+
+
+class CatalogSnapshot:
+    """
+    Onveranderlijke momentopname van de volledige oefeningencatalogus.
+    Notities:
+        - Wordt eenmaal per catalogusversie geladen en gedeeld door alle requests in het proces.
+        - records is gesorteerd op naam; by_id geeft O(1) lookups op exercise_id (string).
+    """
+
+    def __init__(self, version, records):
+        self.version = version
+        self.records = tuple(records)
+        self.by_id = {record.id: record for record in self.records}
+        self._search_indexes = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def get(self, exercise_id):
+        """
+        Haal een oefening op via ID.
+
+        Returns:
+            ExerciseRecord: Het record, of None als de oefening niet bestaat.
+        """
+        return self.by_id.get(str(exercise_id))
+
+    def search_index(self, backend='memory'):
+        """
+        Haal de zoekindex voor deze catalogusversie op en bouw hem bij het eerste gebruik.
+
+        Returns:
+            InMemorySearchIndex | Fts5SearchIndex: Index met een search(query, limit)-methode.
+        """
+        index = self._search_indexes.get(backend)
+        if index is None:
+            with _lock:
+                index = self._search_indexes.get(backend)
+                if index is None:
+                    index = build_search_index(self.records, backend)
+                    self._search_indexes[backend] = index
+        return index
+
+    @functools.cached_property
+    def document(self):
+        #    Volledige catalogus als compact JSON-document met ETag (en gzip-variant).
+        return CatalogDocument(self.records)
+
+    @functools.cached_property
+    def facet_index(self):
+        #    Bitmap-index over moeilijkheid, mechaniek, materiaal, categorie en spieren.
+        return FacetIndex(self.records)
+
+    @functools.cached_property
+    def muscle_index(self):
+        #    Voorberekende index spiergroep -> oefening-IDs (primair, secundair of beide).
+        return MuscleIndex(self.facet_index)
+
+    @functools.cached_property
+    def suggest_trie(self):
+        #    Prefix-trie over namen en aliassen voor typeahead-suggesties.
+        return SuggestTrie(self.records)
+
+    @functools.cached_property
+    def similarity_index(self):
+        #    Vooraf berekende vervangers per oefening (NumPy-kenmerkmatrix, top-k buren).
+        return SimilarityIndex(self.records)
+
+    @functools.cached_property
+    def trigram_index(self):
+        #    Trigram-index over namen voor typfout-tolerant zoeken ('benchpres', 'dumbell curl').
+        return TrigramIndex(self.records)
+
+    def query(self, search_term=None, filters=None, backend='memory'):
+        """
+        Zoek en filter oefeningen en bereken de facettellingen in één stap.
+        Notities:
+            - Met zoekterm: gerankte resultaten uit de zoekindex, daarna bitset-filtering.
+            - Levert de zoekindex niets op, dan volgt een fuzzy ranking via de trigram-index.
+            - Zonder zoekterm: catalogusvolgorde.
+        Returns:
+            FacetResult: Records en tellingen per facet.
+        """
+        ranked = None
+        if search_term and search_term.strip():
+            ranked = [record for record, score in self.search_index(backend).search(search_term)]
+            if not ranked:
+                ranked = [record for record, score in self.trigram_index.search(search_term)]
+        return self.facet_index.query(filters or {}, ranked)
+
+
+def load_catalog(version):
+    #    Laad alle oefeningen en spierkoppelingen in twee queries.
+    exercises = db.session.scalars(sa.select(Exercise).order_by(Exercise.name)).all()
+    muscle_rows = db.session.execute(
+        sa.select(
+            exercise_muscle_association.c.exercise_id,
+            ExerciseMuscle.muscle,
+            exercise_muscle_association.c.is_primary
+        ).join(ExerciseMuscle, ExerciseMuscle.id == exercise_muscle_association.c.muscle_id)
+    ).all()
+
+    primary, secondary = {}, {}
+    for exercise_id, muscle, is_primary in muscle_rows:
+        (primary if is_primary else secondary).setdefault(exercise_id, []).append(muscle)
+
+    records = [
+        ExerciseRecord(ex, primary.get(ex.id, ()), secondary.get(ex.id, ()))
+        for ex in exercises
+    ]
+    logger.debug(f"Catalogus geladen: {len(records)} oefeningen, versie {version}")
+    snapshot = CatalogSnapshot(version, records)
+    # Trigram- en similariteitsindex direct bouwen; geen request betaalt dan de bouwkosten
+    snapshot.trigram_index
+    snapshot.similarity_index
+    return snapshot
+
+
+def catalog_version():
+    """
+    Gedeelde versiestempel van de catalogus, voor alle processen gelijk.
+    Notities:
+        - (teller uit catalog_version, aantal oefeningen, aantal spierkoppelingen) in één query.
+        - De teller dekt wijzigingen via de ORM (ook uit seed_exercises.py of andere workers); de aantallen
+          vangen ruwe inserts en deletes op van migraties die de teller niet ophogen.
+    Returns:
+        tuple: Vergelijkbare stempel; verandert bij elke catalogusbewerking.
+    """
+    return tuple(db.session.execute(
+        sa.select(
+            sa.select(CatalogVersion.version).where(CatalogVersion.id == 1).scalar_subquery(),
+            sa.select(sa.func.count()).select_from(Exercise).scalar_subquery(),
+            sa.select(sa.func.count()).select_from(exercise_muscle_association).scalar_subquery(),
+        )
+    ).one())
+
+
+def invalidate_catalog():
+    #    Forceer een vergelijking met de gedeelde versiestempel bij de volgende get_catalog().
+    global _checked_at
+    with _lock:
+        _checked_at = float('-inf')
+    logger.debug("Catalogus ongeldig gemaakt")
+
+
+def get_catalog():
+    """
+    Geef de actuele catalogus terug en laad hem alleen opnieuw bij een nieuwe versiestempel.
+    Notities:
+        - De stempel wordt hoogstens eens per CATALOG_CHECK_SECONDS uit de database gelezen; daartussen
+          kost een request geen query. Een commit in dit proces forceert direct een nieuwe controle.
+    """
+    global _snapshot, _checked_at
+    snapshot = _snapshot
+    interval = current_app.config.get('CATALOG_CHECK_SECONDS', 30)
+    if snapshot is not None and time.monotonic() - _checked_at < interval:
+        return snapshot
+    with _lock:
+        if _snapshot is None or time.monotonic() - _checked_at >= interval:
+            version = catalog_version()
+            _checked_at = time.monotonic()
+            if _snapshot is None or _snapshot.version != version:
+                _snapshot = load_catalog(version)
+        return _snapshot
+
+
+def _bump_catalog_version(connection):
+    # Verhoog de gedeelde stempel binnen de lopende transactie (rij aanmaken als die ontbreekt)
+    table = CatalogVersion.__table__
+    bumped = connection.execute(
+        sa.update(table).where(table.c.id == 1).values(version=table.c.version + 1)
+    ).rowcount
+    if not bumped:
+        connection.execute(sa.insert(table).values(id=1, version=1))
+
+
+@sa.event.listens_for(so.Session, 'before_flush')
+def _track_catalog_changes(session, flush_context, instances):
+    # Onthoud of deze transactie oefeningen of spiergroepen wijzigt
+    changed = itertools.chain(session.new, session.dirty, session.deleted)
+    if any(isinstance(obj, CATALOG_MODELS) for obj in changed):
+        session.info['catalog_changed'] = True
+
+
+@sa.event.listens_for(so.Session, 'after_flush')
+def _bump_after_flush(session, flush_context):
+    # Eén ophoging per transactie, gecommit samen met de catalogusbewerking zelf
+    if session.info.get('catalog_changed') and not session.info.get('catalog_bumped'):
+        _bump_catalog_version(session.connection())
+        session.info['catalog_bumped'] = True
+
+
+@sa.event.listens_for(so.Session, 'after_commit')
+def _invalidate_after_commit(session):
+    session.info.pop('catalog_bumped', None)
+    if session.info.pop('catalog_changed', False):
+        invalidate_catalog()
+
+
+@sa.event.listens_for(so.Session, 'after_rollback')
+def _reset_after_rollback(session):
+    session.info.pop('catalog_changed', None)
+    session.info.pop('catalog_bumped', None)
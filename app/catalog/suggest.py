@@ -0,0 +1,95 @@
+import re
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Maximaal aantal suggesties dat per trie-knoop wordt bewaard
+MAX_SUGGESTIONS = 20
+
+# Gangbare afkortingen; een naam met het woord links is ook vindbaar via de afkorting rechts
+WORD_ALIASES = {
+    'dumbbell': 'db',
+    'barbell': 'bb',
+    'kettlebell': 'kb',
+    'kettlebells': 'kb',
+}
+PHRASE_ALIASES = {
+    'romanian deadlift': 'rdl',
+    'overhead press': 'ohp',
+    'bench press': 'bp',
+}
+
+# Rangorde van een treffer: begin van de naam, begin van een alias, of een later woord
+RANK_NAME, RANK_ALIAS, RANK_WORD = 0, 1, 2
+
+
+def normalize(text):
+    #    Kleine letters, alleen letters/cijfers, woorden gescheiden door één spatie.
+    return ' '.join(TOKEN_RE.findall(text.lower())) if text else ''
+
+
+def aliases(name):
+    #    Alternatieve schrijfwijzen van een (genormaliseerde) naam.
+    words = name.split(' ')
+    result = set()
+    if any(word in WORD_ALIASES for word in words):
+        result.add(' '.join(WORD_ALIASES.get(word, word) for word in words))
+    for phrase, alias in PHRASE_ALIASES.items():
+        if phrase in name:
+            result.add(name.replace(phrase, alias))
+    result.discard(name)
+    return result
+
+
+class SuggestTrie:
+    """
+    Prefix-trie over oefeningnamen en aliassen voor typeahead-suggesties.
+    Notities:
+        - Elke naam wordt ingevoegd vanaf ieder woord, zodat 'press' ook 'Bench Press' vindt.
+        - Iedere knoop bewaart vooraf de beste MAX_SUGGESTIONS treffers; een lookup kost alleen
+          het aflopen van de prefix (O(lengte zoekterm)).
+        - Ranking: treffer op het begin van de naam, dan alias, dan later woord; daarna kortste naam.
+    """
+
+    def __init__(self, records):
+        self.records = tuple(records)
+        self._root = {}
+        best = {}
+        for idx, record in enumerate(self.records):
+            name = normalize(record.name)
+            keys = [(name, RANK_NAME)] + [(alias, RANK_ALIAS) for alias in aliases(name)]
+            for key, rank in list(keys):
+                words = key.split(' ')
+                keys.extend((' '.join(words[i:]), RANK_WORD) for i in range(1, len(words)))
+            for key, rank in keys:
+                node = self._root
+                for char in key:
+                    node = node.setdefault(char, {})
+                    # Bewaar per knoop de beste rang per record
+                    candidates = best.setdefault(id(node), (node, {}))[1]
+                    if rank < candidates.get(idx, RANK_WORD + 1):
+                        candidates[idx] = rank
+
+        # Zet de kandidaten om naar een gesorteerde, afgekapte lijst in de knoop zelf
+        for node, candidates in best.values():
+            ordered = sorted(
+                candidates.items(),
+                key=lambda item: (item[1], len(self.records[item[0]].name), self.records[item[0]].name)
+            )
+            node[''] = tuple(idx for idx, rank in ordered[:MAX_SUGGESTIONS])
+
+    def suggest(self, prefix, limit=8):
+        """
+        Geef oefeningen waarvan de naam (of een woord/alias daarin) met prefix begint.
+
+        Returns:
+            list: ExerciseRecords, maximaal limit (en nooit meer dan MAX_SUGGESTIONS).
+        """
+        key = normalize(prefix)
+        if not key:
+            return []
+        node = self._root
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return []
+        return [self.records[idx] for idx in node.get('', ())[:limit]]
@@ -1,3 +1,5 @@
+import functools
+from collections import Counter
 from flask import flash
 from flask_wtf import FlaskForm
 from wtforms import FieldList, FormField, StringField, FloatField, SelectField, IntegerField, SubmitField, ValidationError
@@ -18,12 +20,22 @@ class RangeInput(Input):
     validation_attrs = frozenset(['required', 'min', 'max', 'step'])
 
 
+# Eerste keuze in de oefening-dropdown
+EXERCISE_PLACEHOLDER = (0, 'Selecteer een oefening')
+
+
+@functools.lru_cache(maxsize=1)
+def exercise_choices(catalog):
+    #    Keuzelijst voor exercise_id, eenmaal per catalogusversie opgebouwd en gedeeld door alle formulieren.
+    return (EXERCISE_PLACEHOLDER,) + tuple((record.id, record.name) for record in catalog)
+
+
 class ExerciseForm(FlaskForm):
     """
     Subformulier voor het toevoegen of bewerken van een oefening in een workout-plan.
     Notities:
         - CSRF is uitgeschakeld omdat dit een subformulier is binnen WorkoutPlanForm.
-        - Dynamische keuzes voor exercise_id worden geladen uit de Exercise-tabel.
+        - Keuzes voor exercise_id komen uit de in-memory catalogus (gedeeld per catalogusversie).
         - Logging wordt gebruikt voor debugging van initialisatie.
     """
     exercise_id = IntegerField('Exercise', validators=[])
@@ -38,17 +50,16 @@ class ExerciseForm(FlaskForm):
         Initialiseer het formulier met dynamische oefeningkeuzes.
 
         Notities:
-            - Laadt alle oefeningen uit de database voor de exercise_id dropdown.
-            - Stelt exercise_id in op 0 als ongeldige waarde wordt opgegeven.
+            - Gebruikt de gedeelde keuzelijst van de catalogus; geen databasequery per formulier.
+            - Stelt exercise_id in op 0 als ongeldige waarde wordt opgegeven (O(1) lookup op ID).
             - Logt de geselecteerde exercise_id voor debugging.
         """
         super().__init__(*args, **kwargs)
-        from app.models import Exercise
-        # Genereer keuzes: [(0, 'Selecteer een oefening'), (id, naam), ...]
-        choices = [(0, 'Selecteer een oefening')] + [(e.id, e.name) for e in Exercise.query.all()]
-        self.exercise_id.choices = choices
-        # Valideer exercise_id en stel standaard in op 0 indien ongeldig
-        if not self.exercise_id.data or self.exercise_id.data not in [c[0] for c in choices]:
+        from app.catalog import get_catalog  # Import hier om circulaire imports te vermijden
+        catalog = get_catalog()
+        self.exercise_id.choices = exercise_choices(catalog)
+        # Valideer exercise_id en stel standaard in op 0 indien ongeldig (IDs zijn strings in de catalogus)
+        if not self.exercise_id.data or str(self.exercise_id.data) not in catalog.by_id:
             self.exercise_id.data = 0
         logger.debug(f"ExerciseForm initialized with exercise_id: {self.exercise_id.data}")
 
@@ -202,8 +213,92 @@ class SearchExerciseForm(FlaskForm):
         ('MEDICINE_BALL', 'Medicine Ball'),
         ('OTHER', 'Other')
     ])
+    muscle = SelectField('Muscle', default='', choices=[
+        ('', 'Select Muscle'),
+        ('ABDOMINALS', 'Abdominals'),
+        ('ABDUCTORS', 'Abductors'),
+        ('ADDUCTORS', 'Adductors'),
+        ('BICEPS', 'Biceps'),
+        ('CALVES', 'Calves'),
+        ('CHEST', 'Chest'),
+        ('FOREARMS', 'Forearms'),
+        ('GLUTES', 'Glutes'),
+        ('HAMSTRINGS', 'Hamstrings'),
+        ('LATS', 'Lats'),
+        ('LOWER_BACK', 'Lower Back'),
+        ('MIDDLE_BACK', 'Middle Back'),
+        ('NECK', 'Neck'),
+        ('QUADRICEPS', 'Quadriceps'),
+        ('SHOULDERS', 'Shoulders'),
+        ('TRAPS', 'Traps'),
+        ('TRICEPS', 'Triceps')
+    ])
+    muscle_role = SelectField('Muscle Role', default='any', choices=[
+        ('any', 'Primary or Secondary'),
+        ('primary', 'Primary'),
+        ('secondary', 'Secondary')
+    ])
     submit = SubmitField('Search')
 
+    # Selectvelden die als facet in de catalogus geïndexeerd zijn
+    FACET_FIELDS = ('difficulty', 'mechanic', 'equipment', 'category')
+
+    def facet_filters(self):
+        """
+        Geef de ingevulde filters terug als facet-query.
+        Notities:
+            - Het spierfilter wordt via MuscleIndex vertaald naar het facet van de gekozen rol.
+        Returns:
+            dict: Facetnaam -> gekozen waarde, alleen voor ingevulde velden.
+        """
+        from app.catalog import MuscleIndex
+        filters = {name: getattr(self, name).data for name in self.FACET_FIELDS if getattr(self, name).data}
+        filters.update(MuscleIndex.filters(self.muscle.data, self.muscle_role.data or 'any'))
+        return filters
+
+    def field_counts(self, counts):
+        """
+        Koppel facettellingen aan de selectvelden van dit formulier.
+
+        Returns:
+            dict: Veldnaam -> {keuze: aantal}.
+        """
+        from app.catalog import MUSCLE_ROLES
+        field_counts = {name: counts.get(name, {}) for name in self.FACET_FIELDS}
+        role = self.muscle_role.data if self.muscle_role.data in MUSCLE_ROLES else 'any'
+        field_counts['muscle'] = counts.get(MUSCLE_ROLES[role], {})
+        return field_counts
+
+    def apply_facet_counts(self, counts):
+        """
+        Zet het aantal treffers achter elke keuze, bijv. 'Dumbbell (42)'.
+        Notities:
+            - De lege keuze ('Select ...') blijft ongewijzigd.
+        """
+        for name, facet_counts in self.field_counts(counts).items():
+            field = getattr(self, name)
+            field.choices = [
+                (value, label if not value else f"{label.rsplit(' (', 1)[0]} ({facet_counts.get(value, 0)})")
+                for value, label in field.choices
+            ]
+
+    def search(self, catalog, backend='memory', validated=True):
+        """
+        Zoek oefeningen in de catalogus op basis van de ingevulde velden.
+        Notities:
+            - De zoekterm wordt gerankt via de zoekindex van de catalogus (BM25).
+            - Filters en facettellingen komen uit de bitmap-index, zonder SQL.
+            - Bij een ongeldig formulier (validated=False) wordt de invoer genegeerd.
+        Returns:
+            list: ExerciseRecords die aan de zoekopdracht en filters voldoen.
+        """
+        if validated:
+            result = catalog.query(self.search_term.data, self.facet_filters(), backend)
+        else:
+            result = catalog.query(backend=backend)
+        self.apply_facet_counts(result.counts)
+        return result.records
+
 
 class WorkoutPlanForm(FlaskForm):
     """
@@ -230,7 +325,7 @@ class WorkoutPlanForm(FlaskForm):
         for idx, (ex_id, exercise_form) in enumerate(zip(exercise_ids, field)):
             if ex_id == 0 and not exercise_form.is_edit.data:
                 field.errors.append(f'Oefening {idx + 1}: Selecteer een geldige oefening.')
-        duplicates = set([x for x in exercise_ids if exercise_ids.count(x) > 1 and x != 0])
+        duplicates = {x for x, n in Counter(exercise_ids).items() if n > 1 and x != 0}
         if duplicates:
             flash(f'Waarschuwing: Meerdere exemplaren van oefening(en): {", ".join(str(d) for d in duplicates)}',
                   'warning')
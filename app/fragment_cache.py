@@ -0,0 +1,267 @@
+import itertools
+import logging
+import threading
+from collections import OrderedDict
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+
+logger = logging.getLogger(__name__)
+
+# Views waarvan de gerenderde plan-fragmenten per gebruiker gecachet worden
+DASHBOARD_VIEWS = ('index', 'archived_plans')
+
+# Generatieteller die bij clear() ophoogt (alle gebruikers tegelijk)
+GLOBAL_GENERATION = '*'
+
+
+class LRUBackend:
+    """
+    In-process LRU-opslag voor gerenderde fragmenten.
+    Notities:
+        - Thread-safe via een lock; de oudste sleutel valt weg boven maxsize.
+        - Generatietellers staan los van de LRU, zodat ze nooit verdwijnen.
+        - Alleen geldig binnen één proces; gebruik 'redis' als meerdere workers moeten delen.
+    """
+    name = 'memory'
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def generations(self, *names):
+        with self._lock:
+            return [self._generations.get(name, 0) for name in names]
+
+    def bump(self, *names):
+        with self._lock:
+            for name in names:
+                self._generations[name] = self._generations.get(name, 0) + 1
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisBackend:
+    """
+    Gedeelde opslag in Redis, zodat alle workers dezelfde cache en invalidaties zien.
+    Notities:
+        - Sleutels krijgen een TTL als vangnet; invalidatie gebeurt normaal via commit-events.
+    """
+    name = 'redis'
+
+    def __init__(self, url, ttl=86400, prefix='fragment:'):
+        import redis  # Import hier: alleen nodig als de redis-backend gekozen is
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def generations(self, *names):
+        return [int(value or 0) for value in self._client.mget([f'{self.prefix}gen:{name}' for name in names])]
+
+    def bump(self, *names):
+        pipe = self._client.pipeline()
+        for name in names:
+            pipe.incr(f'{self.prefix}gen:{name}')
+        pipe.execute()
+
+    def get(self, key):
+        value = self._client.get(self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value):
+        self._client.set(self.prefix + key, value.encode('utf-8'), ex=self.ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        # Generatietellers blijven staan: die bepalen welke fragmenten nog geldig zijn
+        for key in self._client.scan_iter(match=self.prefix + '*'):
+            if not key.decode('utf-8').startswith(f'{self.prefix}gen:'):
+                self._client.delete(key)
+
+
+class FragmentCache:
+    """
+    Per-gebruiker cache van gerenderde HTML-fragmenten (plankaarten op dashboard en archief).
+    Notities:
+        - Wordt automatisch ongeldig gemaakt na een commit die WorkoutPlan of WorkoutPlanExercise wijzigt.
+        - Elke gebruiker heeft een generatieteller die bij invalidatie ophoogt. Die wordt vóór het renderen
+          gelezen en zit in de sleutel; een render die met oude data begon en pas na de invalidatie klaar
+          is, wordt niet bewaard (en zou onder een verlopen sleutel staan).
+        - Backend via FRAGMENT_CACHE_BACKEND: 'memory' (LRU, standaard) of 'redis' (FRAGMENT_CACHE_URL).
+        - hits/misses zijn tellers per proces; zie stats().
+    """
+
+    def __init__(self, app=None):
+        self.backend = LRUBackend()
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('FRAGMENT_CACHE_ENABLED', True)
+        backend = app.config.get('FRAGMENT_CACHE_BACKEND', 'memory')
+        if backend == 'redis':
+            try:
+                self.backend = RedisBackend(app.config['FRAGMENT_CACHE_URL'], app.config.get('FRAGMENT_CACHE_TTL', 86400))
+            except Exception as e:
+                logger.warning(f"Redis-fragmentcache niet beschikbaar, terugval op in-process LRU: {e}")
+                self.backend = LRUBackend(app.config.get('FRAGMENT_CACHE_SIZE', 1024))
+        else:
+            if backend != 'memory':
+                logger.warning(f"Onbekende fragmentcache-backend '{backend}', gebruik in-process LRU")
+            self.backend = LRUBackend(app.config.get('FRAGMENT_CACHE_SIZE', 1024))
+        app.extensions['fragment_cache'] = self
+
+    @staticmethod
+    def key(user_id, view, generation):
+        return f'{view}:{user_id}:' + '.'.join(str(number) for number in generation)
+
+    def generation(self, user_id):
+        #    Huidige generatie van de fragmenten van een gebruiker: (globaal, per gebruiker).
+        return tuple(self.backend.generations(GLOBAL_GENERATION, str(user_id)))
+
+    def get_or_render(self, user_id, view, render):
+        """
+        Geef het gecachte fragment terug, of render en bewaar het bij een miss.
+
+        Args:
+            user_id: Eigenaar van het fragment.
+            view: Naam van de view (zie DASHBOARD_VIEWS).
+            render: Functie zonder argumenten die de HTML (str) oplevert.
+        Returns:
+            str: Gerenderde HTML.
+        """
+        if not self.enabled:
+            return render()
+        try:
+            # Generatie vóór het renderen lezen: render() leest de data pas daarna
+            generation = self.generation(user_id)
+            key = self.key(user_id, view, generation)
+            html = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Fragmentcache lezen mislukt voor {view}:{user_id}: {e}")
+            return str(render())
+        if html is not None:
+            with self._lock:
+                self.hits += 1
+            return html
+
+        with self._lock:
+            self.misses += 1
+        html = str(render())
+        try:
+            # Alleen bewaren als er tijdens het renderen geen invalidatie was
+            if self.generation(user_id) == generation:
+                self.backend.set(key, html)
+        except Exception as e:
+            logger.warning(f"Fragmentcache schrijven mislukt voor {key}: {e}")
+        return html
+
+    def invalidate(self, *user_ids):
+        #    Verwijder de fragmenten van alle dashboard-views voor de opgegeven gebruikers.
+        try:
+            # Eerst de generatie ophogen (lopende renders bewaren dan niets meer), daarna de oude sleutels opruimen
+            old = {user_id: self.generation(user_id) for user_id in user_ids}
+            self.backend.bump(*(str(user_id) for user_id in user_ids))
+            self.backend.delete(*(self.key(user_id, view, generation)
+                                  for user_id, generation in old.items() for view in DASHBOARD_VIEWS))
+        except Exception as e:
+            logger.warning(f"Fragmentcache invalideren mislukt voor {user_ids}: {e}")
+        logger.debug(f"Fragmentcache ongeldig gemaakt voor gebruikers {user_ids}")
+
+    def clear(self):
+        #    Verwijder alle fragmenten (bijv. na een wijziging in de oefeningencatalogus).
+        try:
+            self.backend.bump(GLOBAL_GENERATION)
+            self.backend.clear()
+        except Exception as e:
+            logger.warning(f"Fragmentcache legen mislukt: {e}")
+
+    def stats(self):
+        #    Hit/miss-tellers van dit proces.
+        total = self.hits + self.misses
+        return {
+            'backend': self.backend.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else None,
+        }
+
+
+fragment_cache = FragmentCache()
+
+
+def _plan_owner(session, obj):
+    # Eigenaar (user_id) van een gewijzigd plan of planoefening
+    from app.models import WorkoutPlan  # Import hier om circulaire imports te vermijden
+    if isinstance(obj, WorkoutPlan):
+        return obj.user_id
+    plan = obj.workout_plan if 'workout_plan' in obj.__dict__ else None
+    if plan is None and obj.workout_plan_id is not None:
+        with session.no_autoflush:
+            plan = session.get(WorkoutPlan, obj.workout_plan_id)
+    return plan.user_id if plan is not None else None
+
+
+def mark_plans_changed(session, *user_ids):
+    #    Markeer plannen van gebruikers als gewijzigd voor wijzigingen buiten de unit of work om (bulk-statements).
+    session.info.setdefault('fragment_users', set()).update(user_ids)
+
+
+@sa.event.listens_for(so.Session, 'before_flush')
+def _track_plan_changes(session, flush_context, instances):
+    # Onthoud welke gebruikers een gewijzigd plan hebben; invalideren gebeurt pas na de commit
+    from app.models import Exercise, WorkoutPlan, WorkoutPlanExercise  # Import hier om circulaire imports te vermijden
+    changed = itertools.chain(session.new, session.dirty, session.deleted)
+    users = session.info.setdefault('fragment_users', set())
+    for obj in changed:
+        if isinstance(obj, (WorkoutPlan, WorkoutPlanExercise)):
+            owner = _plan_owner(session, obj)
+            if owner is not None:
+                users.add(owner)
+        elif isinstance(obj, Exercise):
+            # Oefeningnamen staan in de fragmenten van alle gebruikers
+            session.info['fragment_clear'] = True
+
+
+@sa.event.listens_for(so.Session, 'after_commit')
+def _invalidate_fragments_after_commit(session):
+    users = session.info.pop('fragment_users', None)
+    if session.info.pop('fragment_clear', False):
+        fragment_cache.clear()
+    elif users:
+        fragment_cache.invalidate(*users)
+
+
+@sa.event.listens_for(so.Session, 'after_rollback')
+def _reset_fragments_after_rollback(session):
+    session.info.pop('fragment_users', None)
+    session.info.pop('fragment_clear', None)
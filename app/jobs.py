@@ -0,0 +1,262 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+import click
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from flask.cli import with_appcontext
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    Achtergrondtaken met de jobs-tabel als duurzame wachtrij en een pool van worker-threads per proces.
+    Notities:
+        - enqueue() voegt de taak toe aan de lopende transactie: de taak bestaat alleen als het werk dat
+          haar veroorzaakt gecommit is, en gaat bij een crash niet verloren.
+        - Workers claimen een taak met een voorwaardelijke UPDATE (status 'queued' -> 'running'), zodat meerdere
+          threads of processen dezelfde taak nooit tegelijk oppakken.
+        - Het werk van een taak en de status 'done' worden in één transactie gecommit, alleen zolang de worker de
+          claim nog heeft (een andere worker kan een taak met een verlopen lease opnieuw claimen). Een mislukte poging
+          wordt met exponentiële backoff opnieuw ingepland; na max_attempts wordt de status 'failed'.
+        - JOBS_WORKERS=0 zet de threads uit; taken draaien dan alleen via 'flask jobs drain' (bijv. in tests).
+    """
+
+    def __init__(self, app=None):
+        self.handlers = {}
+        self.app = None
+        self.workers = 2
+        self.poll_seconds = 5
+        self.lease_seconds = 300
+        self.retry_seconds = 10
+        self._threads = []
+        self._wake = threading.Event()
+        self._start_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get('JOBS_WORKERS', 2)
+        self.poll_seconds = app.config.get('JOBS_POLL_SECONDS', 5)
+        self.lease_seconds = app.config.get('JOBS_LEASE_SECONDS', 300)
+        self.retry_seconds = app.config.get('JOBS_RETRY_SECONDS', 10)
+        app.extensions['jobs'] = self
+        # Workers pas bij het eerste request starten, niet bij CLI-commando's zoals 'flask db upgrade'
+        app.before_request(self.start)
+        app.cli.add_command(jobs_cli)
+
+    def handler(self, kind, max_attempts=5):
+        #    Decorator: registreer de functie die taken van dit soort uitvoert (payload als keyword-argumenten).
+        def register(func):
+            self.handlers[kind] = (func, max_attempts)
+            return func
+        return register
+
+    def enqueue(self, kind, payload, user_id=None):
+        """
+        Plan een taak in binnen de lopende transactie; de workers worden na de commit gewekt.
+        Notities:
+            - payload moet JSON-serialiseerbaar zijn (datums als ISO-string).
+            - Commit gebeurt door de aanroeper.
+        Returns:
+            Job: De nieuwe (nog niet geflushte) taak.
+        """
+        from app import db  # Import hier om circulaire imports te vermijden
+        from app.models import Job
+        if kind not in self.handlers:
+            raise ValueError(f"Onbekend taaktype '{kind}'")
+        job = Job(kind=kind, payload=payload, user_id=user_id, status='queued', attempts=0,
+                  max_attempts=self.handlers[kind][1], run_after=datetime.now(timezone.utc))
+        db.session.add(job)
+        db.session.info['jobs_enqueued'] = True
+        return job
+
+    def wake(self):
+        self._wake.set()
+
+    def start(self):
+        # Start de worker-threads van dit proces (eenmalig)
+        if self._threads or self.workers <= 0 or self.app is None:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'jobs-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Achtergrondtaken: {self.workers} workers gestart")
+
+    def _work(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    ran = self.run_next()
+            except Exception as e:
+                logger.error(f"Achtergrondtaken: worker-fout: {e}")
+                ran = False
+            if not ran:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def _runnable(self, now, due):
+        from app.models import Job
+        return sa.or_(
+            sa.and_(Job.status == 'queued', Job.run_after <= due),
+            # Poging van een gecrashte worker: lease verlopen
+            sa.and_(Job.status == 'running', Job.locked_at < now - timedelta(seconds=self.lease_seconds)),
+        )
+
+    def claim(self, ignore_delay=False):
+        #    Claim de volgende uitvoerbare taak (of None); ignore_delay pakt ook ingeplande herhalingen.
+        from app import db  # Import hier om circulaire imports te vermijden
+        from app.models import Job
+        now = datetime.now(timezone.utc)
+        due = datetime.max.replace(tzinfo=timezone.utc) if ignore_delay else now
+        candidates = db.session.scalars(
+            sa.select(Job.id).where(self._runnable(now, due)).order_by(Job.run_after, Job.id).limit(5)
+        ).all()
+        for job_id in candidates:
+            claimed = db.session.execute(
+                sa.update(Job)
+                .where(Job.id == job_id, self._runnable(now, due))
+                .values(status='running', attempts=Job.attempts + 1, locked_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, job_id)
+        return None
+
+    def _claimed(self, job_id, claimed_at):
+        # Deze poging heeft de taak nog: na een verlopen lease kan een andere worker haar opnieuw geclaimd hebben
+        from app.models import Job
+        return sa.and_(Job.id == job_id, Job.status == 'running', Job.locked_at == claimed_at)
+
+    def run(self, job):
+        """
+        Voer een geclaimde taak uit; werk en status in één transactie, of opnieuw inplannen bij een fout.
+        Notities:
+            - De status wordt alleen bijgewerkt zolang deze worker de claim nog heeft (zie _claimed); is de
+              taak intussen door een andere worker opgepakt, dan wordt het werk teruggedraaid ('lost').
+        """
+        from app import db  # Import hier om circulaire imports te vermijden
+        from app.models import Job
+        job_id, kind, attempts, max_attempts = job.id, job.kind, job.attempts, job.max_attempts
+        # locked_at zoals opgeslagen (en teruggelezen), zodat de vergelijking ook klopt bij afgeronde seconden
+        claimed_at = job.locked_at
+        try:
+            if kind not in self.handlers:
+                raise LookupError(f"Geen handler voor taaktype '{kind}'")
+            func, _ = self.handlers[kind]
+            func(**job.payload)
+            finished = db.session.execute(
+                sa.update(Job).where(self._claimed(job_id, claimed_at))
+                .values(status='done', finished_at=datetime.now(timezone.utc), locked_at=None, last_error=None)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not finished:
+                db.session.rollback()
+                logger.warning(f"Taak {job_id} ({kind}): claim verloren (lease verlopen), werk teruggedraaid")
+                return 'lost'
+            db.session.commit()
+            logger.debug(f"Taak {job_id} ({kind}) uitgevoerd")
+            return 'done'
+        except Exception as e:
+            db.session.rollback()
+            now = datetime.now(timezone.utc)
+            if attempts >= max_attempts or isinstance(e, LookupError):
+                values = {'status': 'failed', 'finished_at': now}
+            else:
+                values = {'status': 'queued', 'run_after': now + timedelta(seconds=self.retry_seconds * 2 ** (attempts - 1))}
+            updated = db.session.execute(
+                sa.update(Job).where(self._claimed(job_id, claimed_at))
+                .values(locked_at=None, last_error=f'{type(e).__name__}: {e}'[:2000], **values)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            if not updated:
+                logger.warning(f"Taak {job_id} ({kind}): claim verloren (lease verlopen), status niet bijgewerkt")
+                return 'lost'
+            logger.error(f"Taak {job_id} ({kind}) poging {attempts}/{max_attempts} mislukt: {e}")
+            return values['status']
+
+    def run_next(self, ignore_delay=False):
+        #    Claim en voer één taak uit; None als er niets te doen is, anders de nieuwe status.
+        job = self.claim(ignore_delay)
+        return self.run(job) if job is not None else None
+
+    def drain(self, ignore_delay=True):
+        """
+        Voer in de huidige thread taken uit tot de wachtrij leeg is (voor tests en beheer).
+        Notities:
+            - ignore_delay: ook ingeplande herhalingen meteen uitvoeren; een taak die blijft falen stopt
+              na max_attempts.
+        Returns:
+            dict: Aantal taken per eindstatus van de uitgevoerde pogingen.
+        """
+        results = {}
+        while True:
+            status = self.run_next(ignore_delay)
+            if status is None:
+                return results
+            results[status] = results.get(status, 0) + 1
+
+    def counts(self):
+        #    Aantal taken per status.
+        from app import db  # Import hier om circulaire imports te vermijden
+        from app.models import Job
+        return dict(db.session.execute(sa.select(Job.status, sa.func.count(Job.id)).group_by(Job.status)).all())
+
+
+job_queue = JobQueue()
+
+
+@sa.event.listens_for(so.Session, 'after_commit')
+def _wake_workers_after_commit(session):
+    if session.info.pop('jobs_enqueued', False):
+        job_queue.start()
+        job_queue.wake()
+
+
+@sa.event.listens_for(so.Session, 'after_rollback')
+def _reset_jobs_after_rollback(session):
+    session.info.pop('jobs_enqueued', None)
+
+
+@click.group('jobs')
+def jobs_cli():
+    """Beheer achtergrondtaken."""
+
+
+@jobs_cli.command('drain')
+@click.option('--due-only', is_flag=True, help='Ingeplande herhalingen niet vervroegen.')
+@with_appcontext
+def drain_command(due_only):
+    """Voer alle openstaande taken nu uit in dit proces."""
+    results = job_queue.drain(ignore_delay=not due_only)
+    click.echo(', '.join(f'{status}: {count}' for status, count in sorted(results.items())) or 'Geen taken')
+
+
+@jobs_cli.command('status')
+@with_appcontext
+def status_command():
+    """Toon het aantal taken per status."""
+    for status, count in sorted(job_queue.counts().items()):
+        click.echo(f'{status}: {count}')
+
+
+@jobs_cli.command('retry-failed')
+@with_appcontext
+def retry_failed_command():
+    """Zet mislukte taken terug in de wachtrij."""
+    from app import db  # Import hier om circulaire imports te vermijden
+    from app.models import Job
+    count = db.session.execute(
+        sa.update(Job).where(Job.status == 'failed')
+        .values(status='queued', attempts=0, finished_at=None, run_after=datetime.now(timezone.utc))
+    ).rowcount
+    db.session.commit()
+    click.echo(f"{count} taken opnieuw ingepland")
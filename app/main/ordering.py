@@ -0,0 +1,109 @@
+import logging
+import sqlalchemy as sa
+from app import db
+from app.models import WorkoutPlanExercise
+
+logger = logging.getLogger(__name__)
+
+# Afstand tussen opeenvolgende volgorde-sleutels; laat ruimte om ~10 keer te halveren
+ORDER_GAP = 1024
+
+
+class MoveError(ValueError):
+    #    Ongeldige verplaatsing; de (vaste) boodschap is bedoeld voor de client (HTTP 400).
+    pass
+
+
+def key_between(before, after):
+    """
+    Volgorde-sleutel tussen twee buren (gap-based ordering).
+    Notities:
+        - before/after zijn de sleutels van de buren op de doelpositie (None aan het begin/einde).
+        - Geeft None als er geen geheel getal meer tussen past; dan is rebalance_plan nodig.
+    """
+    if before is None and after is None:
+        return 0
+    if before is None:
+        return after - ORDER_GAP
+    if after is None:
+        return before + ORDER_GAP
+    if after - before < 2:
+        return None
+    return (before + after) // 2
+
+
+def next_order_key(plan_id):
+    #    Sleutel voor een nieuwe oefening achteraan het plan.
+    last = db.session.scalar(
+        sa.select(sa.func.max(WorkoutPlanExercise.order)).where(WorkoutPlanExercise.workout_plan_id == plan_id)
+    )
+    return key_between(last, None)
+
+
+def rebalance_plan(plan_id):
+    """
+    Verdeel de volgorde-sleutels van een plan opnieuw met ORDER_GAP ertussen.
+    Notities:
+        - Eén bulk UPDATE ... FROM met row_number() over de huidige volgorde, zonder rijen naar
+          Python te halen; alleen nodig als er tussen twee buren geen ruimte meer is.
+        - De subquery wordt vóór de update geëvalueerd, zodat de rangen niet verschuiven tijdens het schrijven.
+    """
+    ranked = (
+        sa.select(
+            WorkoutPlanExercise.id.label('id'),
+            (sa.func.row_number().over(order_by=(WorkoutPlanExercise.order, WorkoutPlanExercise.id)) - 1).label('rank')
+        )
+        .where(WorkoutPlanExercise.workout_plan_id == plan_id)
+        .subquery()
+    )
+    db.session.execute(
+        sa.update(WorkoutPlanExercise)
+        .where(WorkoutPlanExercise.id == ranked.c.id)
+        .values(order=ranked.c.rank * ORDER_GAP)
+        .execution_options(synchronize_session='fetch')
+    )
+    logger.debug(f"Volgorde van plan {plan_id} opnieuw verdeeld")
+
+
+def move_plan_exercise(plan_exercise, before_id=None, after_id=None):
+    """
+    Verplaats een planoefening tussen twee buren door alleen haar eigen sleutel te wijzigen.
+
+    Args:
+        plan_exercise: De te verplaatsen WorkoutPlanExercise.
+        before_id: ID van de planoefening die erboven komt te staan (None = bovenaan).
+        after_id: ID van de planoefening die eronder komt te staan (None = onderaan).
+    Returns:
+        dict: Gewijzigde volgorde-sleutels per planoefening-ID (alle rijen van het plan na een rebalance).
+    """
+    def neighbour_keys():
+        ids = [i for i in (before_id, after_id) if i is not None]
+        keys = dict(db.session.execute(
+            sa.select(WorkoutPlanExercise.id, WorkoutPlanExercise.order).where(
+                WorkoutPlanExercise.workout_plan_id == plan_exercise.workout_plan_id,
+                WorkoutPlanExercise.id.in_(ids)
+            )
+        ).all()) if ids else {}
+        if any(i not in keys for i in ids):
+            raise MoveError('Buur hoort niet bij dit plan')
+        return keys.get(before_id), keys.get(after_id)
+
+    if plan_exercise.id in (before_id, after_id):
+        raise MoveError('Een oefening kan niet naast zichzelf geplaatst worden')
+    before, after = neighbour_keys()
+    if before is not None and after is not None and before >= after:
+        raise MoveError('Buren staan in de verkeerde volgorde')
+    key = key_between(before, after)
+    if key is not None:
+        plan_exercise.order = key
+        return {plan_exercise.id: key}
+
+    # Geen ruimte meer: eenmalig herverdelen en opnieuw proberen
+    rebalance_plan(plan_exercise.workout_plan_id)
+    before, after = neighbour_keys()
+    plan_exercise.order = key_between(before, after)
+    db.session.flush()
+    return dict(db.session.execute(
+        sa.select(WorkoutPlanExercise.id, WorkoutPlanExercise.order)
+        .where(WorkoutPlanExercise.workout_plan_id == plan_exercise.workout_plan_id)
+    ).all())
@@ -0,0 +1,65 @@
+import logging
+import re
+import sqlalchemy as sa
+from app import db
+from app.models import WorkoutPlan, WorkoutPlanExercise
+
+logger = logging.getLogger(__name__)
+
+# Maximale lengte van een plannaam (zoals in WorkoutPlanForm)
+MAX_NAME_LENGTH = 50
+
+# Kolommen van een planoefening die naar de kopie meegaan (alles behalve id en workout_plan_id)
+COPIED_COLUMNS = ('exercise_id', 'sets', 'reps', 'duration', 'order', 'weight')
+
+
+def copy_name(name):
+    """
+    Standaardnaam voor een kopie van een plan.
+    Notities:
+        - Eindigt de naam op een losse hoofdletter, dan schuift die één letter op ("Push A" -> "Push B").
+        - Anders wordt " (kopie)" toegevoegd, ingekort tot MAX_NAME_LENGTH.
+    """
+    match = re.fullmatch(r'(.*\s)([A-Y])', name)
+    if match:
+        return match.group(1) + chr(ord(match.group(2)) + 1)
+    suffix = ' (kopie)'
+    return name[:MAX_NAME_LENGTH - len(suffix)] + suffix
+
+
+def duplicate_plan(source, user_id, name=None):
+    """
+    Kopieer een plan met al zijn oefeningen, volledig aan de databasekant.
+    Notities:
+        - Het nieuwe plan is één INSERT; de oefeningen worden met één INSERT ... SELECT
+          gekopieerd zonder de rijen naar Python te halen, ongeacht het aantal oefeningen.
+        - Volgorde-sleutels, sets, reps en gewicht blijven gelijk; de kopie is nooit gearchiveerd,
+          zodat een gearchiveerd plan als sjabloon kan dienen.
+        - Commit gebeurt door de aanroeper.
+
+    Args:
+        source: Het WorkoutPlan dat gekopieerd wordt.
+        user_id: Eigenaar van de kopie.
+        name: Optionele naam; standaard copy_name(source.name).
+    Returns:
+        WorkoutPlan: Het nieuwe (geflushte) plan.
+    """
+    name = (name or '').strip() or copy_name(source.name)
+    if not 2 <= len(name) <= MAX_NAME_LENGTH:
+        raise ValueError(f"De naam moet tussen 2 en {MAX_NAME_LENGTH} tekens lang zijn")
+
+    plan = WorkoutPlan(user_id=user_id, name=name, is_archived=False)
+    db.session.add(plan)
+    db.session.flush()
+
+    table = WorkoutPlanExercise.__table__
+    db.session.execute(
+        sa.insert(table).from_select(
+            ('workout_plan_id',) + COPIED_COLUMNS,
+            sa.select(sa.literal(plan.id), *(table.c[column] for column in COPIED_COLUMNS))
+            .where(table.c.workout_plan_id == source.id)
+            .order_by(table.c.order, table.c.id)
+        )
+    )
+    logger.debug(f"Plan {source.id} gekopieerd naar plan {plan.id} ('{name}')")
+    return plan
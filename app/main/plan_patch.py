@@ -0,0 +1,210 @@
+import logging
+import sqlalchemy as sa
+from app import db
+from app.fragment_cache import mark_plans_changed
+from app.main.ordering import ORDER_GAP
+from app.models import SetLog, WorkoutPlanExercise
+
+logger = logging.getLogger(__name__)
+
+# Velden van een planoefening die via een patch gewijzigd mogen worden
+EDITABLE_FIELDS = {'sets': int, 'reps': int, 'weight': float}
+# Standaardwaarden voor een nieuwe planoefening (ook gebruikt door add_exercise_to_workout)
+DEFAULT_FIELDS = {'sets': 3, 'reps': 10, 'weight': 0.0}
+
+OPERATIONS = ('add', 'update', 'remove', 'reorder')
+
+
+class PlanPatchError(ValueError):
+    #    Ongeldige plan-patch; de boodschap is bedoeld voor de client (HTTP 400).
+    pass
+
+
+def _clean_fields(data):
+    # Valideer en converteer sets/reps/weight; ontbrekende velden blijven weg
+    fields = {}
+    for field, cast in EDITABLE_FIELDS.items():
+        if data.get(field) is None:
+            continue
+        try:
+            value = cast(data[field])
+        except (TypeError, ValueError):
+            raise PlanPatchError(f"Ongeldige waarde voor {field}: {data[field]!r}")
+        if value < 0:
+            raise PlanPatchError(f"{field} mag niet negatief zijn")
+        fields[field] = value
+    return fields
+
+
+def _exercise_id(data, catalog):
+    # Controleer dat de oefening in de catalogus bestaat
+    exercise_id = str(data.get('exercise_id') or '')
+    if exercise_id not in catalog.by_id:
+        raise PlanPatchError(f"Onbekende oefening: {data.get('exercise_id')!r}")
+    return exercise_id
+
+
+def _row_id(data, rows_by_id):
+    # ID van een bestaande planoefening binnen dit plan
+    try:
+        row_id = int(data.get('id'))
+    except (TypeError, ValueError):
+        raise PlanPatchError(f"Ongeldig id: {data.get('id')!r}")
+    if row_id not in rows_by_id:
+        raise PlanPatchError(f"Oefening {row_id} hoort niet bij dit plan")
+    return row_id
+
+
+def _new_row(data, catalog):
+    # Ontbrekende velden krijgen dezelfde standaardwaarden als bij toevoegen via het formulier
+    return {'id': None, 'exercise_id': _exercise_id(data, catalog), **DEFAULT_FIELDS, **_clean_fields(data)}
+
+
+def desired_state(current, payload, catalog):
+    """
+    Bereken de gewenste lijst planoefeningen uit een patch.
+    Notities:
+        - payload['exercises']: volledige gewenste staat (rijen met 'id' blijven bestaan, zonder 'id' zijn nieuw).
+        - payload['operations']: lijst van add/update/remove/reorder, in volgorde toegepast.
+        - Met alleen payload['name'] (geen exercises of operations) blijft de huidige lijst ongewijzigd.
+        - De volgorde van de teruggegeven lijst is de nieuwe volgorde van het plan.
+    Returns:
+        list: Dicts met id (None voor nieuwe rijen), exercise_id, sets, reps en weight.
+    """
+    rows_by_id = {row['id']: row for row in current}
+
+    if 'exercises' in payload:
+        if not isinstance(payload['exercises'], list):
+            raise PlanPatchError("'exercises' moet een lijst zijn")
+        desired, seen = [], set()
+        for item in payload['exercises']:
+            if not isinstance(item, dict):
+                raise PlanPatchError("Elke oefening moet een object zijn")
+            if item.get('id') is None:
+                desired.append(_new_row(item, catalog))
+                continue
+            row_id = _row_id(item, rows_by_id)
+            if row_id in seen:
+                raise PlanPatchError(f"Oefening {row_id} komt dubbel voor")
+            seen.add(row_id)
+            desired.append({**rows_by_id[row_id], **_clean_fields(item)})
+        return desired
+
+    operations = payload.get('operations')
+    if operations is None and payload.get('name') is not None:
+        # Alleen hernoemen: de huidige oefeningen blijven staan
+        operations = []
+    if not isinstance(operations, list):
+        raise PlanPatchError("Geef 'exercises' (volledige staat) of 'operations' (lijst) mee")
+    desired = [dict(row) for row in current]
+    for operation in operations:
+        op = operation.get('op') if isinstance(operation, dict) else None
+        if op not in OPERATIONS:
+            raise PlanPatchError(f"Onbekende operatie: {op!r}")
+        if op == 'add':
+            row = _new_row(operation, catalog)
+            try:
+                position = len(desired) if operation.get('position') is None else int(operation['position'])
+            except (TypeError, ValueError):
+                raise PlanPatchError(f"Ongeldige positie: {operation.get('position')!r}")
+            desired.insert(position, row)
+            continue
+        if op == 'reorder':
+            ids = operation.get('ids')
+            if not isinstance(ids, list):
+                raise PlanPatchError("'reorder' verwacht een lijst 'ids'")
+            rank = {_row_id({'id': row_id}, rows_by_id): idx for idx, row_id in enumerate(ids)}
+            # Genoemde rijen in de opgegeven volgorde; overige rijen behouden hun onderlinge volgorde erachter
+            desired.sort(key=lambda row: rank.get(row['id'], len(rank)))
+            continue
+        row_id = _row_id(operation, rows_by_id)
+        index = next((idx for idx, row in enumerate(desired) if row['id'] == row_id), None)
+        if index is None:
+            raise PlanPatchError(f"Oefening {row_id} is al verwijderd")
+        if op == 'remove':
+            desired.pop(index)
+        else:
+            desired[index].update(_clean_fields(operation))
+    return desired
+
+
+def delete_plan_exercises(ids):
+    #    Verwijder planoefeningen in bulk; gelogde sets blijven bestaan maar worden losgekoppeld (ON DELETE SET NULL).
+    db.session.execute(
+        sa.update(SetLog).where(SetLog.workout_plan_exercise_id.in_(ids))
+        .values(workout_plan_exercise_id=None)
+    )
+    db.session.execute(sa.delete(WorkoutPlanExercise).where(WorkoutPlanExercise.id.in_(ids)))
+
+
+def apply_plan_patch(plan, payload, catalog):
+    """
+    Pas een plan-patch toe als één diff in één transactie.
+    Notities:
+        - Eén SELECT voor de huidige staat, daarna hooguit één bulk DELETE, één bulk UPDATE
+          (executemany op primary key) en één bulk INSERT (plus één SELECT voor de nieuwe IDs);
+          het aantal statements hangt niet af van het aantal oefeningen.
+        - Sets die naar een verwijderde planoefening verwijzen, worden losgekoppeld (ON DELETE SET NULL).
+        - Commit gebeurt door de aanroeper.
+    Returns:
+        list: De nieuwe staat van het plan (dicts met id, exercise_id, sets, reps, weight, order).
+    """
+    columns = (WorkoutPlanExercise.id, WorkoutPlanExercise.exercise_id, WorkoutPlanExercise.sets,
+               WorkoutPlanExercise.reps, WorkoutPlanExercise.weight, WorkoutPlanExercise.order)
+    current = [
+        row._asdict() for row in db.session.execute(
+            sa.select(*columns)
+            .where(WorkoutPlanExercise.workout_plan_id == plan.id)
+            .order_by(WorkoutPlanExercise.order, WorkoutPlanExercise.id)
+        )
+    ]
+    desired = desired_state(current, payload, catalog)
+
+    if payload.get('name') is not None:
+        name = str(payload['name']).strip()
+        if not 2 <= len(name) <= 50:
+            raise PlanPatchError("De naam moet tussen 2 en 50 tekens lang zijn")
+        plan.name = name
+
+    current_by_id = {row['id']: row for row in current}
+    kept = {row['id'] for row in desired if row['id'] is not None}
+    removed = [row_id for row_id in current_by_id if row_id not in kept]
+
+    updates, inserts = [], []
+    for position, row in enumerate(desired):
+        # Volgorde-sleutels met tussenruimte, zodat latere verplaatsingen één rij raken
+        row['order'] = position * ORDER_GAP
+        if row['id'] is None:
+            inserts.append(row)
+            continue
+        before = current_by_id[row['id']]
+        fields = ('sets', 'reps', 'weight', 'order')
+        if any(row[key] != before[key] for key in fields):
+            # Altijd dezelfde kolommen, zodat alle updates in één executemany passen
+            updates.append({'id': row['id'], **{key: row[key] for key in fields}})
+
+    if removed:
+        delete_plan_exercises(removed)
+    if updates:
+        # ORM bulk UPDATE op primary key: één executemany
+        db.session.execute(sa.update(WorkoutPlanExercise), updates)
+    if inserts:
+        # Eén executemany; de nieuwe IDs volgen uit één SELECT op de (unieke) volgorde binnen het plan
+        db.session.execute(
+            sa.insert(WorkoutPlanExercise.__table__),
+            [{'workout_plan_id': plan.id, **{k: v for k, v in row.items() if k != 'id'}} for row in inserts]
+        )
+        new_ids = dict(db.session.execute(
+            sa.select(WorkoutPlanExercise.order, WorkoutPlanExercise.id).where(
+                WorkoutPlanExercise.workout_plan_id == plan.id,
+                WorkoutPlanExercise.order.in_([row['order'] for row in inserts])
+            )
+        ).all())
+        for row in inserts:
+            row['id'] = new_ids.get(row['order'])
+
+    if removed or updates or inserts:
+        # Bulk-statements passeren before_flush niet; markeer de dashboard-fragmenten zelf
+        mark_plans_changed(db.session, plan.user_id)
+    logger.debug(f"Plan {plan.id} gepatcht: {len(inserts)} toegevoegd, {len(updates)} bijgewerkt, {len(removed)} verwijderd")
+    return desired
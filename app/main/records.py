@@ -0,0 +1,198 @@
+import logging
+from datetime import datetime, timezone
+import click
+import numpy as np
+import sqlalchemy as sa
+from flask.cli import with_appcontext
+from app import db
+from app.models import PersonalRecord, SetLog, User, WorkoutSession
+from app.main.utils import upsert_statement
+from app.jobs import job_queue
+
+logger = logging.getLogger(__name__)
+
+# Recordkolommen per soort; 'at' is het tijdstip waarop het record gezet is. De kolommen waarop
+# vergeleken wordt staan achteraan (MySQL past ON DUPLICATE KEY-toewijzingen op volgorde toe)
+RECORD_COLUMNS = {
+    'weight': ('best_weight_session_id', 'best_weight_at', 'reps_at_best_weight', 'best_weight'),
+    'e1rm': ('best_e1rm_weight', 'best_e1rm_reps', 'best_e1rm_session_id', 'best_e1rm_at', 'best_e1rm'),
+    'volume': ('best_volume_session_id', 'best_volume_at', 'best_volume'),
+}
+UPDATE_COLUMNS = tuple(column for columns in RECORD_COLUMNS.values() for column in columns) + ('updated_at',)
+
+# Wanneer een nieuwe waarde het bestaande record verslaat (bestaand, nieuw: kolommen van tabel en upsert)
+RECORD_CONDITIONS = {
+    'weight': lambda old, new: sa.or_(
+        old.best_weight.is_(None), new.best_weight > old.best_weight,
+        sa.and_(new.best_weight == old.best_weight, new.reps_at_best_weight > old.reps_at_best_weight),
+    ),
+    'e1rm': lambda old, new: sa.or_(old.best_e1rm.is_(None), new.best_e1rm > old.best_e1rm),
+    'volume': lambda old, new: sa.or_(old.best_volume.is_(None), new.best_volume > old.best_volume),
+}
+UPDATE_WHEN = {column: RECORD_CONDITIONS[kind] for kind, columns in RECORD_COLUMNS.items() for column in columns}
+
+
+def estimated_1rm(weight, reps):
+    #    Geschatte 1RM volgens Epley; een enkele herhaling is het gewicht zelf.
+    return weight * (1 + reps / 30) if reps > 1 else weight
+
+
+def _empty_record(user_id, exercise_id):
+    return {'user_id': user_id, 'exercise_id': exercise_id, **{column: None for column in UPDATE_COLUMNS}}
+
+
+def update_personal_records(user_id, session_id, now=None):
+    """
+    Neem een voltooide sessie op in de persoonlijke records.
+    Notities:
+        - Draait pas na complete_workout (achtergrondtaak 'personal_records'): tussentijdse invoer van een
+          lopende workout (bijv. een typefout die later verbeterd wordt) kan zo nooit een record worden.
+        - De kandidaten komen uit de sets van deze ene sessie (één query), niet uit de hele historie.
+        - De vergelijking met het bestaande record gebeurt in de upsert zelf (CASE WHEN per recordsoort):
+          records gaan alleen omhoog, ook als twee taken van dezelfde gebruiker tegelijk lopen, en opnieuw
+          uitvoeren (retry) verandert niets. Commit gebeurt door de aanroeper.
+    Returns:
+        int: Aantal oefeningen met kandidaat-records uit deze sessie.
+    """
+    now = now or datetime.now(timezone.utc)
+    sets = db.session.execute(
+        sa.select(SetLog.exercise_id, SetLog.reps, SetLog.weight, SetLog.completed_at).where(
+            SetLog.workout_session_id == session_id, SetLog.completed.is_(True), SetLog.reps > 0
+        )
+    ).all()
+    if not sets:
+        return 0
+
+    # Beste waarden van deze sessie per oefening
+    candidates = {}
+    for exercise_id, reps, weight, completed_at in sets:
+        record = candidates.get(exercise_id)
+        if record is None:
+            record = candidates[exercise_id] = _empty_record(user_id, exercise_id)
+            record.update(best_volume=0.0, best_volume_session_id=session_id, best_volume_at=now, updated_at=now)
+        at = completed_at or now
+        record['best_volume'] += reps * weight
+        if record['best_weight'] is None or (weight, reps) > (record['best_weight'], record['reps_at_best_weight']):
+            record.update(best_weight=weight, reps_at_best_weight=reps, best_weight_session_id=session_id, best_weight_at=at)
+        e1rm = estimated_1rm(weight, reps)
+        if record['best_e1rm'] is None or e1rm > record['best_e1rm']:
+            record.update(best_e1rm=e1rm, best_e1rm_weight=weight, best_e1rm_reps=reps,
+                          best_e1rm_session_id=session_id, best_e1rm_at=at)
+
+    db.session.execute(
+        upsert_statement(PersonalRecord.__table__, ('user_id', 'exercise_id'), UPDATE_COLUMNS, update_when=UPDATE_WHEN),
+        list(candidates.values())
+    )
+    logger.debug(f"Records bijgewerkt voor gebruiker {user_id}, sessie {session_id}: {len(candidates)} oefeningen")
+    return len(candidates)
+
+
+@job_queue.handler('personal_records')
+def personal_records_job(user_id, session_id):
+    #    Achtergrondtaak na complete_workout: records bijwerken met de sets van de voltooide sessie.
+    update_personal_records(user_id, session_id)
+
+
+def _last_per_group(groups, *keys):
+    # Index van het maximum per groep: sorteer op (groep, keys...) en neem de laatste positie van elke groep
+    order = np.lexsort(tuple(reversed(keys)) + (groups,))
+    sorted_groups = groups[order]
+    ends = np.append(np.nonzero(np.diff(sorted_groups))[0], len(order) - 1)
+    return sorted_groups[ends], order[ends]
+
+
+def _timestamp(value):
+    # SQLite geeft naïeve datums terug; die zijn als UTC opgeslagen
+    if value is None:
+        return -np.inf
+    return (value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value).timestamp()
+
+
+def compute_personal_records(user_id, history):
+    """
+    Bereken alle records van een gebruiker in één keer uit de volledige set-historie (gevectoriseerd met NumPy).
+    Notities:
+        - history: rijen (exercise_id, workout_session_id, reps, weight, completed_at) van voltooide sets.
+        - Zwaarste set en beste e1RM via lexsort per oefening; sessievolume via bincount over
+          (oefening, sessie)-paren. Sets zonder sessie tellen niet mee voor volume.
+    Returns:
+        list: Record-dicts (kolommen van PersonalRecord), één per oefening.
+    """
+    if not history:
+        return []
+    exercise_ids, session_ids, reps, weight, completed_at = zip(*history)
+    exercise_codes, exercises = np.unique(np.array(exercise_ids, dtype=object).astype(str), return_inverse=True)
+    reps = np.asarray(reps, dtype=np.int64)
+    weight = np.asarray(weight, dtype=np.float64)
+    e1rm = np.where(reps > 1, weight * (1 + reps / 30), weight)
+
+    now = datetime.now(timezone.utc)
+    records = {code: _empty_record(user_id, str(exercise_codes[code])) for code in range(len(exercise_codes))}
+    for code, index in zip(*_last_per_group(exercises, weight, reps)):
+        records[int(code)].update(
+            best_weight=float(weight[index]), reps_at_best_weight=int(reps[index]),
+            best_weight_session_id=session_ids[index], best_weight_at=completed_at[index],
+        )
+    for code, index in zip(*_last_per_group(exercises, e1rm)):
+        records[int(code)].update(
+            best_e1rm=float(e1rm[index]), best_e1rm_weight=float(weight[index]), best_e1rm_reps=int(reps[index]),
+            best_e1rm_session_id=session_ids[index], best_e1rm_at=completed_at[index],
+        )
+
+    in_session = np.array([session_id is not None for session_id in session_ids], dtype=bool)
+    if in_session.any():
+        session_codes, sessions = np.unique(
+            np.array([session_ids[i] for i in np.nonzero(in_session)[0]], dtype=object).astype(str), return_inverse=True
+        )
+        pairs, pair_index = np.unique(exercises[in_session] * len(session_codes) + sessions, return_inverse=True)
+        volume = np.bincount(pair_index, weights=(reps * weight)[in_session])
+        # Tijdstip van een volumerecord: laatste voltooide set van die oefening in die sessie
+        stamps = np.array([_timestamp(value) for value, keep in zip(completed_at, in_session) if keep])
+        last_stamp = np.full(len(pairs), -np.inf)
+        np.maximum.at(last_stamp, pair_index, stamps)
+        for code, index in zip(*_last_per_group(pairs // len(session_codes), volume)):
+            stamp = last_stamp[index]
+            records[int(code)].update(
+                best_volume=float(volume[index]),
+                best_volume_session_id=str(session_codes[pairs[index] % len(session_codes)]),
+                best_volume_at=datetime.fromtimestamp(stamp, timezone.utc) if np.isfinite(stamp) else None,
+            )
+
+    for record in records.values():
+        record['updated_at'] = now
+    return list(records.values())
+
+
+def backfill_personal_records(user_id):
+    #    Herbereken de records van één gebruiker: één query voor de historie, één DELETE en één bulk INSERT.
+    #    Sets van nog lopende workouts tellen (net als bij de incrementele update) niet mee.
+    history = db.session.execute(
+        sa.select(SetLog.exercise_id, SetLog.workout_session_id, SetLog.reps, SetLog.weight, SetLog.completed_at)
+        .outerjoin(WorkoutSession, WorkoutSession.id == SetLog.workout_session_id)
+        .where(SetLog.user_id == user_id, SetLog.completed.is_(True), SetLog.reps > 0,
+               sa.or_(SetLog.workout_session_id.is_(None), WorkoutSession.is_completed.is_(True)))
+    ).all()
+    records = compute_personal_records(user_id, [tuple(row) for row in history])
+    table = PersonalRecord.__table__
+    db.session.execute(sa.delete(table).where(table.c.user_id == user_id))
+    if records:
+        db.session.execute(sa.insert(table), records)
+    return len(records)
+
+
+@click.group('personal-records')
+def records_cli():
+    """Beheer persoonlijke records."""
+
+
+@records_cli.command('backfill')
+@click.option('--user-id', type=int, multiple=True, help='Alleen deze gebruiker(s); standaard iedereen.')
+@with_appcontext
+def backfill_command(user_id):
+    """Herbereken persoonlijke records volledig uit de set-logs."""
+    user_ids = list(user_id) or db.session.scalars(sa.select(User.id).order_by(User.id)).all()
+    total = 0
+    for uid in user_ids:
+        total += backfill_personal_records(uid)
+        db.session.commit()
+    click.echo(f"{total} records voor {len(user_ids)} gebruikers herberekend")
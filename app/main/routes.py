@@ -1,13 +1,15 @@
-from flask import render_template, request, current_app, session, redirect, url_for, flash, jsonify
+from flask import render_template, request, current_app, session, redirect, url_for, flash, jsonify, abort, Response
 from flask_login import login_required, current_user, login_user, logout_user
 
 from app.forms import EditProfileForm, NameForm, SearchExerciseForm, CurrentWeightForm, WorkoutPlanForm, GoalWeightForm, ExerciseForm, ActiveWorkoutForm, DeleteWorkoutForm, \
     DeleteExerciseForm, AddWeightForm
-from app.models import Exercise, WorkoutPlanExercise, WorkoutPlan, ExerciseLog, SetLog, WorkoutSession, WeightLog
+from app.models import Exercise, WorkoutPlanExercise, WorkoutPlan, ExerciseLog, SetLog, WorkoutSession, WeightLog, Equipment, Job, \
+    PersonalRecord
 import logging
 from flask_wtf.csrf import CSRFError
+from werkzeug.exceptions import NotFound
 from datetime import datetime, timezone, timedelta
-from sqlalchemy import select
+from sqlalchemy import delete, select
 import uuid
 import matplotlib
 matplotlib.use('Agg')
@@ -15,12 +17,27 @@ import matplotlib.pyplot as plt
 import numpy as np
 import io
 import base64
-from markupsafe import escape
+from markupsafe import Markup, escape
 
 import json
 
-from .utils import get_workout_data, get_user_workout_plans, owns_workout_plan, fix_image_path, clean_instruction_text, check_onboarding_status
+from .plan_copy import duplicate_plan
+from .ordering import ORDER_GAP, MoveError, key_between, move_plan_exercise, next_order_key
+from .set_batch import MAX_BATCH_SIZE, SetMutationError, apply_set_mutations, parse_set_values, set_log_row, \
+    set_log_upsert, write_set_rows
+from .session_stats import bump_session_totals, lock_session_totals, planned_sets_for_plan, previous_sets, \
+    session_progress
+from .plan_patch import DEFAULT_FIELDS, PlanPatchError, apply_plan_patch, delete_plan_exercises
+from .utils import get_workout_data, get_user_workout_plans, owns_workout_plan, owns_plan_exercise, owns_workout_session, owned_plan, \
+    owned_plan_exercise, owned_workout_session, check_onboarding_status, ListPagination, \
+    keyset_paginate, keyset_slice
+from app.catalog import MAX_SUGGESTIONS, facet_key, get_catalog
+from app.catalog.similar import NEIGHBOURS
 from .. import db
+from app.fragment_cache import fragment_cache, mark_plans_changed
+from app.workout_buffer import workout_buffer
+from app.progress_events import progress_events, queue_progress
+from app.jobs import job_queue
 from ..models import User
 
 logger = logging.getLogger(__name__)
@@ -61,12 +78,14 @@ def index():
         logger.debug(f"Redirect naar onboarding-stap: {onboarding_redirect}")
         return redirect(onboarding_redirect)
 
-    # Haal niet-gearchiveerde workout-plannen op
-    workout_plans = get_user_workout_plans(current_user.id, archived=False)
-    workout_data = get_workout_data(workout_plans)
+    # Plankaarten komen uit de fragmentcache; alleen bij een miss worden de plannen opgehaald
+    plan_cards = fragment_cache.get_or_render(current_user.id, 'index', lambda: render_template(
+        '_plan_cards.html',
+        workout_data=get_workout_data(get_user_workout_plans(current_user.id, archived=False))
+    ))
     delete_form = DeleteWorkoutForm()
 
-    return render_template('index.html', workout_data=workout_data, delete_form=delete_form)
+    return render_template('index.html', plan_cards=Markup(plan_cards), delete_form=delete_form)
 
 @main.route('/login')
 def login():
@@ -448,11 +467,14 @@ def api_weight_chart():
 @login_required
 def weight_history():
     """Toon alle gewichtsmetingen van de gebruiker"""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
 
-    weights = WeightLog.query.filter_by(user_id=current_user.id) \
-        .order_by(WeightLog.logged_at.desc()) \
-        .paginate(page=page, per_page=20, error_out=False)
+    # Keyset-paginering: geen OFFSET; het totaal wordt alleen op de eerste pagina geteld
+    weights = keyset_paginate(
+        select(WeightLog).where(WeightLog.user_id == current_user.id),
+        (WeightLog.logged_at, WeightLog.id),
+        cursor, per_page=20, with_total=not cursor
+    )
 
     return render_template('weight_history.html',
                            weights=weights,
@@ -501,18 +523,15 @@ def add_exercise_to_workout(plan_id):
             logger.debug(f"Duplicate exercise: plan_id={plan_id}, exercise_id={exercise_id}")
             return jsonify({'success': False, 'message': 'Exercise already in workout plan'}), 400
 
-        # Bepaal volgende order
-        max_order = db.session.query(db.func.max(WorkoutPlanExercise.order)).filter_by(workout_plan_id=plan_id).scalar() or -1
-        next_order = max_order + 1
+        # Bepaal volgende volgorde-sleutel (achteraan, met tussenruimte)
+        next_order = next_order_key(plan_id)
 
         # Voeg nieuwe oefening toe
         new_entry = WorkoutPlanExercise(
             workout_plan_id=plan_id,
             exercise_id=exercise_id,
-            sets=3,
-            reps=10,
-            weight=0.0,
-            order=next_order
+            order=next_order,
+            **DEFAULT_FIELDS
         )
         db.session.add(new_entry)
         db.session.commit()
@@ -557,7 +576,7 @@ def add_workout():
                 sets=exercise_form.sets.data,
                 reps=exercise_form.reps.data,
                 weight=exercise_form.weight.data,
-                order=index
+                order=index * ORDER_GAP
             )
             db.session.add(plan_exercise)
 
@@ -568,10 +587,8 @@ def add_workout():
             plan_exercise = WorkoutPlanExercise(
                 workout_plan_id=new_workout.id,
                 exercise_id=exercise_id,
-                sets=3,
-                reps=10,
-                weight=0.0,
-                order=index
+                order=index * ORDER_GAP,
+                **DEFAULT_FIELDS
             )
             db.session.add(plan_exercise)
 
@@ -602,7 +619,7 @@ def add_workout():
 #    Bewerk een bestaand workout-plan.
 
 def edit_workout(plan_id):
-    workout_plan = WorkoutPlan.query.get_or_404(plan_id)
+    workout_plan = owned_plan(plan_id)
 
     form = WorkoutPlanForm()
     logger.debug(f"Initial form.name.data: {form.name.data}, workout_plan.name: {workout_plan.name}")
@@ -631,17 +648,8 @@ def edit_workout(plan_id):
             form.exercises.append_entry(exercise_form)
         logger.debug(f"Populated {len(form.exercises.entries)} exercises in form")
 
-    # Laad alle oefeningen voor lookup
-
-    exercises = Exercise.query.all()
-    exercises_dict = {str(ex.id): ex for ex in exercises}
-    for ex in exercises:
-        try:
-            ex.images_list = json.loads(ex.images) if ex.images else []
-            logger.debug(f"Exercise {ex.id}: images_list = {ex.images_list}")
-        except Exception:
-            ex.images_list = []
-            logger.error(f"Failed to parse images for exercise {ex.id}")
+    # Oefeningen voor lookup komen uit de in-memory catalogus
+    exercises_dict = get_catalog().by_id
 
     if request.method == 'POST':
         logger.debug(f"POST data: {request.form}")
@@ -650,6 +658,11 @@ def edit_workout(plan_id):
             workout_plan.name = form.name.data
             db.session.add(workout_plan)
 
+            # Bestaande planoefeningen zijn al geladen; zoek ze op in het geheugen i.p.v. een query per rij
+            existing = {(pe.exercise_id, pe.order): pe for pe in plan_exercises}
+            # Nieuwe oefeningen komen achteraan; bestaande houden hun volgorde-sleutel
+            next_order = key_between(max((pe.order for pe in plan_exercises), default=None), None)
+
             # Verwerk oefeningen uit formulier
             for idx, exercise_form in enumerate(form.exercises):
                 exercise_id = exercise_form.exercise_id.data
@@ -658,17 +671,12 @@ def edit_workout(plan_id):
                     continue
                 logger.debug(f"Processing exercise with exercise_id: {exercise_id}, order: {exercise_form.order.data}")
                 # Zoek bestaande WorkoutPlanExercise
-                plan_exercise = WorkoutPlanExercise.query.filter_by(
-                    workout_plan_id=plan_id,
-                    exercise_id=exercise_id,
-                    order=exercise_form.order.data
-                ).first()
+                plan_exercise = existing.get((str(exercise_id), exercise_form.order.data))
                 if plan_exercise:
                     # Update bestaande oefening
                     plan_exercise.sets = exercise_form.sets.data or 0
                     plan_exercise.reps = exercise_form.reps.data or 0
                     plan_exercise.weight = exercise_form.weight.data or 0.0
-                    plan_exercise.order = idx
                     db.session.add(plan_exercise)
                     logger.debug(
                         f"Updated exercise {plan_exercise.id}: sets={plan_exercise.sets}, reps={plan_exercise.reps}, weight={plan_exercise.weight}")
@@ -681,8 +689,9 @@ def edit_workout(plan_id):
                         sets=exercise_form.sets.data or 0,
                         reps=exercise_form.reps.data or 0,
                         weight=exercise_form.weight.data or 0.0,
-                        order=idx
+                        order=next_order
                     )
+                    next_order += ORDER_GAP
                     db.session.add(plan_exercise)
 
             try:
@@ -725,7 +734,6 @@ def add_set(plan_id):
 
     data = request.get_json()
     exercise_id = data.get('exercise_id')
-    plan_id = data.get('plan_id')
 
     plan_exercise = WorkoutPlanExercise.query.filter_by(workout_plan_id=plan_id, exercise_id=exercise_id).first()
     if plan_exercise:
@@ -743,7 +751,6 @@ def add_set(plan_id):
 def complete_all_sets(plan_id):
     data = request.get_json()
     exercise_id = data.get('exercise_id')
-    plan_id = data.get('plan_id')
 
     plan_exercise = WorkoutPlanExercise.query.filter_by(workout_plan_id=plan_id, exercise_id=exercise_id).first()
     if plan_exercise:
@@ -777,45 +784,28 @@ def search_exercise():
         flash("Maak eerst een workout plan aan.", "info")
         return redirect(url_for('main.add_workout'))
 
-    plan = WorkoutPlan.query.get(plan_id)
-    if not plan or plan.user_id != current_user.id:
+    # Gememoized eigendomscontrole zoals bij de andere plan-routes; onbekend of van iemand anders: terug met melding
+    try:
+        plan = owned_plan(plan_id)
+    except NotFound:
+        plan = None
+    if plan is None:
         flash("Workout plan niet gevonden.", "error")
         return redirect(url_for('main.add_workout'))
 
-    # Oefeningen-query
-    query = Exercise.query
-
-    if form.validate():
-        if form.search_term.data:
-            query = query.filter(Exercise.name.ilike(f"%{form.search_term.data}%"))
-        if form.difficulty.data:
-            query = query.filter_by(level=form.difficulty.data)
-        if form.mechanic.data:
-            query = query.filter_by(mechanic=form.mechanic.data)
-        if form.equipment.data:
-            query = query.filter_by(equipment=form.equipment.data)
-        if form.category.data:
-            query = query.filter_by(category=form.category.data)
-
-    # Pagination
-    page = request.args.get('page', 1, type=int)
-    pagination = query.paginate(page=page, per_page=10, error_out=False)
-    exercises = pagination.items
+    # Oefeningen uit de in-memory catalogus (geen databasequery), gerankt via de zoekindex
+    exercises = form.search(get_catalog(), current_app.config['EXERCISE_SEARCH_BACKEND'], validated=form.validate())
 
-    # Fix image paths
-    for exercise in exercises:
-        if exercise.images and exercise.images.startswith('['):
-            try:
-                images_list = json.loads(exercise.images)
-                exercise.image_url = fix_image_path(images_list[0])
-            except Exception:
-                exercise.image_url = fix_image_path(exercise.images)
-        else:
-            exercise.image_url = fix_image_path(exercise.images) if exercise.images else 'default.jpg'
+    # Keyset-paginering over de gerankte resultaten (cursor = laatst getoonde oefening)
+    pagination = keyset_slice(exercises, request.args.get('cursor'), per_page=10)
+    exercises = pagination.items
 
     # AJAX-verzoek? -> alleen oefeningen (HTML-fragment)
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return render_template('_exercise_items.html', exercises=exercises)
+        response = current_app.make_response(render_template('_exercise_items.html', exercises=exercises))
+        # Cursor voor de volgende pagina; leeg op de laatste pagina
+        response.headers['X-Next-Cursor'] = pagination.next_cursor or ''
+        return response
 
     # Gewoon GET-verzoek -> volledige pagina renderen
     return render_template(
@@ -826,48 +816,128 @@ def search_exercise():
         pagination=pagination
     )
 
-@main.route('/exercise/<int:exercise_id>')
+@main.route('/api/exercises/facets')
 @login_required
-#    Toon details van een specifieke oefening.
-def exercise_detail(exercise_id):
-    exercise = Exercise.query.get_or_404(exercise_id)
+#    Geef facettellingen voor de filterbalk terug (zonder SQL).
+def exercise_facets():
+    form = SearchExerciseForm(request.args, meta={'csrf': False})
+    result = get_catalog().query(
+        form.search_term.data,
+        form.facet_filters(),
+        current_app.config['EXERCISE_SEARCH_BACKEND']
+    )
+    return jsonify({'total': result.total, 'facets': form.field_counts(result.counts)})
 
-    # Zet de images correct om naar lijst als het een string is
-    raw_images = exercise.images or []
-    if isinstance(raw_images, str):
-        try:
-            raw_images = json.loads(raw_images)
-        except Exception as e:
-            logger.error(f"Kon images niet parsen: {raw_images} — fout: {e}")
-            raw_images = []
+@main.route('/api/exercises')
+@login_required
+#    Zoek oefeningen als JSON, inclusief filter op spiergroep (primair/secundair).
+def api_exercises():
+    form = SearchExerciseForm(request.args, meta={'csrf': False})
+    result = get_catalog().query(
+        form.search_term.data,
+        form.facet_filters(),
+        current_app.config['EXERCISE_SEARCH_BACKEND']
+    )
+    pagination = ListPagination(per_page=50, max_per_page=200, error_out=False, items=result.records)
+    return jsonify({
+        'total': result.total,
+        'page': pagination.page,
+        'has_next': pagination.has_next,
+        'exercises': [
+            {
+                'id': exercise.id,
+                'name': exercise.name,
+                'primary_muscles': [m.name for m in exercise.primary_muscles],
+                'secondary_muscles': [m.name for m in exercise.secondary_muscles]
+            }
+            for exercise in pagination.items
+        ]
+    })
 
-    fixed_images = [fix_image_path(img) for img in raw_images]
+@main.route('/api/cache/stats')
+@login_required
+#    Hit/miss-tellers van de fragmentcache in dit proces.
+def cache_stats():
+    return jsonify(fragment_cache.stats())
 
-    # Parseer instructies
-    raw_instructions = exercise.instructions or []
-    if isinstance(raw_instructions, str):
-        try:
-            raw_instructions = json.loads(raw_instructions)
-        except Exception as e:
-            logger.error(f"Kon instructies niet parsen: {raw_instructions} — fout: {e}")
-            raw_instructions = []
+@main.route('/api/exercises/catalog')
+@login_required
+#    Volledige catalogus als één JSON-document; 304 als de client de actuele versie al heeft.
+def exercise_catalog():
+    document = get_catalog().document
+    # Elke codering heeft een eigen ETag: caches die op de validator sleutelen mengen gzip en identity niet
+    gzipped = bool(request.accept_encodings['gzip'])
+    etag = document.gzip_etag if gzipped else document.etag
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+    elif gzipped:
+        response = current_app.response_class(document.gzip_body, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = current_app.response_class(document.body, mimetype='application/json')
+    response.set_etag(etag)
+    # Client mag cachen, maar moet telkens revalideren (goedkoop dankzij 304)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+@main.route('/api/exercises/suggest')
+@login_required
+#    Typeahead-suggesties uit de prefix-trie: compacte JSON met id en naam.
+def suggest_exercises():
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 8, type=int), 1), MAX_SUGGESTIONS)
+    suggestions = get_catalog().suggest_trie.suggest(query, limit)
+    body = json.dumps(
+        {'q': query, 'results': [{'id': ex.id, 'name': ex.name} for ex in suggestions]},
+        separators=(',', ':')
+    )
+    return current_app.response_class(body, mimetype='application/json')
 
-    cleaned_instructions = [clean_instruction_text(step) for step in raw_instructions]
+@main.route('/api/exercises/muscles')
+@login_required
+#    Overzicht van het aantal oefeningen per spiergroep en rol.
+def api_exercise_muscles():
+    return jsonify(get_catalog().muscle_index.summary())
 
-    # Bereid data voor template
+@main.route('/exercise/<int:exercise_id>')
+@login_required
+#    Toon details van een specifieke oefening.
+def exercise_detail(exercise_id):
+    # Afbeeldingen en instructies zijn al gedecodeerd in de catalogus
+    exercise = get_catalog().get(exercise_id)
+    if exercise is None:
+        abort(404)
 
-    exercise_dict = {
-        'name': exercise.name,
-        'images': fixed_images,
-        'instructions': cleaned_instructions,
-        'level': exercise.level,
-        'equipment': exercise.equipment,
-        'mechanic': exercise.mechanic,
-        'category': exercise.category,
-    }
+    logger.debug(f"Images in exercise record: {exercise.images}")
+    substitutes = [record for record, score in get_catalog().similarity_index.substitutes(exercise.id, k=5)]
+    return render_template('exercise_detail.html', exercise=exercise, substitutes=substitutes)
 
-    logger.debug(f"Images in exercise_dict: {exercise_dict['images']}")
-    return render_template('exercise_detail.html', exercise=exercise_dict)
+@main.route('/api/exercises/<int:exercise_id>/substitutes')
+@login_required
+#    Geef vergelijkbare oefeningen als vervanger, optioneel beperkt tot beschikbaar materiaal.
+def exercise_substitutes(exercise_id):
+    catalog = get_catalog()
+    exercise = catalog.get(exercise_id)
+    if exercise is None:
+        return jsonify({'error': 'Oefening niet gevonden'}), 404
+
+    k = min(max(request.args.get('k', 5, type=int), 1), NEIGHBOURS)
+    # ?equipment=DUMBBELL&equipment=BODY_ONLY; onbekende waarden worden genegeerd
+    equipment = [key for key in request.args.getlist('equipment') if key in Equipment.__members__ or key == 'NONE']
+    substitutes = catalog.similarity_index.substitutes(exercise.id, k, equipment or None)
+    return jsonify({
+        'exercise_id': exercise.id,
+        'substitutes': [
+            {
+                'id': record.id,
+                'name': record.name,
+                'equipment': facet_key(record.equipment),
+                'score': round(score, 3)
+            }
+            for record, score in substitutes
+        ]
+    })
 
 @main.route('/plan/<int:plan_id>/exercise/<int:exercise_id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -900,24 +970,151 @@ def edit_exercise(plan_id, exercise_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@main.route('/api/plans/<int:plan_id>', methods=['PATCH'])
+@login_required
+@owns_workout_plan
+#    Pas een plan-patch toe (volledige staat of operaties) als één diff in één transactie.
+def patch_workout_plan(plan_id):
+    workout_plan = owned_plan(plan_id)
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'success': False, 'message': 'JSON-object verwacht'}), 400
+
+    try:
+        exercises = apply_plan_patch(workout_plan, payload, get_catalog())
+        db.session.commit()
+    except PlanPatchError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Plan-patch mislukt voor plan {plan_id}: {str(e)}")
+        return jsonify({'success': False, 'message': 'Opslaan mislukt'}), 500
+
+    return jsonify({'success': True, 'name': workout_plan.name, 'exercises': exercises})
+
+
+@main.route('/api/plans/<int:plan_id>/duplicate', methods=['POST'])
+@login_required
+@owns_workout_plan
+#    Dupliceer een plan (ook een gearchiveerd plan als sjabloon) met één INSERT ... SELECT voor de oefeningen.
+def duplicate_workout_plan(plan_id):
+    source = owned_plan(plan_id)
+    payload = request.get_json(silent=True) or {}
+    try:
+        plan = duplicate_plan(source, current_user.id, name=payload.get('name'))
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Dupliceren van plan {plan_id} mislukt: {str(e)}")
+        return jsonify({'success': False, 'message': 'Dupliceren mislukt'}), 500
+
+    return jsonify({
+        'success': True,
+        'plan_id': plan.id,
+        'name': plan.name,
+        'edit_url': url_for('main.edit_workout', plan_id=plan.id),
+    }), 201
+
+
+def _plan_exercise_or_404(plan_id, wpe_id):
+    # Planoefening die bij dit plan hoort; anders 404 (eigendom is al gecontroleerd en gememoized)
+    plan_exercise = owned_plan_exercise(wpe_id)
+    if plan_exercise is None or plan_exercise.workout_plan_id != plan_id:
+        abort(404)
+    return plan_exercise
+
+
+@main.route('/api/plans/<int:plan_id>/exercises/<int:wpe_id>/move', methods=['POST'])
+@login_required
+@owns_plan_exercise
+#    Verplaats één oefening (drag-and-drop) tussen twee buren; alleen haar eigen volgorde-sleutel verandert.
+def move_exercise_in_plan(plan_id, wpe_id):
+    plan_exercise = _plan_exercise_or_404(plan_id, wpe_id)
+    payload = request.get_json(silent=True) or {}
+    try:
+        before_id = None if payload.get('before_id') is None else int(payload['before_id'])
+        after_id = None if payload.get('after_id') is None else int(payload['after_id'])
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Ongeldige before_id of after_id'}), 400
+    try:
+        orders = move_plan_exercise(plan_exercise, before_id=before_id, after_id=after_id)
+        db.session.commit()
+    except MoveError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Verplaatsen van oefening {wpe_id} in plan {plan_id} mislukt: {str(e)}")
+        return jsonify({'success': False, 'message': 'Opslaan mislukt'}), 500
+
+    return jsonify({'success': True, 'orders': {str(k): v for k, v in orders.items()}})
+
+
+@main.route('/api/plans/<int:plan_id>/exercises/<int:wpe_id>', methods=['DELETE'])
+@login_required
+@owns_plan_exercise
+#    Verwijder één oefening uit een plan; de overige rijen houden hun volgorde-sleutel.
+def delete_exercise_api(plan_id, wpe_id):
+    _plan_exercise_or_404(plan_id, wpe_id)
+    try:
+        delete_plan_exercises([wpe_id])
+        mark_plans_changed(db.session, current_user.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Verwijderen van oefening {wpe_id} uit plan {plan_id} mislukt: {str(e)}")
+        return jsonify({'success': False, 'message': 'Verwijderen mislukt'}), 500
+    return jsonify({'success': True})
+
+
+@main.route('/delete_exercise_from_plan/<int:plan_id>', methods=['POST'])
+@login_required
+@owns_workout_plan
+#    Verwijder een oefening via het formulier op de bewerkpagina.
+def delete_exercise_from_plan(plan_id):
+    form = DeleteExerciseForm()
+    if not form.validate_on_submit():
+        flash('Ongeldig verzoek.', 'error')
+        return redirect(url_for('main.edit_workout', plan_id=plan_id))
+
+    wpe_id = form.workout_plan_exercise_id.data
+    _plan_exercise_or_404(plan_id, wpe_id)
+    try:
+        delete_plan_exercises([wpe_id])
+        mark_plans_changed(db.session, current_user.id)
+        db.session.commit()
+        flash('Oefening verwijderd.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Er is iets fout gegaan bij het verwijderen.', 'error')
+        logger.error(f"Verwijderen van oefening {wpe_id} uit plan {plan_id} mislukt: {str(e)}")
+    return redirect(url_for('main.edit_workout', plan_id=plan_id))
+
+
 @main.route('/start_workout/<int:plan_id>', methods=['GET'])
 @login_required
 @owns_workout_plan
 def start_workout(plan_id):
-    workout_plan = WorkoutPlan.query.get_or_404(plan_id)
+    workout_plan = owned_plan(plan_id)
 
     # Maak een nieuwe workout sessie aan
     session_id = str(uuid.uuid4())
+    started_at = datetime.now(timezone.utc)
     workout_session = WorkoutSession(
         id=session_id,
         user_id=current_user.id,
         workout_plan_id=plan_id,
-        started_at=datetime.now(timezone.utc),
+        started_at=started_at,
+        planned_sets=planned_sets_for_plan(plan_id),
     )
     db.session.add(workout_session)
     try:
         db.session.commit()
-        logger.debug(f"Created workout_session: id={session_id}, started_at={workout_session.started_at}")
+        logger.debug(f"Created workout_session: id={session_id}, started_at={started_at}")
     except Exception as e:
         db.session.rollback()
         logger.error(f"Failed to create workout session: {str(e)}")
@@ -927,11 +1124,16 @@ def start_workout(plan_id):
     # Sla session_id op in browser session voor tracking
     session['current_workout_session'] = session_id
 
-    exercises = WorkoutPlanExercise.query.filter_by(workout_plan_id=plan_id).order_by(WorkoutPlanExercise.order).all()
+    # Oefeningen met hun catalogusgegevens en de sets van de vorige keer: twee queries, ongeacht het aantal oefeningen
+    exercises = WorkoutPlanExercise.query.filter_by(workout_plan_id=plan_id).options(
+        db.joinedload(WorkoutPlanExercise.exercise)
+    ).order_by(WorkoutPlanExercise.order).all()
+    previous = previous_sets(current_user.id, {wpe.exercise_id for wpe in exercises}, exclude_session_id=session_id)
     form = ActiveWorkoutForm()
     return render_template('active_workout.html',
                            workout_plan=workout_plan,
                            exercises=exercises,
+                           previous=previous,
                            session_id=session_id,
                            form=form)
 
@@ -949,18 +1151,24 @@ def save_workout(plan_id):
         logger.error(f"Form validation failed: {errors}")
         return jsonify({'success': False, 'message': f'Ongeldige formuliergegevens: {errors}'}), 400
 
-    workout_plan = WorkoutPlan.query.get_or_404(plan_id)
-
     wpes = WorkoutPlanExercise.query.filter_by(workout_plan_id=plan_id).all()
     session_id = session.get('current_workout_session')
     if not session_id:
         logger.error("No active workout session found")
         return jsonify({'success': False, 'message': 'Geen actieve workout sessie gevonden.'}), 400
 
-    # Verwijder bestaande SetLogs om herschrijven mogelijk te maken
-    existing_logs = SetLog.query.filter_by(workout_session_id=session_id).all()
-    for log in existing_logs:
-        db.session.delete(log)
+    # Gebufferde sets eerst wegschrijven, zodat de vergelijking tegen de actuele staat gebeurt
+    workout_buffer.flush(session_id)
+
+    # Vergelijk met de bestaande sets i.p.v. alles te verwijderen en opnieuw in te voegen; de sessie eerst
+    # vergrendelen, zodat een gelijktijdige schrijver de oude staat niet verandert vóór de delta op de totalen
+    lock_session_totals(session_id)
+    existing = {
+        (log.workout_plan_exercise_id, log.set_number): log
+        for log in SetLog.query.filter_by(workout_session_id=session_id)
+    }
+    now = datetime.now(timezone.utc)
+    changed, kept = [], set()
 
     # Verwerk dynamische set-data uit formulier
     for wpe in wpes:
@@ -975,22 +1183,28 @@ def save_workout(plan_id):
                 reps = request.form.get(reps_key, type=float)
                 weight = request.form.get(weight_key, type=float)
                 if reps is not None and weight is not None:
-                    log = SetLog(
-                        user_id=current_user.id,
-                        workout_plan_id=plan_id,
-                        exercise_id=wpe.exercise_id,
-                        workout_plan_exercise_id=wpe.id,
-                        workout_session_id=session_id,
-                        set_number=set_num,  # GEEN +1 MEER
-                        reps=reps,
-                        weight=weight,
-                        completed=True,
-                        completed_at=datetime.now(timezone.utc)
-                    )
-                    db.session.add(log)
-                    logger.debug(f"Added SetLog: wpe_id={wpe.id}, set_num={set_num}, reps={reps}, weight={weight}")
+                    kept.add((wpe.id, set_num))
+                    current = existing.get((wpe.id, set_num))
+                    if current is None or (current.reps, current.weight, current.completed) != (reps, weight, True):
+                        changed.append(set_log_row(current_user.id, session_id, wpe, set_num, reps, weight, True, now=now))
+                        logger.debug(f"Changed SetLog: wpe_id={wpe.id}, set_num={set_num}, reps={reps}, weight={weight}")
             set_num += 1
 
+    # Alleen sets die niet meer voltooid zijn verdwijnen; gewijzigde en nieuwe sets in één bulk upsert
+    removed = [log for key, log in existing.items() if key not in kept]
+    if removed:
+        db.session.execute(delete(SetLog).where(SetLog.id.in_([log.id for log in removed])))
+    if changed:
+        db.session.execute(set_log_upsert(), changed)
+    # Sessietotalen bijwerken met het verschil: oude staat van gewijzigde en verwijderde sets eraf, nieuwe erbij
+    replaced = [existing[(row['workout_plan_exercise_id'], row['set_number'])] for row in changed
+                if (row['workout_plan_exercise_id'], row['set_number']) in existing]
+    bump_session_totals(session_id, changed, [
+        {'reps': log.reps, 'weight': log.weight, 'completed': log.completed} for log in replaced + removed
+    ])
+    logger.debug(f"Save workout: {len(changed)} sets geschreven, {len(removed)} verwijderd, "
+                 f"{len(kept) - len(changed)} ongewijzigd")
+
     try:
         db.session.commit()
     except Exception as e:
@@ -998,7 +1212,7 @@ def save_workout(plan_id):
         logger.error(f"Database error: {str(e)}")
         return jsonify({'success': False, 'message': f'Database fout: {str(e)}'}), 500
 
-    # Update sessie-statistieken
+    # Update sessie-duur (totalen zijn hierboven al incrementeel bijgewerkt)
 
     workout_session = WorkoutSession.query.get(session_id)
     if workout_session:
@@ -1020,67 +1234,50 @@ def save_workout(plan_id):
 @login_required
 def save_set():
     """Sla een individuele set op tijdens een actieve workout"""
-    data = request.get_json()
-
-    wpe_id = data.get('wpe_id')
-    set_number = data.get('set_number')
-    reps = data.get('reps')
-    weight = data.get('weight', 0.0)
-    completed = data.get('completed', False)
+    data = request.get_json(silent=True) or {}
 
-    if not all([wpe_id, set_number is not None, reps]):
+    if not all([data.get('wpe_id'), data.get('set_number') is not None, data.get('reps')]):
         return jsonify({'success': False, 'message': 'Missing required data'}), 400
+    # Zelfde validatie als /save_sets: getallen (ook als string), niet negatief
+    try:
+        values = parse_set_values(data)
+    except SetMutationError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    wpe_id, set_number = values['wpe_id'], values['set_number']
 
+    # Planoefening en eigendom in één query (plan meegeladen, geen lazy load)
     try:
-        # Haal WorkoutPlanExercise op
-        wpe = WorkoutPlanExercise.query.get_or_404(wpe_id)
+        wpe = owned_plan_exercise(wpe_id)
+    except NotFound:
+        return jsonify({'success': False, 'message': 'Plan exercise not found'}), 404
+    if wpe is None:
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 403
 
-        # Controleer autorisatie
-        if wpe.workout_plan.user_id != current_user.id:
-            return jsonify({'success': False, 'message': 'Unauthorized'}), 403
+    try:
 
         # Haal huidige workout session op
         session_id = session.get('current_workout_session')
         if not session_id:
             return jsonify({'success': False, 'message': 'No active workout session'}), 400
 
-        # Check of deze set al bestaat
-        existing_set = SetLog.query.filter_by(
-            workout_plan_exercise_id=wpe_id,
-            set_number=set_number,
-            workout_session_id=session_id
-        ).first()
-
-        if existing_set:
-            # Update bestaande set
-            existing_set.reps = reps
-            existing_set.weight = weight
-            existing_set.completed = completed
-            if completed:
-                existing_set.completed_at = datetime.now(timezone.utc)
-            set_log = existing_set
-        else:
-            # Maak nieuwe set aan
-            set_log = SetLog(
-                user_id=current_user.id,
-                workout_plan_id=wpe.workout_plan_id,
-                exercise_id=wpe.exercise_id,
-                workout_plan_exercise_id=wpe_id,
-                set_number=set_number,
-                reps=reps,
-                weight=weight,
-                completed=completed,
-                workout_session_id=session_id,
-                completed_at=datetime.now(timezone.utc) if completed else None
-            )
-            db.session.add(set_log)
-
-        db.session.commit()
+        # Upsert op (sessie, planoefening, setnummer) met sessietotalen, of een concept in de buffer
+        row = set_log_row(current_user.id, session_id, wpe, set_number, values['reps'], values['weight'],
+                          values['completed'])
+        write_set_rows(session_id, [row])
+        set_id = None
+        if not workout_buffer.enabled:
+            # Geen RETURNING bij ON DUPLICATE KEY (MySQL): id via de unieke sleutel opzoeken
+            set_id = db.session.scalar(select(SetLog.id).where(
+                SetLog.workout_session_id == session_id,
+                SetLog.workout_plan_exercise_id == wpe.id,
+                SetLog.set_number == set_number
+            ))
+            db.session.commit()
 
         return jsonify({
             'success': True,
             'message': 'Set saved successfully',
-            'set_id': set_log.id
+            'set_id': set_id
         })
 
     except Exception as e:
@@ -1088,6 +1285,40 @@ def save_set():
         logger.error(f"Error saving set: {str(e)}")
         return jsonify({'success': False, 'message': f'Error saving set: {str(e)}'}), 500
 
+@main.route('/save_sets', methods=['POST'])
+@login_required
+def save_sets():
+    """
+    Sla een batch set-mutaties op in één transactie (debounced wachtrij van de actieve workout).
+    Notities:
+        - Body: {"mutations": [{key, wpe_id, set_number, reps, weight, completed}, ...]}.
+        - Elke mutatie heeft een idempotentiesleutel; herhaalde batches (retries) zijn veilig.
+        - De client verwijdert applied, duplicates en rejected uit zijn wachtrij; bij een fout op de hele
+          batch (4xx, zoals een verlopen CSRF-token of geen actieve workout) blijft de wachtrij staan.
+    """
+    payload = request.get_json(silent=True) or {}
+    mutations = payload.get('mutations')
+    if not isinstance(mutations, list) or not mutations:
+        return jsonify({'success': False, 'message': "'mutations' moet een niet-lege lijst zijn"}), 400
+    if len(mutations) > MAX_BATCH_SIZE:
+        return jsonify({'success': False, 'message': f'Maximaal {MAX_BATCH_SIZE} mutaties per batch'}), 413
+
+    session_id = session.get('current_workout_session')
+    if not session_id or owned_workout_session(session_id) is None:
+        return jsonify({'success': False, 'message': 'No active workout session'}), 400
+
+    try:
+        result = apply_set_mutations(current_user.id, session_id, mutations)
+        if not workout_buffer.enabled:
+            # Met de buffer is er alleen gelezen: geen transactie om te committen
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error saving set batch: {str(e)}")
+        return jsonify({'success': False, 'message': 'Opslaan mislukt'}), 500
+
+    return jsonify({'success': True, **result})
+
 @main.route('/complete_workout/<int:plan_id>', methods=['POST'])
 @login_required
 @owns_workout_plan
@@ -1102,62 +1333,50 @@ def complete_workout(plan_id):
             logger.error("No active workout session found")
             return jsonify({'success': False, 'message': 'No active workout session'}), 400
 
-        workout_session = WorkoutSession.query.get_or_404(session_id)
-        logger.debug(f"Found workout_session: id={workout_session.id}, user_id={workout_session.user_id}")
-        if workout_session.user_id != current_user.id:
-            logger.error(f"Unauthorized: session_user_id={workout_session.user_id}, current_user_id={current_user.id}")
+        workout_session = owned_workout_session(session_id)
+        if workout_session is None:
+            logger.error(f"Unauthorized: session_id={session_id}, current_user_id={current_user.id}")
             return jsonify({'success': False, 'message': 'Unauthorized'}), 403
 
-        # Markeer sessie als voltooid
+        # Laatste gebufferde sets wegschrijven vóór de aggregatie
+        workout_buffer.flush(session_id)
+
+        # Markeer sessie als voltooid (totalen zijn al bijgehouden; alleen de duur wordt berekend)
 
-        workout_session.completed_at = datetime.now(timezone.utc)
+        now = datetime.now(timezone.utc)
+        workout_session.completed_at = now
         workout_session.is_completed = True
         workout_session.calculate_statistics()
-
-        # Haal voltooide sets op
-
-        completed_sets = SetLog.query.filter_by(
-            workout_session_id=session_id,
-            completed=True
-        ).all()
-        logger.debug(f"Found {len(completed_sets)} completed sets for session_id={session_id}")
-
-        # Groepeer sets per oefening
-
-        exercise_groups = {}
-        for set_log in completed_sets:
-            exercise_id = set_log.exercise_id
-            if exercise_id not in exercise_groups:
-                exercise_groups[exercise_id] = []
-            exercise_groups[exercise_id].append(set_log)
-
-        # Maak ExerciseLogs voor elke oefening
-
-        for exercise_id, sets in exercise_groups.items():
-            if sets:
-                avg_reps = sum(s.reps for s in sets) / len(sets)
-                avg_weight = sum(s.weight for s in sets) / len(sets)
-                exercise_log = ExerciseLog(
-                    user_id=current_user.id,
-                    exercise_id=exercise_id,
-                    workout_plan_id=plan_id,
-                    sets=len(sets),
-                    reps=avg_reps,
-                    weight=avg_weight,
-                    completed=True,
-                    completed_at=datetime.now(timezone.utc)
-                )
-                db.session.add(exercise_log)
-                logger.debug(f"Created ExerciseLog: exercise_id={exercise_id}, sets={len(sets)}")
+        # Open voortgangsstreams sluiten na deze laatste staat
+        queue_progress(db.session, session_id, workout_session.progress())
+
+        # Afgeleide gegevens (samenvatting per oefening, records) in de achtergrond; de gebruiker wacht er niet op
+        jobs = [
+            job_queue.enqueue('exercise_logs', {
+                'session_id': session_id,
+                'user_id': current_user.id,
+                'plan_id': plan_id,
+                'completed_at': now.isoformat(),
+            }, user_id=current_user.id),
+            job_queue.enqueue('personal_records', {
+                'session_id': session_id,
+                'user_id': current_user.id,
+            }, user_id=current_user.id),
+        ]
+        # Vóór de commit opbouwen: daarna zouden de verlopen objecten opnieuw geladen worden
+        db.session.flush()
+        session_stats = workout_session.to_dict()
+        job_ids = [job.id for job in jobs]
 
         db.session.commit()
         session.pop('current_workout_session', None)
-        logger.info(f"Completed workout_session: id={workout_session.id}, plan_id={plan_id}")
+        logger.info(f"Completed workout_session: id={session_id}, plan_id={plan_id}")
         flash("Workout succesvol voltooid!", "success")
         return jsonify({
             'success': True,
             'message': 'Workout completed successfully',
-            'session_stats': workout_session.to_dict()
+            'session_stats': session_stats,
+            'jobs': job_ids
         })
 
     except Exception as e:
@@ -1169,37 +1388,22 @@ def complete_workout(plan_id):
 @main.route('/workout_history')
 @login_required
 def workout_history():
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
 
-    sessions = WorkoutSession.query.filter_by(
+    query = select(WorkoutSession).filter_by(
         user_id=current_user.id,
         is_completed=True,
         is_archived=False  # Alleen niet-gearchiveerde sessies
     ).options(
         db.joinedload(WorkoutSession.workout_plan)
-    ).order_by(WorkoutSession.completed_at.desc()).paginate(
-        page=page, per_page=10, error_out=False
+    )
+    # Keyset-paginering op (completed_at, id); het totaal alleen op de eerste pagina
+    sessions = keyset_paginate(
+        query, (WorkoutSession.completed_at, WorkoutSession.id),
+        cursor, per_page=10, with_total=not cursor
     )
 
-    for session in sessions.items:
-        if not hasattr(session, '_stats_calculated'):
-            completed_sets = SetLog.query.filter_by(
-                workout_session_id=session.id,
-                completed=True
-            ).all()
-
-            session.total_sets_count = len(completed_sets)
-            session.total_reps_count = sum(s.reps for s in completed_sets)
-            session.total_weight_count = sum(s.weight * s.reps for s in completed_sets)
-
-            if session.completed_at and session.started_at:
-                duration = session.completed_at - session.started_at
-                session.duration_minutes = round(duration.total_seconds() / 60)
-            else:
-                session.duration_minutes = 0
-
-            session._stats_calculated = True
-
+    # Totalen en duur staan op de sessie zelf (incrementeel bijgehouden); geen set-queries per sessie
     return render_template('workout_history.html', sessions=sessions)
 
 
@@ -1208,9 +1412,9 @@ def workout_history():
 #    Toon details van een workout-sessie.
 
 def workout_session_detail(session_id):
-    workout_session = WorkoutSession.query.get_or_404(session_id)
+    workout_session = owned_workout_session(session_id)
 
-    if workout_session.user_id != current_user.id:
+    if workout_session is None:
         flash("Je hebt geen toegang tot deze workout sessie.", "error")
         return redirect(url_for('main.workout_history'))
 
@@ -1236,7 +1440,8 @@ def workout_session_detail(session_id):
                 'sets': [],
                 'total_reps': 0,
                 'total_weight': 0,
-                'max_weight': 0
+                'max_weight': 0,
+                'records': []
             }
 
         exercise_groups[exercise_id]['sets'].append(set_log)
@@ -1250,6 +1455,25 @@ def workout_session_detail(session_id):
         total_reps += set_log.reps
         total_weight += (set_log.weight * set_log.reps)
 
+    # PR-badges: records die in deze sessie gezet zijn (één query voor alle oefeningen)
+    records = db.session.scalars(select(PersonalRecord).where(
+        PersonalRecord.user_id == current_user.id, PersonalRecord.exercise_id.in_(exercise_groups)
+    ))
+    for record in records:
+        group = exercise_groups[record.exercise_id]
+        for set_log in group['sets']:
+            if (record.best_weight_session_id == session_id and
+                    (set_log.weight, set_log.reps) == (record.best_weight, record.reps_at_best_weight)):
+                group['records'].append('Zwaarste set')
+                set_log.is_pr = True
+            if (record.best_e1rm_session_id == session_id and
+                    (set_log.weight, set_log.reps) == (record.best_e1rm_weight, record.best_e1rm_reps)):
+                group['records'].append(f'e1RM {record.best_e1rm:.1f} kg')
+                set_log.is_pr = True
+        if record.best_volume_session_id == session_id:
+            group['records'].append('Volume')
+        group['records'] = list(dict.fromkeys(group['records']))
+
     # Bereken workout duur
     if workout_session.completed_at and workout_session.started_at:
         duration = workout_session.completed_at - workout_session.started_at
@@ -1276,36 +1500,82 @@ def workout_session_detail(session_id):
 
 @main.route('/get_workout_progress/<session_id>')
 @login_required
+@owns_workout_session
 #    Haal voortgang van een workout-sessie op.
 def get_workout_progress(session_id):
-    workout_session = WorkoutSession.query.get_or_404(session_id)
+    workout_session = owned_workout_session(session_id)
 
-    if workout_session.user_id != current_user.id:
-        return jsonify({'error': 'Unauthorized'}), 403
+    # Voortgang uit de sessierij plus gebufferde concepten; alleen lezen, wegschrijven doet de buffer zelf
+    started_at = workout_session.started_at
+    if started_at.tzinfo is None:
+        started_at = started_at.replace(tzinfo=timezone.utc)
+    return jsonify({
+        **session_progress(workout_session),
+        'session_duration': (datetime.now(timezone.utc) - started_at).total_seconds() / 60
+    })
 
-    # Tel voltooide sets
 
-    completed_sets = SetLog.query.filter_by(
-        workout_session_id=session_id,
-        completed=True
-    ).count()
-
-    # Haal totale geplande sets op
+@main.route('/workout_progress/<session_id>/stream')
+@login_required
+@owns_workout_session
+#    Server-Sent Events met de voortgang van een workout-sessie (één open verbinding i.p.v. pollen).
+def workout_progress_stream(session_id):
+    workout_session = owned_workout_session(session_id)
+    # Versie vóór de staat lezen: een wijziging daartussen komt dan nog als event binnen. De decorator heeft
+    # de sessierij al geladen, dus de totalen na het lezen van de versie opnieuw ophalen.
+    version = progress_events.version(session_id)
+    db.session.refresh(workout_session)
+    progress = session_progress(workout_session)
+    # De stream zelf gebruikt de database niet; verbinding direct teruggeven aan de pool
+    db.session.close()
+    response = Response(progress_events.stream(session_id, version, progress), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@main.route('/workout_progress/<session_id>/poll')
+@login_required
+@owns_workout_session
+#    Long-poll fallback voor de voortgangsstream: wacht tot er een nieuwere versie is dan ?version.
+def workout_progress_poll(session_id):
+    after = request.args.get('version', type=int)
+    version = progress_events.version(session_id)
+    if after is None or after != version:
+        # Eerste aanvraag, achter, of een versie van vóór een herstart: direct de huidige staat.
+        # Totalen opnieuw ophalen: de decorator las de sessierij al vóór de versie (zie workout_progress_stream).
+        workout_session = owned_workout_session(session_id)
+        db.session.refresh(workout_session)
+        progress = session_progress(workout_session)
+    else:
+        db.session.close()
+        event = progress_events.wait(session_id, after, progress_events.poll_seconds)
+        if event is None:
+            return '', 204
+        version, progress = event
+    return jsonify({'version': version, 'progress': progress})
 
-    total_planned_sets = db.session.query(db.func.sum(WorkoutPlanExercise.sets)).filter_by(
-        workout_plan_id=workout_session.workout_plan_id
-    ).scalar() or 0
 
-    # Bereken voortgang
+@main.route('/api/personal_records')
+@login_required
+#    Persoonlijke records van de gebruiker, optioneel voor één of meer oefeningen (?exercise_id=...).
+def personal_records():
+    query = select(PersonalRecord).where(PersonalRecord.user_id == current_user.id)
+    exercise_ids = request.args.getlist('exercise_id')
+    if exercise_ids:
+        query = query.where(PersonalRecord.exercise_id.in_(exercise_ids))
+    records = db.session.scalars(query.order_by(PersonalRecord.exercise_id))
+    return jsonify({'records': [record.to_dict() for record in records]})
 
-    progress_percentage = (completed_sets / total_planned_sets * 100) if total_planned_sets > 0 else 0
 
-    return jsonify({
-        'completed_sets': completed_sets,
-        'total_planned_sets': total_planned_sets,
-        'progress_percentage': round(progress_percentage, 1),
-        'session_duration': (datetime.now(timezone.utc) - workout_session.started_at).total_seconds() / 60
-    })
+@main.route('/api/jobs/<int:job_id>')
+@login_required
+#    Status van een achtergrondtaak van de gebruiker (bijv. de verwerking na complete_workout).
+def job_status(job_id):
+    job = db.session.get(Job, job_id)
+    if job is None or job.user_id != current_user.id:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
 
 
 @main.route('/archive_workout_session/<session_id>', methods=['POST'])
@@ -1315,10 +1585,9 @@ def get_workout_progress(session_id):
 def archive_workout_session(session_id):
     logger.debug(f"Archiving workout session: session_id={session_id}, user_id={current_user.id}")
 
-    workout_session = WorkoutSession.query.get_or_404(session_id)
-    if workout_session.user_id != current_user.id:
-        logger.error(
-            f"Unauthorized access: session_user_id={workout_session.user_id}, current_user_id={current_user.id}")
+    workout_session = owned_workout_session(session_id)
+    if workout_session is None:
+        logger.error(f"Unauthorized access: session_id={session_id}, current_user_id={current_user.id}")
         flash("Je hebt geen toegang tot deze workout sessie.", "error")
         return redirect(url_for('main.workout_history'))
 
@@ -1340,7 +1609,9 @@ def archive_workout_session(session_id):
 
 def archive_workout(workout_id):
     logger.debug(f"Archiving workout: workout_id={workout_id}, user_id={current_user.id}")
-    workout = WorkoutPlan.query.get_or_404(workout_id)
+    workout = owned_plan(workout_id)
+    if workout is None:
+        return jsonify({'success': False, 'message': 'Unauthorized access to workout plan'}), 403
 
     workout.is_archived = True
     try:
@@ -1357,7 +1628,9 @@ def archive_workout(workout_id):
 #     Toon gearchiveerde workout-plannen.
 def archived_plans():
     logger.debug(f"Archived plans route aangeroepen voor {current_user.name}")
-    workout_plans = get_user_workout_plans(current_user.id, archived=True)
-    workout_data = get_workout_data(workout_plans)
+    plan_cards = fragment_cache.get_or_render(current_user.id, 'archived_plans', lambda: render_template(
+        '_archived_plan_cards.html',
+        workout_data=get_workout_data(get_user_workout_plans(current_user.id, archived=True))
+    ))
 
-    return render_template('archived_workouts.html', workout_data=workout_data)
+    return render_template('archived_workouts.html', plan_cards=Markup(plan_cards))
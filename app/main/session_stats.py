@@ -0,0 +1,258 @@
+import logging
+from datetime import datetime
+import click
+import sqlalchemy as sa
+from flask.cli import with_appcontext
+from app import db
+from app.models import ExerciseLog, SetLog, WorkoutPlanExercise, WorkoutSession
+from app.progress_events import queue_progress
+from app.jobs import job_queue
+
+logger = logging.getLogger(__name__)
+
+
+def set_totals(rows):
+    """
+    Bijdrage van set-rijen aan de sessietotalen.
+    Notities:
+        - rows: dicts (of mappings) met reps, weight en completed; alleen voltooide sets tellen mee.
+    Returns:
+        tuple: (sets, reps, volume) met volume = som van reps * gewicht.
+    """
+    sets = reps = 0
+    volume = 0.0
+    for row in rows:
+        if row['completed']:
+            sets += 1
+            reps += row['reps'] or 0
+            volume += (row['reps'] or 0) * (row['weight'] or 0.0)
+    return sets, reps, volume
+
+
+def lock_session_totals(session_id):
+    """
+    Vergrendel de sessierij tot het einde van de transactie.
+    Notities:
+        - Wie daarna de oude staat van sets leest voor bump_session_totals, ziet geen gelijktijdige schrijver
+          meer tussen lezen en schrijven; anders tellen twee schrijvers dezelfde oude staat en lopen de
+          totalen uit de pas met de set-logs.
+        - SELECT ... FOR UPDATE; SQLite kent dat niet, daar neemt een lege UPDATE het schrijfslot.
+    """
+    if db.session.get_bind().dialect.name == 'sqlite':
+        db.session.execute(
+            sa.update(WorkoutSession).where(WorkoutSession.id == session_id)
+            .values(total_sets=WorkoutSession.total_sets)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        db.session.execute(sa.select(WorkoutSession.id).where(WorkoutSession.id == session_id).with_for_update())
+
+
+def current_set_state(session_id, slots, for_update=False):
+    #    Huidige staat (reps, weight, completed, mutation_key) per (planoefening, setnummer) in één query.
+    #    for_update: eerst de sessie vergrendelen (zie lock_session_totals), voor een delta op de totalen.
+    wpe_ids = {wpe_id for wpe_id, _ in slots}
+    if not wpe_ids:
+        return {}
+    if for_update:
+        lock_session_totals(session_id)
+    rows = db.session.execute(
+        sa.select(SetLog.workout_plan_exercise_id, SetLog.set_number, SetLog.reps, SetLog.weight,
+                  SetLog.completed, SetLog.mutation_key)
+        .where(SetLog.workout_session_id == session_id, SetLog.workout_plan_exercise_id.in_(wpe_ids))
+    )
+    return {(row.workout_plan_exercise_id, row.set_number): row._asdict() for row in rows}
+
+
+def bump_session_totals(session_id, new_rows, old_rows=()):
+    """
+    Werk de totalen van een sessie incrementeel bij met het verschil tussen nieuwe en oude set-rijen.
+    Notities:
+        - Eén UPDATE met relatieve ophoging (total = total + delta); geen herberekening over alle sets.
+        - old_rows: de staat van dezelfde sets vóór de wijziging (leeg voor nieuwe sets).
+        - De nieuwe totalen komen via RETURNING terug (of een losse SELECT als de database dat niet kan)
+          en worden na de commit naar open voortgangsstreams gepubliceerd.
+    """
+    new, old = set_totals(new_rows), set_totals(old_rows)
+    delta_sets, delta_reps, delta_volume = (n - o for n, o in zip(new, old))
+    if not (delta_sets or delta_reps or delta_volume):
+        return
+    totals = (WorkoutSession.total_sets, WorkoutSession.planned_sets, WorkoutSession.total_reps,
+              WorkoutSession.total_weight, WorkoutSession.is_completed)
+    stmt = (
+        sa.update(WorkoutSession)
+        .where(WorkoutSession.id == session_id)
+        .values(
+            total_sets=sa.func.coalesce(WorkoutSession.total_sets, 0) + delta_sets,
+            total_reps=sa.func.coalesce(WorkoutSession.total_reps, 0) + delta_reps,
+            total_weight=sa.func.coalesce(WorkoutSession.total_weight, 0.0) + delta_volume,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.get_bind().dialect.update_returning:
+        row = db.session.execute(stmt.returning(*totals)).first()
+    else:
+        db.session.execute(stmt)
+        row = db.session.execute(sa.select(*totals).where(WorkoutSession.id == session_id)).first()
+    if row is not None:
+        queue_progress(db.session, session_id, WorkoutSession.progress_from(*row))
+
+
+def planned_sets_for_plan(plan_id):
+    #    Totaal geplande sets van een plan (één SUM); wordt bij de start van een sessie vastgelegd.
+    return db.session.scalar(
+        sa.select(sa.func.coalesce(sa.func.sum(WorkoutPlanExercise.sets), 0))
+        .where(WorkoutPlanExercise.workout_plan_id == plan_id)
+    )
+
+
+def session_progress(workout_session):
+    """
+    Voortgang van een sessie inclusief de nog niet weggeschreven concepten uit de write-behind buffer.
+    Notities:
+        - Alleen lezen: de sessietotalen plus het verschil tussen de concepten en de staat van dezelfde sets
+          in de database (één query). Wegschrijven blijft aan de periodieke sweep en complete_workout.
+        - Sessies zonder planned_sets krijgen de som van het huidige plan, zonder die vast te leggen.
+    Returns:
+        dict: Zie WorkoutSession.progress_from.
+    """
+    from app.workout_buffer import workout_buffer  # Import hier om circulaire imports te vermijden
+    total_sets, total_reps, total_weight = (workout_session.total_sets or 0, workout_session.total_reps or 0,
+                                            workout_session.total_weight or 0.0)
+    drafts = workout_buffer.drafts(workout_session.id)
+    if drafts:
+        slots = {(row['workout_plan_exercise_id'], row['set_number']) for row in drafts}
+        current = current_set_state(workout_session.id, slots)
+        new = set_totals(drafts)
+        old = set_totals([state for slot, state in current.items() if slot in slots])
+        total_sets, total_reps, total_weight = (total + n - o for total, n, o in
+                                                zip((total_sets, total_reps, total_weight), new, old))
+    planned_sets = workout_session.planned_sets
+    if planned_sets is None:
+        planned_sets = planned_sets_for_plan(workout_session.workout_plan_id)
+    return WorkoutSession.progress_from(total_sets, planned_sets, total_reps, total_weight, workout_session.is_completed)
+
+
+def log_completed_exercises(session_id, user_id, plan_id, completed_at):
+    """
+    Vat de voltooide sets van een sessie per oefening samen in ExerciseLog.
+    Notities:
+        - Eén INSERT ... SELECT met GROUP BY exercise_id: aggregatie (aantal sets, gemiddelde reps en gewicht)
+          en het invoegen van alle samenvattingen gebeuren in de database, ongeacht het aantal sets.
+        - Gemiddelde reps worden afgerond (ROUND, half naar boven) en als geheel getal opgeslagen.
+        - Commit gebeurt door de aanroeper.
+    Returns:
+        int: Aantal aangemaakte exercise-logs.
+    """
+    table = ExerciseLog.__table__
+    return db.session.execute(
+        sa.insert(table).from_select(
+            ('user_id', 'exercise_id', 'workout_plan_id', 'sets', 'reps', 'weight', 'completed', 'completed_at'),
+            sa.select(
+                sa.literal(user_id), SetLog.exercise_id, sa.literal(plan_id),
+                sa.func.count(SetLog.id),
+                # Gemiddelde reps expliciet afronden naar een geheel getal: hetzelfde resultaat op elke database
+                sa.cast(sa.func.round(sa.func.avg(SetLog.reps)), sa.Integer), sa.func.avg(SetLog.weight),
+                sa.literal(True), sa.literal(completed_at, sa.DateTime),
+            )
+            .where(SetLog.workout_session_id == session_id, SetLog.completed.is_(True))
+            .group_by(SetLog.exercise_id)
+        )
+    ).rowcount
+
+
+@job_queue.handler('exercise_logs')
+def exercise_logs_job(session_id, user_id, plan_id, completed_at):
+    #    Achtergrondtaak na complete_workout: samenvatting per oefening (zie log_completed_exercises).
+    log_completed_exercises(session_id, user_id, plan_id, datetime.fromisoformat(completed_at))
+
+
+def previous_sets(user_id, exercise_ids, exclude_session_id=None):
+    """
+    Sets van de vorige keer per oefening: de voltooide sets uit de meest recente voltooide sessie met die oefening.
+    Notities:
+        - Alleen voltooide workouts tellen; een afgebroken of nog lopende sessie levert geen 'vorige keer'.
+        - Eén query voor alle oefeningen: eerst per (oefening, sessie) één groep, daarna rangschikt row_number()
+          die groepen per oefening op de laatste voltooiing. Het window loopt zo over sessies, niet over sets;
+          alleen de sets van de sessie met rang 1 worden opgehaald.
+        - Gebruikt ix_set_logs_user_exercise_completed (user_id, exercise_id, completed_at).
+    Returns:
+        dict: {exercise_id: [dicts met set_number, reps, weight, completed_at] op setnummer}.
+    """
+    if not exercise_ids:
+        return {}
+    conditions = [
+        SetLog.user_id == user_id,
+        SetLog.exercise_id.in_(exercise_ids),
+        SetLog.completed.is_(True),
+        SetLog.completed_at.is_not(None),
+    ]
+    if exclude_session_id is not None:
+        conditions.append(SetLog.workout_session_id != exclude_session_id)
+    sessions = (
+        sa.select(
+            SetLog.exercise_id, SetLog.workout_session_id,
+            sa.func.row_number().over(
+                partition_by=SetLog.exercise_id,
+                order_by=(sa.func.max(SetLog.completed_at).desc(), SetLog.workout_session_id.desc())
+            ).label('rank'),
+        )
+        .join(WorkoutSession, WorkoutSession.id == SetLog.workout_session_id)
+        .where(*conditions, WorkoutSession.is_completed.is_(True))
+        .group_by(SetLog.exercise_id, SetLog.workout_session_id)
+    ).subquery()
+    rows = db.session.execute(
+        sa.select(SetLog.exercise_id, SetLog.set_number, SetLog.reps, SetLog.weight, SetLog.completed_at)
+        .join(sessions, sa.and_(sessions.c.exercise_id == SetLog.exercise_id,
+                                sessions.c.workout_session_id == SetLog.workout_session_id))
+        .where(sessions.c.rank == 1, *conditions)
+        .order_by(SetLog.exercise_id, SetLog.set_number)
+    )
+    previous = {}
+    for row in rows:
+        previous.setdefault(row.exercise_id, []).append({
+            'set_number': row.set_number, 'reps': row.reps, 'weight': row.weight, 'completed_at': row.completed_at,
+        })
+    return previous
+
+
+def repair_session_totals(session_ids=None):
+    """
+    Herbereken sessietotalen volledig uit SetLog (alleen voor herstel; normaal worden ze incrementeel bijgehouden).
+    Notities:
+        - Eén UPDATE met gecorreleerde subqueries over alle (of de opgegeven) sessies.
+        - planned_sets (vastgelegd bij de start) blijft staan; alleen waar die ontbreekt wordt het huidige plan gebruikt.
+    Returns:
+        int: Aantal bijgewerkte sessies.
+    """
+    def completed_sets(*columns):
+        # Gecorreleerde subquery over de voltooide sets van de sessie die bijgewerkt wordt
+        return sa.select(*columns).where(
+            SetLog.workout_session_id == WorkoutSession.id, SetLog.completed.is_(True)
+        ).scalar_subquery()
+
+    stmt = sa.update(WorkoutSession).values(
+        total_sets=completed_sets(sa.func.count(SetLog.id)),
+        total_reps=completed_sets(sa.func.coalesce(sa.func.sum(SetLog.reps), 0)),
+        total_weight=completed_sets(sa.func.coalesce(sa.func.sum(SetLog.reps * SetLog.weight), 0.0)),
+        # planned_sets is een momentopname van de start; alleen invullen waar die ontbreekt
+        planned_sets=sa.func.coalesce(
+            WorkoutSession.planned_sets,
+            sa.select(sa.func.coalesce(sa.func.sum(WorkoutPlanExercise.sets), 0))
+            .where(WorkoutPlanExercise.workout_plan_id == WorkoutSession.workout_plan_id)
+            .scalar_subquery()
+        ),
+    ).execution_options(synchronize_session=False)
+    if session_ids is not None:
+        stmt = stmt.where(WorkoutSession.id.in_(session_ids))
+    return db.session.execute(stmt).rowcount
+
+
+@click.command('repair-session-stats')
+@click.argument('session_ids', nargs=-1)
+@with_appcontext
+def repair_session_stats_command(session_ids):
+    """Herbereken de totalen van workout-sessies volledig uit de set-logs."""
+    count = repair_session_totals(list(session_ids) or None)
+    db.session.commit()
+    click.echo(f"{count} sessies herberekend")
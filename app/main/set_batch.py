@@ -0,0 +1,219 @@
+import logging
+import math
+from datetime import datetime, timezone
+import sqlalchemy as sa
+from app import db
+from app.models import SetLog, WorkoutPlan, WorkoutPlanExercise, WorkoutSession
+from app.main.session_stats import bump_session_totals, current_set_state, session_progress
+from app.progress_events import progress_events
+from app.workout_buffer import workout_buffer
+from app.main.utils import upsert_statement
+
+logger = logging.getLogger(__name__)
+
+# Maximaal aantal mutaties per batch; de client splitst grotere wachtrijen
+MAX_BATCH_SIZE = 200
+
+
+# Unieke sleutel van een set binnen een sessie (zie uq_set_logs_session_set)
+SET_LOG_KEY = ('workout_session_id', 'workout_plan_exercise_id', 'set_number')
+
+# Kolommen die een upsert bij een bestaande set overschrijft
+SET_LOG_UPDATE_COLUMNS = ('reps', 'weight', 'completed', 'mutation_key')
+
+
+def set_log_upsert():
+    """
+    INSERT ... ON CONFLICT-statement voor set-logs op SET_LOG_KEY.
+    Notities:
+        - Uitvoeren met een lijst dicts geeft één executemany; gelijktijdige schrijvers kunnen geen dubbele sets meer maken.
+        - completed_at blijft bij een bestaande set staan (eerste voltooiing telt).
+    """
+    return upsert_statement(SetLog.__table__, SET_LOG_KEY, SET_LOG_UPDATE_COLUMNS, keep_existing=('completed_at',))
+
+
+def set_log_row(user_id, session_id, wpe, set_number, reps, weight, completed, mutation_key=None, now=None):
+    #    Volledige rij voor set_log_upsert(); alle rijen hebben dezelfde kolommen, zodat ze in één executemany passen.
+    return {
+        'user_id': user_id,
+        'workout_plan_id': wpe.workout_plan_id,
+        'exercise_id': wpe.exercise_id,
+        'workout_plan_exercise_id': wpe.id,
+        'workout_session_id': session_id,
+        'set_number': set_number,
+        'reps': reps,
+        'weight': weight,
+        'completed': completed,
+        'completed_at': (now or datetime.now(timezone.utc)) if completed else None,
+        'mutation_key': mutation_key,
+    }
+
+
+def upsert_set_rows(session_id, rows, current=None):
+    """
+    Schrijf set-rijen met één bulk upsert en werk de sessietotalen bij met het verschil.
+    Notities:
+        - current: staat van de sets vóór de wijziging, gelezen na lock_session_totals (zie current_set_state);
+          wordt (vergrendeld) geladen als die ontbreekt.
+    """
+    if not rows:
+        return
+    slots = [(row['workout_plan_exercise_id'], row['set_number']) for row in rows]
+    if current is None:
+        current = current_set_state(session_id, slots, for_update=True)
+    db.session.execute(set_log_upsert(), rows)
+    bump_session_totals(session_id, rows, [current[slot] for slot in slots if slot in current])
+
+
+def write_set_rows(session_id, rows, current=None):
+    #    Schrijf set-rijen weg: als concept in de write-behind buffer als die aan staat, anders met upsert_set_rows.
+    #    Ook gebufferde sets gaan naar open voortgangsstreams, met de totalen inclusief concepten.
+    if not rows:
+        return
+    if workout_buffer.enabled:
+        workout_buffer.stage(session_id, rows)
+        workout_session = db.session.get(WorkoutSession, session_id)
+        if workout_session is not None:
+            # Het concept staat er al, ongeacht de transactie: direct publiceren i.p.v. na de commit
+            progress_events.publish(session_id, session_progress(workout_session))
+    else:
+        upsert_set_rows(session_id, rows, current)
+
+
+class SetMutationError(ValueError):
+    #    Ongeldige set-mutatie; wordt per mutatie teruggemeld zodat de rest van de batch doorgaat.
+    pass
+
+
+# Toegestane waarden voor completed; al het andere (bijv. "nee" of 2) is ongeldig i.p.v. waar
+COMPLETED_VALUES = {True: True, False: False, 1: True, 0: False, 'true': True, 'false': False, '1': True, '0': False}
+
+
+def parse_completed(value):
+    #    Strikte boolean voor completed: een niet-lege string als "false" mag niet als True tellen.
+    if isinstance(value, str):
+        value = value.strip().lower()
+    elif isinstance(value, float) and value in (0, 1):
+        value = int(value)
+    try:
+        return COMPLETED_VALUES[value]
+    except (KeyError, TypeError):
+        raise SetMutationError('completed moet true of false zijn')
+
+
+def parse_set_values(data):
+    """
+    Valideer en normaliseer de waarden van één set (ook voor /save_set).
+    Notities:
+        - Verplicht: wpe_id en set_number; reps/weight mogen ontbreken (0), ook als string ("10").
+        - completed is standaard False; alleen booleans, 0/1 of "true"/"false" (zie parse_completed).
+    Returns:
+        dict: wpe_id, set_number, reps, weight en completed.
+    """
+    try:
+        values = {
+            'wpe_id': int(data['wpe_id']),
+            'set_number': int(data['set_number']),
+            'reps': int(float(data.get('reps') or 0)),
+            'weight': float(data.get('weight') or 0.0),
+            'completed': parse_completed(data.get('completed', False)),
+        }
+    except SetMutationError:
+        raise
+    except (KeyError, TypeError, ValueError):
+        raise SetMutationError('wpe_id, set_number, reps of weight ongeldig')
+    if not math.isfinite(values['weight']):
+        raise SetMutationError('wpe_id, set_number, reps of weight ongeldig')
+    if values['set_number'] < 0 or values['reps'] < 0 or values['weight'] < 0:
+        raise SetMutationError('Waarden mogen niet negatief zijn')
+    return values
+
+
+def parse_mutation(data):
+    """
+    Valideer één set-mutatie uit een batch.
+    Notities:
+        - Verplicht: key (idempotentiesleutel van de client); de setwaarden zoals in parse_set_values.
+    Returns:
+        dict: Genormaliseerde mutatie.
+    """
+    if not isinstance(data, dict):
+        raise SetMutationError('Mutatie moet een object zijn')
+    key = data.get('key')
+    if not isinstance(key, str) or not 1 <= len(key) <= 64:
+        raise SetMutationError('Ongeldige of ontbrekende key')
+    return {'key': key, **parse_set_values(data)}
+
+
+def apply_set_mutations(user_id, session_id, mutations):
+    """
+    Pas een batch set-mutaties toe in één transactie.
+    Notities:
+        - Per (planoefening, setnummer) wint de laatste mutatie in de batch; eerdere zijn daarmee ook verwerkt.
+        - Eigendom van alle planoefeningen wordt met één query gecontroleerd, de staat van bestaande sets
+          (keys en waarden voor de sessietotalen) met één query geladen; nieuwe en gewijzigde sets gaan in één bulk upsert (executemany), of als
+          concept naar de write-behind buffer als die aan staat (dan zonder lock op de sessie of schrijfactie).
+        - Een mutatie waarvan de key al op de set staat, is eerder toegepast (retry) en wordt overgeslagen.
+        - Ongeldige mutaties worden per stuk geweigerd; de rest van de batch gaat door.
+        - Commit gebeurt door de aanroeper.
+    Returns:
+        dict: applied (keys), duplicates (keys) en rejected (lijst met key en message).
+    """
+    result = {'applied': [], 'duplicates': [], 'rejected': []}
+
+    latest = {}
+    for data in mutations:
+        try:
+            mutation = parse_mutation(data)
+        except SetMutationError as e:
+            key = data.get('key') if isinstance(data, dict) else None
+            result['rejected'].append({'key': key, 'message': str(e)})
+            continue
+        slot = (mutation['wpe_id'], mutation['set_number'])
+        if slot in latest:
+            # Overschreven binnen dezelfde batch: geldt als verwerkt
+            result['applied'].append(latest[slot]['key'])
+        latest[slot] = mutation
+    if not latest:
+        return result
+
+    wpe_ids = {wpe_id for wpe_id, _ in latest}
+    plan_exercises = {
+        row.id: row for row in db.session.execute(
+            sa.select(WorkoutPlanExercise.id, WorkoutPlanExercise.exercise_id, WorkoutPlanExercise.workout_plan_id)
+            .join(WorkoutPlan, WorkoutPlan.id == WorkoutPlanExercise.workout_plan_id)
+            .where(WorkoutPlanExercise.id.in_(wpe_ids), WorkoutPlan.user_id == user_id)
+        )
+    }
+    # Alleen vergrendelen als er direct geschreven wordt; met de buffer doet flush() dat (in upsert_set_rows)
+    # en blijft deze batch een leesactie zonder schrijfslot op de database
+    current = current_set_state(session_id, [slot for slot in latest if slot[0] in plan_exercises],
+                                for_update=not workout_buffer.enabled)
+    applied_keys = {slot: state['mutation_key'] for slot, state in current.items()}
+    # Gebufferde (nog niet weggeschreven) sets zijn nieuwer dan de database
+    applied_keys.update({
+        (row['workout_plan_exercise_id'], row['set_number']): row['mutation_key']
+        for row in workout_buffer.drafts(session_id)
+    })
+
+    now = datetime.now(timezone.utc)
+    rows = []
+    for slot, mutation in latest.items():
+        wpe = plan_exercises.get(mutation['wpe_id'])
+        if wpe is None:
+            result['rejected'].append({'key': mutation['key'], 'message': 'Unauthorized'})
+            continue
+        if applied_keys.get(slot) == mutation['key']:
+            result['duplicates'].append(mutation['key'])
+            continue
+        rows.append(set_log_row(
+            user_id, session_id, wpe, mutation['set_number'], mutation['reps'], mutation['weight'],
+            mutation['completed'], mutation_key=mutation['key'], now=now
+        ))
+        result['applied'].append(mutation['key'])
+
+    write_set_rows(session_id, rows, current)
+
+    logger.debug(f"Set-batch voor sessie {session_id}: {len(result['applied'])} toegepast, "
+                 f"{len(result['duplicates'])} dubbel, {len(result['rejected'])} geweigerd")
+    return result
@@ -1,8 +1,14 @@
-from flask import url_for, jsonify, request
+from flask import url_for, jsonify, request, current_app, g, abort
 import re
+from datetime import datetime
 from flask_login import current_user
 from functools import wraps
-from app.models import WorkoutPlan, WorkoutPlanExercise
+from flask_sqlalchemy.pagination import Pagination
+from itsdangerous import BadSignature, URLSafeSerializer
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+from app import db
+from app.models import Exercise, WorkoutPlan, WorkoutPlanExercise, WorkoutSession
 
 
 def check_onboarding_status(user):
@@ -35,30 +41,84 @@ def clean_instruction_text(text):
     return text.replace('\ufffd', '¾')
 
 
-def owns_workout_plan(f):
-    #    Decorator om eigendom van een workout-plan te controleren.
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        # Probeer plan_id uit URL-parameters of JSON te halen
-        plan_id = kwargs.get('plan_id') or request.get_json(silent=True, force=True).get('plan_id')
-        if not plan_id:
-            return jsonify({'success': False, 'message': 'Plan ID is required'}), 400
+def _owned(model, ident, load, owner):
+    """
+    Laad een object en bepaal het eigendom in één geïndexeerde query, gememoized per request.
+    Notities:
+        - load() geeft het object (of None) terug; owner(obj) de user_id van de eigenaar.
+        - Het resultaat (object + eigendom) staat in flask.g, zodat decorator en view dezelfde
+          lookup delen en een herhaalde controle geen query meer kost.
+    Returns:
+        Het object als de huidige gebruiker eigenaar is, anders None; 404 als het niet bestaat.
+    """
+    cache = g.setdefault('owned_objects', {})
+    key = (model.__name__, ident)
+    if key not in cache:
+        obj = load()
+        cache[key] = (obj, obj is not None and owner(obj) == current_user.id)
+    obj, owned = cache[key]
+    if obj is None:
+        abort(404)
+    return obj if owned else None
 
-        try:
-            # Converteer plan_id naar integer
-            plan_id = int(plan_id)
-        except (ValueError, TypeError):
-            return jsonify({'success': False, 'message': 'Invalid Plan ID'}), 400
 
-        # Haal workout-plan op
-        workout_plan = WorkoutPlan.query.get_or_404(plan_id)
-        if workout_plan.user_id != current_user.id:
-            return jsonify({'success': False, 'message': 'Unauthorized access to workout plan'}), 403
+def owned_plan(plan_id):
+    #    Workout-plan van de huidige gebruiker (None als het van iemand anders is, 404 als het niet bestaat).
+    return _owned(
+        WorkoutPlan, int(plan_id),
+        lambda: db.session.get(WorkoutPlan, int(plan_id)),
+        lambda plan: plan.user_id
+    )
 
-        # Voer de oorspronkelijke functie uit
-        return f(*args, **kwargs)
 
-    return decorated_function
+def owned_plan_exercise(wpe_id):
+    #    Planoefening van de huidige gebruiker; het plan wordt in dezelfde query meegeladen.
+    def load():
+        return db.session.scalar(
+            sa.select(WorkoutPlanExercise)
+            .join(WorkoutPlanExercise.workout_plan)
+            .options(so.contains_eager(WorkoutPlanExercise.workout_plan))
+            .where(WorkoutPlanExercise.id == int(wpe_id))
+        )
+    return _owned(WorkoutPlanExercise, int(wpe_id), load, lambda wpe: wpe.workout_plan.user_id)
+
+
+def owned_workout_session(session_id):
+    #    Workout-sessie van de huidige gebruiker (None als ze van iemand anders is, 404 als ze niet bestaat).
+    return _owned(
+        WorkoutSession, str(session_id),
+        lambda: db.session.get(WorkoutSession, str(session_id)),
+        lambda workout_session: workout_session.user_id
+    )
+
+
+def _ownership_required(resolve, param, label):
+    # Bouw een decorator die het ID uit de URL of (als terugval) uit de JSON-body haalt en eigendom afdwingt
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            ident = kwargs.get(param)
+            if ident is None:
+                # Alleen de body parsen als het ID niet in de URL staat
+                ident = (request.get_json(silent=True, force=True) or {}).get(param)
+            if ident in (None, ''):
+                return jsonify({'success': False, 'message': f'{label} ID is required'}), 400
+            try:
+                obj = resolve(ident)
+            except (ValueError, TypeError):
+                return jsonify({'success': False, 'message': f'Invalid {label} ID'}), 400
+            if obj is None:
+                return jsonify({'success': False, 'message': f'Unauthorized access to {label.lower()}'}), 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+# Decorators om eigendom te controleren; de view haalt het object daarna zonder extra query op
+# via owned_plan / owned_plan_exercise / owned_workout_session.
+owns_workout_plan = _ownership_required(owned_plan, 'plan_id', 'Workout plan')
+owns_plan_exercise = _ownership_required(owned_plan_exercise, 'wpe_id', 'Plan exercise')
+owns_workout_session = _ownership_required(owned_workout_session, 'session_id', 'Workout session')
 
 def get_user_workout_plans(user_id, archived=False):
     #    Haal workout-plannen op voor een specifieke gebruiker.
@@ -73,15 +133,196 @@ def get_user_workout_plans(user_id, archived=False):
 
 
 def get_workout_data(plans):
-    #    Bereid workout-data voor met gekoppelde oefeningen.
-    workout_data = []
-    for plan in plans:
-        # Haal oefeningen op, gesorteerd op volgorde
-        exercises = plan.exercises.order_by(WorkoutPlanExercise.order).all()
-        # Voeg plan en oefeningen toe als dictionary
-        workout_data.append({
-            'plan': plan,
-            'exercises': [entry.exercise for entry in exercises]
-        })
-    return workout_data
+    """
+    Bereid workout-data voor met gekoppelde oefeningen.
+    Notities:
+        - Haalt de oefeningen van alle plannen op in één query (join WorkoutPlanExercise -> Exercise),
+          in plaats van een query per plan en per oefening; het aantal queries groeit niet mee.
+        - Oefeningen staan per plan op volgorde (WorkoutPlanExercise.order).
+    """
+    exercises_by_plan = {plan.id: [] for plan in plans}
+    if exercises_by_plan:
+        rows = db.session.execute(
+            sa.select(WorkoutPlanExercise.workout_plan_id, Exercise)
+            .join(Exercise, Exercise.id == WorkoutPlanExercise.exercise_id)
+            .where(WorkoutPlanExercise.workout_plan_id.in_(exercises_by_plan))
+            .order_by(WorkoutPlanExercise.workout_plan_id, WorkoutPlanExercise.order, WorkoutPlanExercise.id)
+        ).all()
+        for plan_id, exercise in rows:
+            exercises_by_plan[plan_id].append(exercise)
+
+    # Voeg plan en oefeningen toe als dictionary
+    return [{'plan': plan, 'exercises': exercises_by_plan[plan.id]} for plan in plans]
+
+
+class ListPagination(Pagination):
+    #    Paginering over een in-memory lijst met dezelfde interface als Flask-SQLAlchemy's paginate().
+    def _query_items(self):
+        items = self._query_args['items']
+        return list(items[self._query_offset:self._query_offset + self.per_page])
+
+    def _query_count(self):
+        return len(self._query_args['items'])
+
+
+class KeysetPage:
+    """
+    Eén pagina van keyset-paginering (cursor-gebaseerd).
+    Notities:
+        - next_cursor is een ondoorzichtig token voor de volgende pagina, of None op de laatste pagina.
+        - total is alleen gevuld als er expliciet om een telling is gevraagd; anders None.
+        - is_first: de pagina begint bij het eerste item (geen of een genegeerde cursor). Een vorige-cursor
+          is er niet; terug gaat naar de eerste pagina.
+    """
+
+    def __init__(self, items, next_cursor=None, is_first=True, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.is_first = is_first
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def _cursor_serializer():
+    # Ondertekend, zodat clients de sleutelwaarden niet kunnen vervalsen
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='keyset-cursor')
+
+
+def encode_cursor(values):
+    #    Codeer de sorteersleutel van het laatste item als ondoorzichtig cursor-token.
+    return _cursor_serializer().dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+
+
+def decode_cursor(token, columns):
+    #    Decodeer een cursor-token naar sleutelwaarden per kolom; None bij een ontbrekend of ongeldig token.
+    if not token:
+        return None
+    try:
+        values = _cursor_serializer().loads(token)
+    except BadSignature:
+        return None
+    if not isinstance(values, list) or len(values) != len(columns):
+        return None
+    try:
+        return [
+            datetime.fromisoformat(v) if isinstance(getattr(column, 'type', None), sa.DateTime) and v is not None else v
+            for column, v in zip(columns, values)
+        ]
+    except (TypeError, ValueError):
+        return None
+
+
+# Databases met een native upsert; andere backends worden bij het opstarten geweigerd (zie check_upsert_support)
+UPSERT_DIALECTS = ('sqlite', 'postgresql', 'mysql', 'mariadb')
+
+
+def check_upsert_support(database_uri):
+    #    Weiger bij het opstarten een database zonder native upsert, i.p.v. pas bij het eerste set-request te falen.
+    dialect = sa.engine.make_url(database_uri).get_backend_name()
+    if dialect not in UPSERT_DIALECTS:
+        raise RuntimeError(
+            f"Database '{dialect}' wordt niet ondersteund: set-logs en records vereisen een native upsert "
+            f"({', '.join(UPSERT_DIALECTS)})"
+        )
+
+
+def upsert_statement(table, key_columns, update_columns, keep_existing=(), update_when=None):
+    """
+    INSERT ... ON CONFLICT/ON DUPLICATE KEY-statement voor een tabel met een unieke sleutel.
+    Notities:
+        - update_columns worden bij een bestaande rij overschreven; keep_existing-kolommen houden een
+          bestaande niet-lege waarde (coalesce).
+        - update_when: {kolom: conditie(bestaand, nieuw)}; zo'n kolom krijgt alleen de nieuwe waarde als de
+          conditie in SQL waar is (CASE WHEN), zodat gelijktijdige schrijvers elkaar niet kunnen terugzetten.
+        - MySQL evalueert de toewijzingen op volgorde en ziet al bijgewerkte kolommen: zet kolommen waarop
+          een conditie vergelijkt achteraan in update_columns.
+        - Native upsert voor SQLite, PostgreSQL en MySQL/MariaDB (gecontroleerd bij het opstarten);
+          uitvoeren met een lijst dicts geeft één executemany.
+    """
+    update_when = update_when or {}
+
+    def assign(column, new):
+        if column not in update_when:
+            return new[column]
+        return sa.case((update_when[column](table.c, new), new[column]), else_=table.c[column])
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql' or dialect == 'mariadb':
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        # Lijst van paren: de SET-volgorde blijft die van update_columns
+        return stmt.on_duplicate_key_update(
+            [(column, sa.func.coalesce(table.c[column], stmt.inserted[column])) for column in keep_existing] +
+            [(column, assign(column, stmt.inserted)) for column in update_columns]
+        )
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c[column] for column in key_columns],
+        set_={
+            **{column: sa.func.coalesce(table.c[column], stmt.excluded[column]) for column in keep_existing},
+            **{column: assign(column, stmt.excluded) for column in update_columns},
+        }
+    )
+
+
+def keyset_paginate(query, columns, cursor=None, per_page=20, with_total=False):
+    """
+    Pagineer een select()-query op basis van een cursor in plaats van OFFSET.
+    Notities:
+        - columns bepaalt de (aflopende) sorteervolgorde; de laatste kolom moet uniek zijn (bijv. id).
+        - Haalt per_page + 1 rijen op om te weten of er een volgende pagina is; geen COUNT(*)
+          tenzij with_total=True.
+        - Met een index op (filterkolommen, *columns) kost elke pagina één index-range-scan,
+          ongeacht hoe diep er gepagineerd wordt.
+    Returns:
+        KeysetPage: Items, cursor voor de volgende pagina en optioneel het totaal.
+    """
+    values = decode_cursor(cursor, columns)
+    stmt = query
+    if values is not None:
+        stmt = stmt.where(sa.tuple_(*columns) < sa.tuple_(*values))
+    stmt = stmt.order_by(*(column.desc() for column in columns)).limit(per_page + 1)
+    items = db.session.scalars(stmt).all()
+
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+
+    total = None
+    if with_total:
+        total = db.session.scalar(sa.select(sa.func.count()).select_from(query.order_by(None).subquery()))
+    return KeysetPage(items, next_cursor, values is None, total)
+
 
+def keyset_slice(items, cursor=None, per_page=10):
+    """
+    Keyset-paginering over een in-memory lijst (bijv. gerankte zoekresultaten uit de catalogus).
+    Notities:
+        - De cursor bevat het ID van het laatst getoonde item, zodat een volgende pagina stabiel blijft.
+        - Een ongeldig, vervalst of verouderd token (item niet meer in de lijst) geeft een lege pagina zonder
+          next_cursor: opnieuw bij het eerste item beginnen zou een 'meer laden' pagina 1 laten herhalen.
+    Returns:
+        KeysetPage: Items van deze pagina; total is de lengte van de lijst (gratis in het geheugen).
+    """
+    start = 0
+    if cursor:
+        values = decode_cursor(cursor, (None,))
+        start = None
+        if values is not None:
+            start = next((idx + 1 for idx, item in enumerate(items) if item.id == values[0]), None)
+        if start is None:
+            return KeysetPage([], None, False, len(items))
+    page_items = list(items[start:start + per_page])
+    next_cursor = None
+    if start + per_page < len(items):
+        next_cursor = encode_cursor([page_items[-1].id])
+    return KeysetPage(page_items, next_cursor, start == 0, len(items))
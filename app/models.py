@@ -223,6 +223,10 @@ class WeightLog(db.Model):
         - Gebruikt voor gewichtsverloopgrafieken en statistieken.
         - Automatisch timestamp met UTC-tijdzone.
     """
+    __table_args__ = (
+        # Keyset-paginering van de gewichtsgeschiedenis per gebruiker
+        sa.Index('ix_weight_log_user_logged_at', 'user_id', 'logged_at', 'id'),
+    )
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
     user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id'), nullable=False)
     weight: so.Mapped[float] = so.mapped_column(nullable=False)
@@ -460,6 +464,12 @@ class SetLog(db.Model):
         - Gebruikt SET NULL voor workout_plan_id om integriteit te behouden bij plan-verwijdering.
     """
     __tablename__ = 'set_logs'
+    __table_args__ = (
+        # Eén set per (sessie, planoefening, setnummer); sleutel voor upserts (INSERT ... ON CONFLICT)
+        sa.Index('uq_set_logs_session_set', 'workout_session_id', 'workout_plan_exercise_id', 'set_number', unique=True),
+        # Laatste sets per gebruiker en oefening ("vorige keer" bij start_workout)
+        sa.Index('ix_set_logs_user_exercise_completed', 'user_id', 'exercise_id', 'completed_at'),
+    )
     id: so.Mapped[int] = so.mapped_column(primary_key=True)
     user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
     workout_plan_id: so.Mapped[Optional[int]] = so.mapped_column(sa.ForeignKey('workout_plan.id', ondelete='SET NULL'), nullable=True)
@@ -472,6 +482,8 @@ class SetLog(db.Model):
     created_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
     completed_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True), nullable=True)
     workout_session_id: so.Mapped[Optional[str]] = so.mapped_column(sa.String(36), nullable=True)
+    # Idempotentiesleutel van de laatst toegepaste client-mutatie (zie /save_sets)
+    mutation_key: so.Mapped[Optional[str]] = so.mapped_column(sa.String(64), nullable=True)
     user: so.Mapped['User'] = so.relationship(backref='set_logs')
     workout_plan: so.Mapped[Optional['WorkoutPlan']] = so.relationship(backref='set_logs')
     exercise: so.Mapped['Exercise'] = so.relationship(backref='set_logs')
@@ -505,9 +517,14 @@ class WorkoutSession(db.Model):
 
     Notities:
         - Gebruikt UUID voor unieke sessie-identificatie.
-        - Statistieken worden berekend via calculate_statistics.
+        - Totalen (sets, reps, volume) worden incrementeel bijgehouden bij elke set-wijziging
+          (zie app/main/session_stats.py); planned_sets wordt bij de start vastgelegd.
     """
     __tablename__ = 'workout_sessions'
+    __table_args__ = (
+        # Keyset-paginering van de workout-historiek per gebruiker
+        sa.Index('ix_workout_sessions_user_history', 'user_id', 'is_completed', 'is_archived', 'completed_at', 'id'),
+    )
     id: so.Mapped[str] = so.mapped_column(sa.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id'), nullable=False)
     workout_plan_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('workout_plan.id'), nullable=False)
@@ -517,6 +534,7 @@ class WorkoutSession(db.Model):
     total_sets: so.Mapped[int] = so.mapped_column(default=0)
     total_reps: so.Mapped[int] = so.mapped_column(default=0)
     total_weight: so.Mapped[float] = so.mapped_column(default=0.0)
+    planned_sets: so.Mapped[Optional[int]] = so.mapped_column(nullable=True)
     is_completed: so.Mapped[bool] = so.mapped_column(default=False)
     is_archived: so.Mapped[bool] = so.mapped_column(sa.Boolean, default=False)
     user: so.Mapped['User'] = so.relationship(backref='workout_sessions')
@@ -536,17 +554,14 @@ class WorkoutSession(db.Model):
 
     def calculate_statistics(self):
         """
-        Bereken statistieken voor de workout-sessie op basis van SetLogs.
+        Bereken de duur van de workout-sessie.
 
         Notities:
-            - Telt totaal aantal sets, herhalingen, en gewicht (reps * gewicht).
+            - Totalen (sets, reps, gewicht) worden al incrementeel bijgehouden; geen scan over SetLogs meer.
+              Volledig herberekenen kan met 'flask repair-session-stats'.
             - Berekent duur in minuten als started_at en completed_at beschikbaar zijn.
             - Update object-attributen direct.
         """
-        set_logs = SetLog.query.filter_by(workout_session_id=self.id, completed=True).all()
-        self.total_sets = len(set_logs)
-        self.total_reps = sum(log.reps for log in set_logs)
-        self.total_weight = sum(log.reps * log.weight for log in set_logs)
         if self.started_at and self.completed_at:
             started_at = self.started_at if self.started_at.tzinfo else self.started_at.replace(tzinfo=pytz.UTC)
             completed_at = self.completed_at if self.completed_at.tzinfo else self.completed_at.replace(tzinfo=pytz.UTC)
@@ -555,6 +570,30 @@ class WorkoutSession(db.Model):
         else:
             self.duration_minutes = 0
 
+    def progress(self):
+        """
+        Voortgang van de sessie uit de bijgehouden totalen (geen extra queries).
+
+        Returns:
+            dict: Voltooide en geplande sets, percentage, totalen en of de sessie voltooid is.
+        """
+        return self.progress_from(self.total_sets, self.planned_sets, self.total_reps, self.total_weight,
+                                  self.is_completed)
+
+    @staticmethod
+    def progress_from(total_sets, planned_sets, total_reps, total_weight, is_completed=False):
+        #    Voortgang uit losse totalen, bijv. uit een UPDATE ... RETURNING zonder het object te laden.
+        completed = total_sets or 0
+        planned = planned_sets or 0
+        return {
+            'completed_sets': completed,
+            'total_planned_sets': planned,
+            'progress_percentage': round(completed / planned * 100, 1) if planned > 0 else 0,
+            'total_reps': total_reps or 0,
+            'total_weight': total_weight or 0.0,
+            'is_completed': bool(is_completed),
+        }
+
     def to_dict(self):
         """
         Converteer WorkoutSession-object naar dictionary voor JSON-responsen.
@@ -572,4 +611,125 @@ class WorkoutSession(db.Model):
             'total_reps': self.total_reps,
             'total_weight': self.total_weight,
             'is_completed': self.is_completed
-        }
\ No newline at end of file
+        }
+
+class PersonalRecord(db.Model):
+    """
+    Model voor persoonlijke records per gebruiker en oefening (gematerialiseerd).
+    Notities:
+        - Wordt incrementeel bijgewerkt na het voltooien van een workout (zie app/main/records.py); records
+          gaan daarbij alleen omhoog. 'flask personal-records backfill' herberekent ze volledig uit de set-logs.
+        - best_weight: zwaarste gewicht van één set; reps_at_best_weight zijn de reps van die set (bij gelijk
+          gewicht de meeste). Dit is geen reps-record per gewicht: meer reps met een lichter gewicht telt niet.
+        - best_e1rm: hoogste geschatte 1RM (Epley) van één set.
+        - best_volume: hoogste volume (reps * gewicht) voor deze oefening binnen één sessie.
+        - *_session_id verwijst naar de sessie waarin het record gezet is (voor PR-badges).
+    """
+    __tablename__ = 'personal_records'
+    user_id: so.Mapped[int] = so.mapped_column(sa.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    exercise_id: so.Mapped[str] = so.mapped_column(sa.ForeignKey('exercise.id', ondelete='CASCADE'), primary_key=True)
+    best_weight: so.Mapped[Optional[float]] = so.mapped_column(nullable=True)
+    reps_at_best_weight: so.Mapped[Optional[int]] = so.mapped_column(nullable=True)
+    best_weight_session_id: so.Mapped[Optional[str]] = so.mapped_column(sa.String(36), nullable=True)
+    best_weight_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True), nullable=True)
+    best_e1rm: so.Mapped[Optional[float]] = so.mapped_column(nullable=True)
+    best_e1rm_weight: so.Mapped[Optional[float]] = so.mapped_column(nullable=True)
+    best_e1rm_reps: so.Mapped[Optional[int]] = so.mapped_column(nullable=True)
+    best_e1rm_session_id: so.Mapped[Optional[str]] = so.mapped_column(sa.String(36), nullable=True)
+    best_e1rm_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True), nullable=True)
+    best_volume: so.Mapped[Optional[float]] = so.mapped_column(nullable=True)
+    best_volume_session_id: so.Mapped[Optional[str]] = so.mapped_column(sa.String(36), nullable=True)
+    best_volume_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True), nullable=True)
+    updated_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    exercise: so.Mapped['Exercise'] = so.relationship()
+
+    def __repr__(self):
+        """String-representatie van het PersonalRecord-object."""
+        return f'<PersonalRecord {self.exercise_id} by {self.user_id}: {self.best_weight} kg x {self.reps_at_best_weight}>'
+
+    def to_dict(self):
+        """
+        Converteer PersonalRecord-object naar dictionary voor JSON-responsen.
+
+        Returns:
+            dict: Records (zwaarste set, geschatte 1RM en sessievolume) met tijdstippen.
+        """
+        return {
+            'exercise_id': self.exercise_id,
+            'best_weight': self.best_weight,
+            'reps_at_best_weight': self.reps_at_best_weight,
+            'best_weight_at': self.best_weight_at.isoformat() if self.best_weight_at else None,
+            'best_e1rm': self.best_e1rm,
+            'best_e1rm_weight': self.best_e1rm_weight,
+            'best_e1rm_reps': self.best_e1rm_reps,
+            'best_e1rm_at': self.best_e1rm_at.isoformat() if self.best_e1rm_at else None,
+            'best_volume': self.best_volume,
+            'best_volume_at': self.best_volume_at.isoformat() if self.best_volume_at else None,
+        }
+
+
+class Job(db.Model):
+    """
+    Model voor achtergrondtaken; de tabel is tegelijk de (duurzame) wachtrij.
+    Notities:
+        - Wordt in dezelfde transactie als het werk dat de taak veroorzaakt aangemaakt (zie app/jobs.py).
+        - status: 'queued', 'running', 'done' of 'failed'; mislukte pogingen worden na run_after opnieuw geprobeerd.
+        - locked_at markeert een lopende poging; een 'running' taak met een verlopen lease wordt opnieuw opgepakt.
+    """
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Volgende uitvoerbare taak zoeken zonder de hele tabel te scannen
+        sa.Index('ix_jobs_status_run_after', 'status', 'run_after', 'id'),
+    )
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    kind: so.Mapped[str] = so.mapped_column(sa.String(64), nullable=False)
+    payload: so.Mapped[dict] = so.mapped_column(sa.JSON, nullable=False, default=dict)
+    user_id: so.Mapped[Optional[int]] = so.mapped_column(sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=True, index=True)
+    status: so.Mapped[str] = so.mapped_column(sa.String(16), nullable=False, default='queued')
+    attempts: so.Mapped[int] = so.mapped_column(nullable=False, default=0)
+    max_attempts: so.Mapped[int] = so.mapped_column(nullable=False, default=5)
+    last_error: so.Mapped[Optional[str]] = so.mapped_column(sa.Text, nullable=True)
+    created_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    run_after: so.Mapped[datetime] = so.mapped_column(sa.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    locked_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True), nullable=True)
+    finished_at: so.Mapped[Optional[datetime]] = so.mapped_column(sa.DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        """String-representatie van het Job-object."""
+        return f'<Job {self.id}: {self.kind} ({self.status})>'
+
+    def to_dict(self):
+        """
+        Converteer Job-object naar dictionary voor JSON-responsen.
+
+        Returns:
+            dict: Taakgegevens inclusief status, pogingen en tijdstippen.
+        """
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class CatalogVersion(db.Model):
+    """
+    Model voor de gedeelde versiestempel van de oefeningencatalogus (één rij, id 1).
+    Notities:
+        - Wordt opgehoogd in dezelfde transactie die oefeningen of spiergroepen wijzigt, ook vanuit
+          seed_exercises.py of een ander proces (zie app/catalog/snapshot.py).
+        - Elke worker vergelijkt de stempel periodiek met zijn geladen catalogus en laadt opnieuw bij verschil.
+        - Migraties die de catalogus met ruwe SQL wijzigen, verhogen version zelf.
+    """
+    __tablename__ = 'catalog_version'
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    version: so.Mapped[int] = so.mapped_column(nullable=False, default=0)
+
+    def __repr__(self):
+        """String-representatie van het CatalogVersion-object."""
+        return f'<CatalogVersion {self.version}>'
@@ -0,0 +1,202 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+import sqlalchemy as sa
+import sqlalchemy.orm as so
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBroker:
+    """
+    In-process pub/sub voor voortgang van workout-sessies.
+    Notities:
+        - Per kanaal (sessie-id) alleen de laatste staat met een oplopend versienummer; wie achterloopt krijgt
+          direct de nieuwste staat, er zijn geen wachtrijen per abonnee.
+        - Wachten gebeurt op één Condition; publish() maakt alle wachtende streams tegelijk wakker.
+        - Alleen geldig binnen één proces; gebruik 'redis' als meerdere workers moeten delen.
+    """
+    name = 'memory'
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._channels = OrderedDict()
+        self._condition = threading.Condition()
+
+    def deliver(self, channel, version, payload):
+        #    Sla een staat op (alleen als die nieuwer is) en maak wachtende abonnees wakker.
+        with self._condition:
+            current = self._channels.get(channel)
+            if current is None or version > current[0]:
+                self._channels[channel] = (version, payload)
+                self._channels.move_to_end(channel)
+                while len(self._channels) > self.maxsize:
+                    self._channels.popitem(last=False)
+                self._condition.notify_all()
+
+    def publish(self, channel, payload):
+        with self._condition:
+            version = self._channels.get(channel, (0, None))[0] + 1
+            self.deliver(channel, version, payload)
+            return version
+
+    def version(self, channel):
+        with self._condition:
+            return self._channels.get(channel, (0, None))[0]
+
+    def wait(self, channel, after, timeout):
+        """
+        Wacht op een staat nieuwer dan versie after.
+        Returns:
+            tuple: (versie, payload), of None na timeout seconden.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                current = self._channels.get(channel)
+                if current is not None and current[0] > after:
+                    return current
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+
+class RedisBroker:
+    """
+    Gedeelde pub/sub via Redis, zodat een set die bij de ene worker binnenkomt de stream bij een andere bereikt.
+    Notities:
+        - publish() verhoogt de versie (INCR) en publiceert die met de staat; één luisterthread per proces
+          zet berichten door naar een lokale MemoryBroker, waar de streams op wachten.
+        - Het aantal Redis-verbindingen is dus per proces constant, niet per open stream.
+    """
+    name = 'redis'
+
+    def __init__(self, url, prefix='progress:'):
+        import redis  # Import hier: alleen nodig als de redis-backend gekozen is
+        self._client = redis.Redis.from_url(url)
+        self._client.ping()
+        self.prefix = prefix
+        self._local = MemoryBroker()
+        self._listener = threading.Thread(target=self._listen, name='progress-events', daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(f'{self.prefix}events:*')
+        prefix = f'{self.prefix}events:'
+        while True:
+            try:
+                for message in pubsub.listen():
+                    channel = message['channel'].decode('utf-8')[len(prefix):]
+                    event = json.loads(message['data'])
+                    self._local.deliver(channel, event['version'], event['payload'])
+            except Exception as e:
+                logger.error(f"Voortgangsevents: Redis-verbinding verbroken, opnieuw verbinden: {e}")
+                time.sleep(1)
+
+    def publish(self, channel, payload):
+        version = self._client.incr(f'{self.prefix}version:{channel}')
+        self._client.expire(f'{self.prefix}version:{channel}', 86400)
+        self._client.publish(f'{self.prefix}events:{channel}', json.dumps({'version': version, 'payload': payload}))
+        return version
+
+    def version(self, channel):
+        return int(self._client.get(f'{self.prefix}version:{channel}') or 0)
+
+    def wait(self, channel, after, timeout):
+        return self._local.wait(channel, after, timeout)
+
+
+class ProgressEvents:
+    """
+    Push van voortgang van workout-sessies naar open streams (SSE of long-poll).
+    Notities:
+        - Set-wijzigingen melden de nieuwe sessietotalen via queue_progress(); pas na een geslaagde commit
+          worden ze gepubliceerd, na een rollback vervallen ze.
+        - Backend via PROGRESS_EVENTS_BACKEND: 'memory' (standaard, één proces) of 'redis' (PROGRESS_EVENTS_URL).
+        - Een stream wacht het grootste deel van de tijd; draai met een async worker (de productie-image gebruikt
+          gunicorn gevent), zodat elke open stream een greenlet is en geen thread uit een kleine pool.
+          Meerdere worker-processen vereisen de 'redis'-backend.
+    """
+
+    def __init__(self, app=None):
+        self.broker = MemoryBroker()
+        self.stream_seconds = 300
+        self.poll_seconds = 25
+        self.heartbeat_seconds = 15
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('PROGRESS_EVENTS_BACKEND', 'memory')
+        self.stream_seconds = app.config.get('PROGRESS_STREAM_SECONDS', 300)
+        self.poll_seconds = app.config.get('PROGRESS_POLL_SECONDS', 25)
+        self.heartbeat_seconds = app.config.get('PROGRESS_HEARTBEAT_SECONDS', 15)
+        self.broker = MemoryBroker()
+        if backend == 'redis':
+            try:
+                self.broker = RedisBroker(app.config['PROGRESS_EVENTS_URL'])
+            except Exception as e:
+                logger.warning(f"Redis-voortgangsevents niet beschikbaar, terugval op in-process pub/sub: {e}")
+        elif backend != 'memory':
+            logger.warning(f"Onbekende backend '{backend}' voor voortgangsevents, gebruik in-process pub/sub")
+        app.extensions['progress_events'] = self
+
+    def publish(self, session_id, progress):
+        try:
+            return self.broker.publish(session_id, progress)
+        except Exception as e:
+            logger.warning(f"Voortgang publiceren mislukt voor sessie {session_id}: {e}")
+            return None
+
+    def version(self, session_id):
+        try:
+            return self.broker.version(session_id)
+        except Exception as e:
+            logger.warning(f"Voortgangsversie ophalen mislukt voor sessie {session_id}: {e}")
+            return 0
+
+    def wait(self, session_id, after, timeout):
+        #    Nieuwere staat dan versie after als (versie, voortgang), of None na timeout seconden.
+        return self.broker.wait(session_id, after, timeout)
+
+    def stream(self, session_id, version, progress):
+        """
+        Generator met Server-Sent Events voor één sessie.
+        Notities:
+            - Begint met de huidige staat, daarna een event per wijziging en elke heartbeat_seconds een
+              commentaarregel zodat proxies de verbinding openhouden.
+            - Sluit na stream_seconds of na de voltooiing van de sessie; EventSource verbindt zelf opnieuw.
+            - Gebruikt geen database of request-context: de verbinding houdt geen databaseverbinding bezet.
+        """
+        yield f'retry: 3000\nid: {version}\nevent: progress\ndata: {json.dumps(progress)}\n\n'
+        deadline = time.monotonic() + self.stream_seconds
+        while not progress.get('is_completed') and time.monotonic() < deadline:
+            event = self.wait(session_id, version, min(self.heartbeat_seconds, deadline - time.monotonic()))
+            if event is None:
+                yield ': keepalive\n\n'
+                continue
+            version, progress = event
+            yield f'id: {version}\nevent: progress\ndata: {json.dumps(progress)}\n\n'
+
+
+progress_events = ProgressEvents()
+
+
+def queue_progress(session, session_id, progress):
+    #    Publiceer de voortgang van een sessie na de volgende commit (de laatste staat per sessie telt).
+    session.info.setdefault('progress_events', {})[session_id] = progress
+
+
+@sa.event.listens_for(so.Session, 'after_commit')
+def _publish_progress_after_commit(session):
+    for session_id, progress in session.info.pop('progress_events', {}).items():
+        progress_events.publish(session_id, progress)
+
+
+@sa.event.listens_for(so.Session, 'after_rollback')
+def _reset_progress_after_rollback(session):
+    session.info.pop('progress_events', None)
@@ -25,22 +25,6 @@ document.querySelectorAll('.active-workout-btn').forEach(button => {
                     </label>
                 `;
                 setSection.appendChild(newSet);
-
-                // Auto-save when inputs change
-                const inputs = newSet.querySelectorAll('.set-input');
-                inputs.forEach(input => {
-                    input.addEventListener('change', function() {
-                        saveSetToDatabase(wpeId, setNum, newSet);
-                    });
-                });
-
-                // Auto-save when checkbox is checked
-                const checkbox = newSet.querySelector('input[type="checkbox"]');
-                checkbox.addEventListener('change', function() {
-                    if (this.checked) {
-                        saveSetToDatabase(wpeId, setNum, newSet);
-                    }
-                });
             });
         }
 
@@ -52,6 +36,7 @@ document.querySelectorAll('.active-workout-btn').forEach(button => {
                 const checkboxes = workoutBlock.querySelectorAll('.custom-checkbox input[type="checkbox"]');
                 const wpeId = workoutBlock.dataset.wpeId;
 
+                // Alle sets komen in de wachtrij en gaan samen in één batch naar de server
                 checkboxes.forEach((checkbox, index) => {
                     checkbox.checked = true;
                     const setElement = checkbox.closest('.active-workout-set');
@@ -64,8 +49,164 @@ document.querySelectorAll('.active-workout-btn').forEach(button => {
     });
 });
 
-// Function to save individual set to database
-async function saveSetToDatabase(wpeId, setNum, setElement) {
+// Auto-save bij elke wijziging van een set (ook voor sets die later toegevoegd worden)
+document.addEventListener('change', function(event) {
+    const match = /^(reps|weight|completed)_(\d+)_(\d+)$/.exec(event.target.name || '');
+    const setElement = event.target.closest('.active-workout-set');
+    if (!match || !setElement) return;
+    if (match[1] === 'completed' && !event.target.checked && !setElement.classList.contains('set-saved')) return;
+    saveSetToDatabase(match[2], Number(match[3]), setElement);
+});
+
+// Wachtrij voor set-mutaties: debounced, in batches naar /save_sets, bewaard in localStorage
+// zodat een wegvallende verbinding (of herladen pagina) geen sets kwijtraakt.
+const SetQueue = (function() {
+    const DEBOUNCE_MS = 800;
+    const MAX_BATCH = 200;
+    const MAX_BACKOFF_MS = 30000;
+    const form = document.getElementById('save-workout-form');
+    const storageKey = `fittrack.setQueue.${form ? form.dataset.sessionId : ''}`;
+    let pending = load();
+    let timer = null;
+    let inFlight = null;
+    let backoff = 1000;
+    let refused = false;
+
+    function BatchRefused(status, message) {
+        this.status = status;
+        this.message = message;
+    }
+
+    function load() {
+        try {
+            // Wachtrijen van eerdere sessies zijn niet meer geldig
+            Object.keys(localStorage)
+                .filter(key => key.startsWith('fittrack.setQueue.') && key !== storageKey)
+                .forEach(key => localStorage.removeItem(key));
+            return JSON.parse(localStorage.getItem(storageKey)) || {};
+        } catch (error) {
+            return {};
+        }
+    }
+
+    function persist() {
+        try {
+            localStorage.setItem(storageKey, JSON.stringify(pending));
+        } catch (error) {
+            // Geen opslag beschikbaar (privémodus): de wachtrij leeft dan alleen in het geheugen
+        }
+    }
+
+    function newKey() {
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return Date.now().toString(36) + Math.random().toString(36).slice(2);
+    }
+
+    function schedule(delay) {
+        clearTimeout(timer);
+        timer = setTimeout(flush, delay);
+    }
+
+    // Eén slot per (planoefening, set): een nieuwere wijziging vervangt de oude in de wachtrij
+    function enqueue(mutation) {
+        pending[`${mutation.wpe_id}_${mutation.set_number}`] = {...mutation, key: newKey()};
+        persist();
+        schedule(DEBOUNCE_MS);
+    }
+
+    function acknowledge(keys) {
+        Object.entries(pending).forEach(([slot, mutation]) => {
+            if (!keys.has(mutation.key)) return;
+            delete pending[slot];
+            const checkbox = document.querySelector(`input[name="completed_${mutation.wpe_id}_${mutation.set_number}"]`);
+            const setElement = checkbox && checkbox.closest('.active-workout-set');
+            if (setElement) setElement.classList.add('set-saved');
+        });
+        persist();
+    }
+
+    function flush() {
+        clearTimeout(timer);
+        if (inFlight) return inFlight;
+        const batch = Object.values(pending).slice(0, MAX_BATCH);
+        if (!batch.length) return Promise.resolve();
+
+        inFlight = fetch('/save_sets', {
+            method: 'POST',
+            keepalive: true,
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRF-Token': document.querySelector('meta[name=csrf-token]').getAttribute('content')
+            },
+            body: JSON.stringify({mutations: batch})
+        })
+            .then(response => {
+                // Een doorverwijzing (naar de loginpagina) of 4xx op de hele batch (sessie verlopen, CSRF-token
+                // verlopen, geen actieve workout) betekent dat er niets is opgeslagen: de wachtrij blijft staan
+                if (response.redirected || (response.status >= 400 && response.status < 500 && ![408, 429].includes(response.status))) {
+                    return response.json().catch(() => ({})).then(data => {
+                        throw new BatchRefused(response.redirected ? 401 : response.status, data.message);
+                    });
+                }
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(data => {
+                (data.rejected || []).forEach(item => console.error('Set geweigerd:', item.message));
+                acknowledge(new Set([
+                    ...(data.applied || []),
+                    ...(data.duplicates || []),
+                    ...(data.rejected || []).map(item => item.key)
+                ]));
+                backoff = 1000;
+                refused = false;
+                if (Object.keys(pending).length) schedule(0);
+            })
+            .catch(error => {
+                if (error instanceof BatchRefused) {
+                    // Opnieuw proberen helpt niet zonder actie van de gebruiker; melden (één keer) en wachten op
+                    // een nieuwe wijziging, herladen pagina of terugkerende verbinding
+                    console.error('Set-batch geweigerd:', error.status, error.message);
+                    if (!refused) {
+                        refused = true;
+                        alert(`Sets konden niet worden opgeslagen (${error.message || 'HTTP ' + error.status}). ` +
+                              'Ze blijven bewaard; herlaad de pagina of log opnieuw in om ze alsnog op te slaan.');
+                    }
+                    return;
+                }
+                // Netwerkfout: wachtrij blijft staan, opnieuw proberen met exponentiële backoff
+                console.warn('Set-batch mislukt, nieuwe poging over', backoff, 'ms:', error);
+                schedule(backoff);
+                backoff = Math.min(backoff * 2, MAX_BACKOFF_MS);
+            })
+            .finally(() => {
+                inFlight = null;
+            });
+        return inFlight;
+    }
+
+    function clear() {
+        clearTimeout(timer);
+        pending = {};
+        try {
+            localStorage.removeItem(storageKey);
+        } catch (error) {
+            // Geen opslag beschikbaar
+        }
+    }
+
+    window.addEventListener('online', () => flush());
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') flush();
+    });
+    if (Object.keys(pending).length) schedule(0);
+
+    return {enqueue, flush, clear};
+})();
+window.SetQueue = SetQueue;
+
+// Zet een set in de wachtrij; het opslaan gebeurt in batches door SetQueue
+function saveSetToDatabase(wpeId, setNum, setElement) {
     const repsInput = setElement.querySelector(`input[name="reps_${wpeId}_${setNum}"]`);
     const weightInput = setElement.querySelector(`input[name="weight_${wpeId}_${setNum}"]`);
     const completedInput = setElement.querySelector(`input[name="completed_${wpeId}_${setNum}"]`);
@@ -74,39 +215,17 @@ async function saveSetToDatabase(wpeId, setNum, setElement) {
     const weight = parseFloat(weightInput.value) || 0;
     const completed = completedInput.checked;
 
-    // Only save if the set is completed and has valid data
-    if (completed && reps > 0) {
-        try {
-            const response = await fetch('/save_set', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRF-Token': document.querySelector('meta[name=csrf-token]').getAttribute('content')
-                },
-                body: JSON.stringify({
-                    wpe_id: wpeId,
-                    set_number: setNum,
-                    reps: reps,
-                    weight: weight,
-                    completed: completed
-                })
-            });
-
-            const data = await response.json();
-            if (data.success) {
-                // Visual feedback
-                setElement.classList.add('set-saved');
-                console.log('Set saved successfully');
-            } else {
-                console.error('Failed to save set:', data.message);
-            }
-        } catch (error) {
-            console.error('Error saving set:', error);
-        }
+    // Alleen sets met geldige reps; een eerder opgeslagen set mag weer 'niet voltooid' worden
+    if (reps > 0 && (completed || setElement.classList.contains('set-saved'))) {
+        SetQueue.enqueue({
+            wpe_id: Number(wpeId),
+            set_number: setNum,
+            reps: reps,
+            weight: weight,
+            completed: completed
+        });
     }
-    setElement.classList.add('set-saved');
     updateAddSetButtonVisibility(setElement.closest('.active-workout-block'));
-
 }
 
 // Function to remove a set
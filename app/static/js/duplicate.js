@@ -0,0 +1,30 @@
+document.addEventListener('DOMContentLoaded', function () {
+    // Dupliceer een plan (of gebruik een gearchiveerd plan als sjabloon) en open de kopie
+    document.querySelectorAll('.duplicate-workout').forEach(link => {
+        link.addEventListener('click', function (e) {
+            e.preventDefault();
+            e.stopPropagation();
+
+            const workoutId = this.getAttribute('data-workout-id');
+            const csrfToken = document.querySelector('meta[name=csrf-token]')?.getAttribute('content');
+            const headers = {'Content-Type': 'application/json'};
+            if (csrfToken) {
+                headers['X-CSRFToken'] = csrfToken;
+            }
+
+            fetch(`/api/plans/${workoutId}/duplicate`, {
+                method: 'POST',
+                headers: headers,
+                body: JSON.stringify({})
+            })
+            .then(response => response.ok ? response.json() : Promise.reject(response))
+            .then(data => {
+                window.location.href = data.edit_url;
+            })
+            .catch(error => {
+                console.error('Dupliceren mislukt:', error);
+                alert('Dupliceren mislukt, probeer het opnieuw.');
+            });
+        });
+    });
+});
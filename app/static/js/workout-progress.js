@@ -0,0 +1,57 @@
+document.addEventListener('DOMContentLoaded', function () {
+    // Live voortgang van de actieve workout: één SSE-verbinding, met long-poll als terugval
+    const tracker = document.querySelector('.workout-progress');
+    if (!tracker) return;
+    const streamUrl = tracker.dataset.streamUrl;
+    const pollUrl = tracker.dataset.pollUrl;
+    const bar = tracker.querySelector('.workout-progress-bar span');
+    const label = tracker.querySelector('.workout-progress-label');
+    let version = null;
+
+    function render(progress) {
+        bar.style.width = `${Math.min(progress.progress_percentage, 100)}%`;
+        label.textContent = `${progress.completed_sets} / ${progress.total_planned_sets} sets`;
+    }
+
+    function poll() {
+        const url = version === null ? pollUrl : `${pollUrl}?version=${version}`;
+        fetch(url, {headers: {'Accept': 'application/json'}})
+            .then(response => {
+                if (response.status === 204) return null;
+                return response.ok ? response.json() : Promise.reject(response);
+            })
+            .then(data => {
+                if (data) {
+                    version = data.version;
+                    render(data.progress);
+                    if (data.progress.is_completed) return;
+                }
+                poll();
+            })
+            .catch(error => {
+                console.error('Voortgang ophalen mislukt:', error);
+                setTimeout(poll, 5000);
+            });
+    }
+
+    if (!window.EventSource) {
+        poll();
+        return;
+    }
+
+    const source = new EventSource(streamUrl);
+    let received = false;
+    source.addEventListener('progress', function (event) {
+        received = true;
+        const progress = JSON.parse(event.data);
+        render(progress);
+        if (progress.is_completed) source.close();
+    });
+    source.addEventListener('error', function () {
+        // EventSource verbindt zelf opnieuw; lukt de stream nooit (bijv. een proxy die buffert), dan long-poll
+        if (!received) {
+            source.close();
+            poll();
+        }
+    });
+});
@@ -0,0 +1,314 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+import click
+from flask.cli import with_appcontext
+
+logger = logging.getLogger(__name__)
+
+
+def _encode(row):
+    # Set-rij naar JSON; datums als ISO-string
+    return json.dumps(row, default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value))
+
+
+def _decode(raw):
+    row = json.loads(raw)
+    for column in ('completed_at', 'created_at'):
+        if row.get(column):
+            row[column] = datetime.fromisoformat(row[column])
+    return row
+
+
+def _slot(row):
+    return f"{row['workout_plan_exercise_id']}:{row['set_number']}"
+
+
+class MemoryDraftStore:
+    """
+    In-process opslag voor set-concepten (stand-in voor tests en single-process setups).
+    Notities:
+        - Zelfde semantiek als RedisDraftStore, maar niet crash-safe: bij een herstart zijn concepten weg.
+        - ack() verwijdert alleen sets die nog de geclaimde waarde hebben: een gelijktijdige tweede flush
+          (sweep en expliciete flush) kan zo geen concepten laten vallen die de eerste niet heeft weggeschreven.
+    """
+    name = 'memory'
+
+    def __init__(self):
+        self._drafts = {}
+        self._flushing = {}
+        self._dirty = {}
+        self._lock = threading.Lock()
+
+    def stage(self, session_id, rows):
+        with self._lock:
+            self._drafts.setdefault(session_id, {}).update({_slot(row): _encode(row) for row in rows})
+            self._dirty.setdefault(session_id, time.time())
+
+    def claim(self, session_id):
+        with self._lock:
+            flushing = self._flushing.setdefault(session_id, {})
+            flushing.update(self._drafts.pop(session_id, {}))
+            self._dirty.pop(session_id, None)
+            return dict(flushing)
+
+    def retry(self, session_id):
+        with self._lock:
+            self._dirty.setdefault(session_id, time.time())
+
+    def ack(self, session_id, claimed):
+        with self._lock:
+            flushing = self._flushing.get(session_id, {})
+            for slot, raw in claimed.items():
+                if flushing.get(slot) == raw:
+                    del flushing[slot]
+            if not flushing:
+                self._flushing.pop(session_id, None)
+
+    def drafts(self, session_id):
+        with self._lock:
+            return list({**self._flushing.get(session_id, {}), **self._drafts.get(session_id, {})}.values())
+
+    def due(self, cutoff):
+        with self._lock:
+            return [session_id for session_id, since in self._dirty.items() if since <= cutoff]
+
+    def pending(self):
+        with self._lock:
+            return set(self._dirty) | set(self._flushing)
+
+
+class RedisDraftStore:
+    """
+    Gedeelde, crash-safe opslag voor set-concepten in Redis.
+    Notities:
+        - drafts:<sessie> (hash per set), flushing:<sessie> (hash in verwerking) en dirty (zset met
+          tijdstip van het oudste concept per sessie).
+        - claim() verplaatst concepten atomair (Lua) naar flushing; pas na een geslaagde commit verwijdert
+          ack() ze. Een crash tussendoor laat flushing staan, zodat recover() de upsert opnieuw doet.
+        - ack() verwijdert (ook atomair) alleen sets die nog de geclaimde waarde hebben, zodat een gelijktijdige
+          flush van dezelfde sessie geen concepten kwijtraakt die de andere flush nog moet wegschrijven.
+        - claim() haalt de sessie uit dirty; retry() zet haar na een mislukte upsert terug, zodat de
+          periodieke sweep het opnieuw probeert.
+    """
+    name = 'redis'
+
+    CLAIM_SCRIPT = """
+        local drafts = redis.call('HGETALL', KEYS[1])
+        for i = 1, #drafts, 2 do
+            redis.call('HSET', KEYS[2], drafts[i], drafts[i + 1])
+        end
+        redis.call('DEL', KEYS[1])
+        redis.call('ZREM', KEYS[3], ARGV[1])
+        return redis.call('HGETALL', KEYS[2])
+    """
+
+    ACK_SCRIPT = """
+        for i = 1, #ARGV, 2 do
+            if redis.call('HGET', KEYS[1], ARGV[i]) == ARGV[i + 1] then
+                redis.call('HDEL', KEYS[1], ARGV[i])
+            end
+        end
+    """
+
+    def __init__(self, url, prefix='workout_buffer:'):
+        import redis  # Import hier: alleen nodig als de redis-backend gekozen is
+        self._client = redis.Redis.from_url(url)
+        self._client.ping()
+        self.prefix = prefix
+        self._claim = self._client.register_script(self.CLAIM_SCRIPT)
+        self._ack = self._client.register_script(self.ACK_SCRIPT)
+
+    def _key(self, kind, session_id=''):
+        return f'{self.prefix}{kind}:{session_id}' if session_id else f'{self.prefix}{kind}'
+
+    def stage(self, session_id, rows):
+        pipe = self._client.pipeline()
+        pipe.hset(self._key('drafts', session_id), mapping={_slot(row): _encode(row) for row in rows})
+        pipe.zadd(self._key('dirty'), {session_id: time.time()}, nx=True)
+        pipe.execute()
+
+    def claim(self, session_id):
+        keys = [self._key('drafts', session_id), self._key('flushing', session_id), self._key('dirty')]
+        pairs = [raw.decode('utf-8') for raw in self._claim(keys=keys, args=[session_id])]
+        return dict(zip(pairs[::2], pairs[1::2]))
+
+    def retry(self, session_id):
+        self._client.zadd(self._key('dirty'), {session_id: time.time()}, nx=True)
+
+    def ack(self, session_id, claimed):
+        if claimed:
+            self._ack(keys=[self._key('flushing', session_id)],
+                      args=[value for pair in claimed.items() for value in pair])
+
+    def drafts(self, session_id):
+        pipe = self._client.pipeline()
+        pipe.hgetall(self._key('flushing', session_id))
+        pipe.hgetall(self._key('drafts', session_id))
+        flushing, drafts = pipe.execute()
+        return [raw.decode('utf-8') for raw in {**flushing, **drafts}.values()]
+
+    def due(self, cutoff):
+        return [raw.decode('utf-8') for raw in self._client.zrangebyscore(self._key('dirty'), '-inf', cutoff)]
+
+    def pending(self):
+        sessions = set(self.due('+inf'))
+        prefix = self._key('flushing', '')
+        for key in self._client.scan_iter(match=f'{self.prefix}flushing:*'):
+            sessions.add(key.decode('utf-8')[len(prefix) + 1:])
+        return sessions
+
+
+class WorkoutBuffer:
+    """
+    Write-behind buffer voor sets van lopende workout-sessies.
+    Notities:
+        - Set-wijzigingen gaan naar een snelle key-value store i.p.v. elk een SQL-commit; alleen de laatste
+          staat per set telt.
+        - Periodiek (na een request, hooguit eens per WORKOUT_BUFFER_FLUSH_SECONDS per proces) en bij
+          save/complete_workout worden concepten met één bulk upsert naar SetLog geschreven.
+        - Backend via WORKOUT_BUFFER_BACKEND: 'off' (standaard, direct naar de database), 'memory' of 'redis'.
+        - Onverwerkte concepten na een crash: 'flask workout-buffer recover' (gebeurt ook bij de eerste sweep).
+    """
+
+    def __init__(self, app=None):
+        self.store = None
+        self.flush_seconds = 30
+        self._last_sweep = 0.0
+        self._recovered = False
+        self._sweep_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    @property
+    def enabled(self):
+        return self.store is not None
+
+    def init_app(self, app):
+        backend = app.config.get('WORKOUT_BUFFER_BACKEND', 'off')
+        self.flush_seconds = app.config.get('WORKOUT_BUFFER_FLUSH_SECONDS', 30)
+        self.store = None
+        if backend == 'redis':
+            try:
+                self.store = RedisDraftStore(app.config['WORKOUT_BUFFER_URL'])
+            except Exception as e:
+                # Zonder gedeelde store niet bufferen: een in-process buffer per worker zou sets verliezen
+                logger.warning(f"Redis-workoutbuffer niet beschikbaar, sets gaan direct naar de database: {e}")
+        elif backend == 'memory':
+            self.store = MemoryDraftStore()
+        elif backend != 'off':
+            logger.warning(f"Onbekende workoutbuffer-backend '{backend}', buffer uitgeschakeld")
+        app.extensions['workout_buffer'] = self
+        app.after_request(self._sweep_after_request)
+        app.cli.add_command(buffer_cli)
+
+    def stage(self, session_id, rows):
+        #    Bewaar set-rijen (zie set_log_row) als concept; een latere rij voor dezelfde set vervangt de vorige.
+        self.store.stage(session_id, rows)
+
+    def drafts(self, session_id):
+        #    Nog niet weggeschreven set-rijen van een sessie (leeg als de buffer uit staat).
+        if not self.enabled:
+            return []
+        return [_decode(raw) for raw in self.store.drafts(session_id)]
+
+    def flush(self, session_id):
+        """
+        Schrijf de concepten van één sessie weg met één bulk upsert en commit.
+        Notities:
+            - Concepten worden pas uit de store verwijderd na een geslaagde commit (upsert is idempotent).
+            - De sessietotalen worden in dezelfde transactie bijgewerkt met het verschil t.o.v. de database.
+            - Mislukt de upsert, dan blijven de concepten in flushing en komt de sessie terug in dirty, zodat
+              een volgende sweep het opnieuw probeert (ook als de gebruiker de workout niet afmaakt).
+        Returns:
+            int: Aantal weggeschreven sets.
+        """
+        if not self.enabled:
+            return 0
+        from app import db  # Import hier om circulaire imports te vermijden
+        from app.main.set_batch import upsert_set_rows
+
+        claimed = self.store.claim(session_id)
+        rows = [_decode(raw) for raw in claimed.values()]
+        if rows:
+            try:
+                upsert_set_rows(session_id, rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self.store.retry(session_id)
+                raise
+        self.store.ack(session_id, claimed)
+        logger.debug(f"Workoutbuffer: {len(rows)} sets van sessie {session_id} weggeschreven")
+        return len(rows)
+
+    def flush_sessions(self, session_ids):
+        #    Flush meerdere sessies; een mislukte sessie blijft in de store staan voor een volgende poging.
+        flushed = 0
+        for session_id in session_ids:
+            try:
+                flushed += self.flush(session_id)
+            except Exception as e:
+                logger.error(f"Workoutbuffer: flush van sessie {session_id} mislukt: {e}")
+        return flushed
+
+    def flush_due(self, max_age=None):
+        #    Flush alle sessies waarvan het oudste concept ouder is dan max_age seconden.
+        if not self.enabled:
+            return 0
+        max_age = self.flush_seconds if max_age is None else max_age
+        return self.flush_sessions(self.store.due(time.time() - max_age))
+
+    def recover(self):
+        #    Schrijf alle openstaande concepten weg, ook die van een flush die door een crash niet afkwam.
+        if not self.enabled:
+            return 0
+        return self.flush_sessions(self.store.pending())
+
+    def _sweep_after_request(self, response):
+        # Periodieke flush zonder aparte worker: hooguit één sweep tegelijk en eens per flush_seconds per proces
+        if not self.enabled or time.monotonic() - self._last_sweep < self.flush_seconds:
+            return response
+        from app import db  # Import hier om circulaire imports te vermijden
+        if db.session.new or db.session.dirty or db.session.deleted:
+            # Niet meecommitten met onafgemaakt werk van de view
+            return response
+        if not self._sweep_lock.acquire(blocking=False):
+            return response
+        try:
+            self._last_sweep = time.monotonic()
+            if not self._recovered:
+                self._recovered = True
+                self.recover()
+            else:
+                self.flush_due()
+        except Exception as e:
+            logger.error(f"Workoutbuffer: periodieke flush mislukt: {e}")
+        finally:
+            self._sweep_lock.release()
+        return response
+
+
+workout_buffer = WorkoutBuffer()
+
+
+@click.group('workout-buffer')
+def buffer_cli():
+    """Beheer de write-behind buffer voor lopende workouts."""
+
+
+@buffer_cli.command('flush')
+@click.option('--max-age', default=0, show_default=True, help='Alleen sessies met concepten ouder dan dit aantal seconden.')
+@with_appcontext
+def flush_command(max_age):
+    """Schrijf gebufferde sets naar de database."""
+    click.echo(f"{workout_buffer.flush_due(max_age)} sets weggeschreven")
+
+
+@buffer_cli.command('recover')
+@with_appcontext
+def recover_command():
+    """Schrijf alle openstaande concepten weg, ook na een crash tijdens een flush."""
+    click.echo(f"{workout_buffer.recover()} sets hersteld")
@@ -20,4 +20,31 @@ class Config:
     AUTH0_CLIENT_SECRET = os.getenv('AUTH0_CLIENT_SECRET')
     AUTH0_CALLBACK_URL = os.getenv('AUTH0_CALLBACK_URL')
 
+    # Zoekbackend voor oefeningen: 'memory' (pure Python) of 'fts5' (SQLite FTS5)
+    EXERCISE_SEARCH_BACKEND = os.getenv('EXERCISE_SEARCH_BACKEND', 'memory')
+    # Hoe vaak (seconden) een worker de gedeelde catalogusversie controleert op wijzigingen uit andere processen
+    CATALOG_CHECK_SECONDS = int(os.getenv('CATALOG_CHECK_SECONDS', 30))
+
+    # Cache voor gerenderde dashboard-fragmenten: 'memory' (LRU per proces) of 'redis' (gedeeld)
+    FRAGMENT_CACHE_BACKEND = os.getenv('FRAGMENT_CACHE_BACKEND', 'memory')
+    FRAGMENT_CACHE_URL = os.getenv('FRAGMENT_CACHE_URL', 'redis://localhost:6379/0')
+    FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', 1024))
+
+    # Write-behind buffer voor sets van lopende workouts: 'off' (direct naar de database), 'memory' of 'redis'
+    WORKOUT_BUFFER_BACKEND = os.getenv('WORKOUT_BUFFER_BACKEND', 'off')
+    WORKOUT_BUFFER_URL = os.getenv('WORKOUT_BUFFER_URL', 'redis://localhost:6379/1')
+    WORKOUT_BUFFER_FLUSH_SECONDS = int(os.getenv('WORKOUT_BUFFER_FLUSH_SECONDS', 30))
+
+    # Live voortgang van workouts (SSE/long-poll): 'memory' (pub/sub per proces) of 'redis' (gedeeld)
+    PROGRESS_EVENTS_BACKEND = os.getenv('PROGRESS_EVENTS_BACKEND', 'memory')
+    PROGRESS_EVENTS_URL = os.getenv('PROGRESS_EVENTS_URL', 'redis://localhost:6379/2')
+    PROGRESS_STREAM_SECONDS = int(os.getenv('PROGRESS_STREAM_SECONDS', 300))
+    PROGRESS_POLL_SECONDS = int(os.getenv('PROGRESS_POLL_SECONDS', 25))
+
+    # Achtergrondtaken (jobs-tabel als wachtrij): aantal worker-threads per proces, 0 = alleen 'flask jobs drain'
+    JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))
+    JOBS_POLL_SECONDS = int(os.getenv('JOBS_POLL_SECONDS', 5))
+    JOBS_LEASE_SECONDS = int(os.getenv('JOBS_LEASE_SECONDS', 300))
+    JOBS_RETRY_SECONDS = int(os.getenv('JOBS_RETRY_SECONDS', 10))
+
     DEBUG = True
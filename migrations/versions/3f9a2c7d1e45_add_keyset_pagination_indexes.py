@@ -0,0 +1,32 @@
+"""Add keyset pagination indexes
+
+Revision ID: 3f9a2c7d1e45
+Revises: 005e80c438b8
+Create Date: 2026-10-17 10:12:31.418207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a2c7d1e45'
+down_revision = '005e80c438b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('weight_log', schema=None) as batch_op:
+        batch_op.create_index('ix_weight_log_user_logged_at', ['user_id', 'logged_at', 'id'], unique=False)
+
+    with op.batch_alter_table('workout_sessions', schema=None) as batch_op:
+        batch_op.create_index('ix_workout_sessions_user_history', ['user_id', 'is_completed', 'is_archived', 'completed_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('workout_sessions', schema=None) as batch_op:
+        batch_op.drop_index('ix_workout_sessions_user_history')
+
+    with op.batch_alter_table('weight_log', schema=None) as batch_op:
+        batch_op.drop_index('ix_weight_log_user_logged_at')
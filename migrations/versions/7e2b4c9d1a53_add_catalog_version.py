@@ -0,0 +1,29 @@
+"""Add shared catalog version stamp
+
+Revision ID: 7e2b4c9d1a53
+Revises: f3d8a6c1b094
+Create Date: 2026-10-17 21:40:12.553081
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2b4c9d1a53'
+down_revision = 'f3d8a6c1b094'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    catalog_version = op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(catalog_version, [{'id': 1, 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('catalog_version')
@@ -0,0 +1,28 @@
+"""Add set log mutation key and session lookup index
+
+Revision ID: 8d41b6e2f0a3
+Revises: 3f9a2c7d1e45
+Create Date: 2026-10-17 14:03:52.226184
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41b6e2f0a3'
+down_revision = '3f9a2c7d1e45'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('set_logs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('mutation_key', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_set_logs_session_set', ['workout_session_id', 'workout_plan_exercise_id', 'set_number'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('set_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_set_logs_session_set')
+        batch_op.drop_column('mutation_key')
@@ -0,0 +1,44 @@
+"""Add personal records per user and exercise
+
+Revision ID: b91f0d3c5e72
+Revises: 4a7c9e1d2b60
+Create Date: 2026-10-17 19:27:05.664310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b91f0d3c5e72'
+down_revision = '4a7c9e1d2b60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Vullen gebeurt met 'flask personal-records backfill'
+    op.create_table('personal_records',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('exercise_id', sa.String(length=50), nullable=False),
+    sa.Column('best_weight', sa.Float(), nullable=True),
+    sa.Column('reps_at_best_weight', sa.Integer(), nullable=True),
+    sa.Column('best_weight_session_id', sa.String(length=36), nullable=True),
+    sa.Column('best_weight_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('best_e1rm', sa.Float(), nullable=True),
+    sa.Column('best_e1rm_weight', sa.Float(), nullable=True),
+    sa.Column('best_e1rm_reps', sa.Integer(), nullable=True),
+    sa.Column('best_e1rm_session_id', sa.String(length=36), nullable=True),
+    sa.Column('best_e1rm_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('best_volume', sa.Float(), nullable=True),
+    sa.Column('best_volume_session_id', sa.String(length=36), nullable=True),
+    sa.Column('best_volume_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['exercise_id'], ['exercise.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'exercise_id')
+    )
+
+
+def downgrade():
+    op.drop_table('personal_records')
@@ -0,0 +1,43 @@
+"""Unique set log per session, plan exercise and set number
+
+Revision ID: c27e5a9b4d18
+Revises: 8d41b6e2f0a3
+Create Date: 2026-10-17 15:21:08.647310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c27e5a9b4d18'
+down_revision = '8d41b6e2f0a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Ruim dubbele sets op (race in de oude SELECT-dan-INSERT); de nieuwste rij per sleutel blijft staan
+    op.execute(
+        """
+        DELETE FROM set_logs
+        WHERE workout_session_id IS NOT NULL
+          AND workout_plan_exercise_id IS NOT NULL
+          AND id NOT IN (
+              SELECT max_id FROM (
+                  SELECT MAX(id) AS max_id FROM set_logs
+                  GROUP BY workout_session_id, workout_plan_exercise_id, set_number
+              ) AS newest
+          )
+        """
+    )
+
+    with op.batch_alter_table('set_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_set_logs_session_set')
+        batch_op.create_index('uq_set_logs_session_set', ['workout_session_id', 'workout_plan_exercise_id', 'set_number'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('set_logs', schema=None) as batch_op:
+        batch_op.drop_index('uq_set_logs_session_set')
+        batch_op.create_index('ix_set_logs_session_set', ['workout_session_id', 'workout_plan_exercise_id', 'set_number'], unique=False)
@@ -0,0 +1,43 @@
+"""Add planned sets to workout sessions and backfill session totals
+
+Revision ID: e5b3f18c6a27
+Revises: c27e5a9b4d18
+Create Date: 2026-10-17 16:40:12.905533
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b3f18c6a27'
+down_revision = 'c27e5a9b4d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('workout_sessions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('planned_sets', sa.Integer(), nullable=True))
+
+    # Totalen worden vanaf nu incrementeel bijgehouden; zet ze eenmalig gelijk aan de set-logs
+    op.execute(
+        sa.text(
+            """
+            UPDATE workout_sessions SET
+                total_sets = (SELECT COUNT(*) FROM set_logs
+                              WHERE set_logs.workout_session_id = workout_sessions.id AND set_logs.completed = :done),
+                total_reps = (SELECT COALESCE(SUM(reps), 0) FROM set_logs
+                              WHERE set_logs.workout_session_id = workout_sessions.id AND set_logs.completed = :done),
+                total_weight = (SELECT COALESCE(SUM(reps * weight), 0) FROM set_logs
+                                WHERE set_logs.workout_session_id = workout_sessions.id AND set_logs.completed = :done),
+                planned_sets = (SELECT COALESCE(SUM(sets), 0) FROM workout_plan_exercise
+                                WHERE workout_plan_exercise.workout_plan_id = workout_sessions.workout_plan_id)
+            """
+        ).bindparams(done=True)
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('workout_sessions', schema=None) as batch_op:
+        batch_op.drop_column('planned_sets')
@@ -0,0 +1,26 @@
+"""Add set log index on user, exercise and completion time
+
+Revision ID: f3d8a6c1b094
+Revises: b91f0d3c5e72
+Create Date: 2026-10-17 20:05:48.302117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3d8a6c1b094'
+down_revision = 'b91f0d3c5e72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('set_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_set_logs_user_exercise_completed', ['user_id', 'exercise_id', 'completed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('set_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_set_logs_user_exercise_completed')